@@ -0,0 +1,91 @@
+"""Общая HTTP-сессия с пулом keep-alive соединений для API Практикума."""
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+RETRY_TOTAL = 2
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (502, 503, 504)
+
+
+class ApiSession:
+    """Пул соединений по размеру числа опрашивающих потоков.
+
+    Метод `get` повторяет сигнатуру `requests.get`. У каждого ответа
+    есть `latency` (секунды) и `connection_reused`: было ли
+    использовано уже открытое соединение. Ответы с кодами
+    `retry_statuses` повторяются внутри сессии; при автомате защиты
+    коды лучше не повторять, чтобы каждый сбой был одним запросом к API.
+    """
+
+    def __init__(self, pool_size, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, retries=RETRY_TOTAL,
+                 retry_statuses=RETRY_STATUSES):
+        """Создаёт сессию с пулом на `pool_size` соединений."""
+        self.timeout = (connect_timeout, read_timeout)
+        self._session = requests.Session()
+        self._session.headers['Accept-Encoding'] = 'gzip'
+        retry = Retry(
+            total=retries, connect=retries, read=retries,
+            status=retries, backoff_factor=RETRY_BACKOFF,
+            status_forcelist=retry_statuses, allowed_methods=['GET'],
+            raise_on_status=False
+        )
+        self._adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size,
+            max_retries=retry, pool_block=True
+        )
+        self._session.mount('https://', self._adapter)
+        self._session.mount('http://', self._adapter)
+        self._lock = threading.Lock()
+        self.requests_total = 0
+        self.connections_total = 0
+        self.latency_total = 0.0
+
+    def _opened_connections(self, url):
+        pool = self._adapter.poolmanager.connection_from_url(url)
+        return pool.num_connections
+
+    def get(self, url, **kwargs):
+        """GET-запрос через пул с таймаутами по умолчанию."""
+        kwargs.setdefault('timeout', self.timeout)
+        opened_before = self._opened_connections(url)
+        started = time.monotonic()
+        response = self._session.get(url, **kwargs)
+        response.latency = time.monotonic() - started
+        opened = self._opened_connections(url) - opened_before
+        # Счётчик пула общий для потоков, поэтому признак повторного
+        # использования приблизительный; суммарные счётчики точные.
+        response.connection_reused = opened == 0
+        with self._lock:
+            self.requests_total += 1
+            self.connections_total += max(opened, 0)
+            self.latency_total += response.latency
+        return response
+
+    def stats(self):
+        """Сводка: число запросов, новых соединений и средняя задержка."""
+        with self._lock:
+            requests_total = self.requests_total
+            connections_total = self.connections_total
+            latency_total = self.latency_total
+        return {
+            'requests': requests_total,
+            'connections': connections_total,
+            'reuse_ratio': (
+                1 - connections_total / requests_total
+                if requests_total else 0.0
+            ),
+            'avg_latency': (
+                latency_total / requests_total if requests_total else 0.0
+            ),
+        }
+
+    def close(self):
+        """Закрывает все соединения пула."""
+        self._session.close()
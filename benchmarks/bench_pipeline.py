@@ -0,0 +1,171 @@
+"""Бенчмарк цепочки опрос → разбор → уведомление на локальных заменителях.
+
+Запуск::
+
+    python benchmarks/bench_pipeline.py --tenants 1,100,1000,10000
+
+Каждая строка вывода — JSON с результатом одного этапа для одного числа
+учеников: пропускная способность, p50/p99 задержки и RSS процесса.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import telegram  # noqa: E402
+from telegram.utils.request import Request  # noqa: E402
+
+import homework  # noqa: E402
+from fake_servers import FakePracticum, FakeTelegram  # noqa: E402
+from tenants import Tenant  # noqa: E402
+
+
+def percentile(values, share):
+    """Значение перцентиля `share` (0..1) из списка."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[round(share * (len(ordered) - 1))]
+
+
+def rss_mb():
+    """Текущий и пиковый RSS процесса в МиБ."""
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    with open('/proc/self/statm') as statm:
+        current = int(statm.read().split()[1]) * page_size
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return round(current / 2 ** 20, 1), round(peak / 2 ** 20, 1)
+
+
+def measure(stage, tenants, function, items, workers, count=None):
+    """Прогоняет `function` по `items` в пуле и возвращает сводку."""
+    def timed(item):
+        started = time.perf_counter()
+        result = function(item)
+        return time.perf_counter() - started, result
+
+    started = time.perf_counter()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(timed, items))
+    else:
+        results = [timed(item) for item in items]
+    elapsed = time.perf_counter() - started
+    latencies = [latency for latency, _ in results]
+    rss, peak_rss = rss_mb()
+    operations = len(results) if count is None else count(results)
+    return {
+        'stage': stage,
+        'tenants': tenants,
+        'operations': operations,
+        'seconds': round(elapsed, 4),
+        'throughput': round(operations / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'rss_mb': rss,
+        'peak_rss_mb': peak_rss,
+    }, [result for _, result in results]
+
+
+def bench(size, bot, fake_telegram, workers):
+    """Все этапы для `size` учеников."""
+    tenants = [
+        Tenant(f'student-{number}', number + 1, current_timestamp=0)
+        for number in range(size)
+    ]
+    workers = min(workers, size)
+    results = []
+
+    summary, responses = measure(
+        'get_api_answer', size,
+        lambda tenant: homework.fetch_api_answer(0, tenant.headers),
+        tenants, workers
+    )
+    results.append(summary)
+
+    summary, homeworks = measure(
+        'check_response', size, homework.check_response, responses, 1
+    )
+    results.append(summary)
+
+    flat = [item for items in homeworks for item in items]
+    summary, messages = measure(
+        'parse_status', size, homework.parse_status, flat, 1
+    )
+    results.append(summary)
+
+    summary, _ = measure(
+        'send_message', size,
+        lambda args: homework.send_chat_message(bot, *args),
+        [(tenant.chat_id, message)
+         for tenant, message in zip(tenants, messages)],
+        workers
+    )
+    results.append(summary)
+
+    now = int(time.time())
+    for tenant in tenants:
+        tenant.current_timestamp = now - 3600
+        tenant.homeworks = {}
+    sent_before = fake_telegram.received
+    summary, _ = measure(
+        'poll_cycle', size, lambda tenant: homework.poll_tenant(bot, tenant),
+        tenants, workers
+    )
+    summary['notifications'] = fake_telegram.received - sent_before
+    summary['notifications_per_s'] = round(
+        summary['notifications'] / summary['seconds'], 1
+    )
+    results.append(summary)
+    return results
+
+
+def parse_args():
+    """Параметры командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tenants', default='1,100,1000,10000')
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--transition-interval', type=float, default=60)
+    parser.add_argument('--output', help='файл для JSON-строк')
+    return parser.parse_args()
+
+
+def main():
+    """Запускает бенчмарк и печатает результаты."""
+    args = parse_args()
+    sizes = [int(size) for size in args.tenants.split(',')]
+    logging.getLogger().setLevel(logging.WARNING)
+
+    practicum = FakePracticum(
+        max(sizes), transition_interval=args.transition_interval, seed=1
+    ).start()
+    fake_telegram = FakeTelegram().start()
+    homework.ENDPOINT = practicum.url
+    homework.configure_api_session(args.workers)
+    bot = telegram.Bot(
+        token='1234:benchmark', base_url=fake_telegram.url,
+        request=Request(con_pool_size=args.workers)
+    )
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for size in sizes:
+            for result in bench(size, bot, fake_telegram, args.workers):
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        practicum.stop()
+        fake_telegram.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Бенчмарк холодного `import homework` в отдельных процессах.
+
+Запуск::
+
+    python benchmarks/bench_startup.py --runs 20
+
+Каждый прогон — новый интерпретатор, поэтому кэш модулей не помогает
+(помогают только файлы `.pyc`). Вывод — одна строка JSON: медиана и
+минимум времени импорта, полное время жизни процесса и то же для
+пустого интерпретатора, а также загруженные тяжёлые зависимости.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from os.path import abspath, dirname
+
+ROOT = dirname(dirname(abspath(__file__)))
+HEAVY_MODULES = ('telegram', 'requests', 'dotenv', 'urllib3', 'asyncio')
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    'seconds': elapsed,
+    'loaded': [name for name in {heavy!r} if name in sys.modules],
+}}))
+'''
+
+
+def run_probe(statement):
+    """Выполняет `statement` в новом интерпретаторе и возвращает замер."""
+    code = PROBE.format(statement=statement, heavy=HEAVY_MODULES)
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, check=True,
+        capture_output=True, text=True
+    ).stdout
+    result = json.loads(output)
+    result['process_seconds'] = time.perf_counter() - started
+    return result
+
+
+def measure(statement, runs):
+    """Медиана и минимум времени `statement` по `runs` прогонам."""
+    results = [run_probe(statement) for _ in range(runs)]
+    seconds = [result['seconds'] for result in results]
+    process = [result['process_seconds'] for result in results]
+    return {
+        'median_ms': round(statistics.median(seconds) * 1000, 2),
+        'min_ms': round(min(seconds) * 1000, 2),
+        'process_ms': round(statistics.median(process) * 1000, 2),
+        'loaded': results[-1]['loaded'],
+    }
+
+
+def parse_args():
+    """Аргументы командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument(
+        '--module', default='homework', help='Какой модуль импортировать'
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Запускает бенчмарк и печатает результат."""
+    args = parse_args()
+    run_probe(f'import {args.module}')
+    result = {'module': args.module, 'runs': args.runs}
+    result.update(measure(f'import {args.module}', args.runs))
+    result['interpreter_ms'] = measure('pass', args.runs)['process_ms']
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Воспроизведение записанной трассы через настоящий код опроса.
+
+Запись: запустить бота с `TRACE_FILE=trace.jsonl.gz`. Воспроизведение::
+
+    python benchmarks/replay_trace.py trace.jsonl.gz --speed 0
+
+Ответы API берутся из трассы, а каждый записанный опрос проходит через
+`poll_tenant` (`check_response`, `parse_status`, индекс работ). В конце
+печатается строка JSON со скоростью воспроизведения и сверкой
+уведомлений с записанными (по каждому чату в отдельности: опросы разных
+учеников шли параллельно); при расхождении код выхода 1.
+
+`--speed 0` — как можно быстрее, `1` — в реальном времени, `10` —
+в десять раз быстрее. Сводки сбоев зависят от времени, поэтому при
+ускорении они могут отличаться от записанных.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import requests  # noqa: E402
+
+import exceptions  # noqa: E402
+import homework  # noqa: E402
+from tenants import Tenant  # noqa: E402
+from tests.utils import CollectingBot  # noqa: E402
+from traffic_trace import ReplaySession, read_trace  # noqa: E402
+
+
+def replay_error(name, message):
+    """Исключение транспорта, соответствующее записанному."""
+    if name == exceptions.DeadlineExceeded.__name__:
+        return exceptions.DeadlineExceeded(message)
+    return requests.ConnectionError(message)
+
+
+def replay(events, bot, speed=0.0):
+    """Прогоняет записанные опросы через `poll_tenant`.
+
+    Возвращает число опросов. Ученики создаются из событий `tenant`:
+    токеном служит записанный ключ, индекс статусов — записанный.
+    """
+    tenants = {}
+    for event in events:
+        if event['kind'] == 'tenant':
+            tenant = Tenant(event['key'], event['chat_id'], event['from_date'])
+            tenant.key = event['key']
+            homework.restore_tenant(
+                tenant, None, event.get('homeworks', ())
+            )
+            tenants[tenant.key] = tenant
+    homework.api_session = ReplaySession(
+        events, lambda headers: headers['Authorization'].split(' ', 1)[-1],
+        replay_error
+    )
+    polls = 0
+    started = time.monotonic()
+    for event in events:
+        if event['kind'] != 'api':
+            continue
+        if speed:
+            delay = event['t'] / speed - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+        homework.poll_tenant(bot, tenants[event['key']])
+        polls += 1
+    return polls
+
+
+def poll_sends(events):
+    """Записанные уведомления опросов: ответы на команды не воспроизводятся."""
+    return [
+        (str(event['chat_id']), event['text'])
+        for event in events
+        if event['kind'] == 'send' and event.get('source', 'poll') == 'poll'
+    ]
+
+
+def by_chat(messages):
+    """Сообщения, сгруппированные по чатам с сохранением порядка."""
+    chats = {}
+    for chat_id, text in messages:
+        chats.setdefault(chat_id, []).append(text)
+    return chats
+
+
+def parse_args():
+    """Аргументы командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('trace')
+    parser.add_argument('--speed', type=float, default=0.0)
+    return parser.parse_args()
+
+
+def main():
+    """Воспроизводит трассу и сверяет уведомления."""
+    args = parse_args()
+    logging.getLogger().setLevel(logging.CRITICAL)
+    events = list(read_trace(args.trace))
+    recorded = poll_sends(events)
+    bot = CollectingBot()
+    started = time.perf_counter()
+    polls = replay(events, bot, args.speed)
+    elapsed = time.perf_counter() - started
+    replayed, expected = by_chat(bot.messages), by_chat(recorded)
+    match = replayed == expected
+    print(json.dumps({
+        'polls': polls,
+        'seconds': round(elapsed, 3),
+        'polls_per_second': round(polls / elapsed, 1) if elapsed else None,
+        'notifications': len(bot.messages),
+        'recorded_notifications': len(recorded),
+        'match': match,
+    }))
+    if not match:
+        for chat_id in sorted(replayed.keys() | expected.keys()):
+            if replayed.get(chat_id) != expected.get(chat_id):
+                print(
+                    f'Чат {chat_id}: {replayed.get(chat_id)!r} '
+                    f'!= {expected.get(chat_id)!r}', file=sys.stderr
+                )
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Общий автомат защиты для запросов к ENDPOINT."""
+import logging
+import threading
+import time
+
+import exceptions
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATE_CODES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+# Один текст на оба отказа: у сбоев один отпечаток в сводке ошибок.
+OPEN_MESSAGE = 'API временно не опрашивается после серии сбоев'
+
+CIRCUIT_STATE = metrics.gauge(
+    'homework_circuit_state',
+    'Состояние автомата защиты API: 0 — замкнут, 1 — разомкнут, '
+    '2 — пробные запросы'
+)
+CIRCUIT_TRANSITIONS = metrics.counter(
+    'homework_circuit_transitions_total', 'Переходы автомата защиты API',
+    labelnames=('state',)
+)
+CIRCUIT_REJECTED = metrics.counter(
+    'homework_circuit_rejected_total',
+    'Опросы, не отправленные в API из-за разомкнутого автомата'
+)
+
+
+class CircuitBreaker:
+    """Автомат защиты: замкнут, разомкнут, пробные запросы.
+
+    После `failure_threshold` сбоев подряд автомат размыкается, и
+    `before_call()` сразу вызывает `CircuitOpen`, не нагружая API.
+    Через `reset_timeout` секунд пропускается до `probes` пробных
+    запросов: успех замыкает автомат, сбой снова размыкает его.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, probes=1,
+                 clock=time.monotonic):
+        """Создаёт замкнутый автомат."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(STATE_CODES[CLOSED])
+
+    def _transition(self, state):
+        logger.warning(f'Автомат защиты API: {self.state} -> {state}')
+        self.state = state
+        CIRCUIT_STATE.set(STATE_CODES[state])
+        CIRCUIT_TRANSITIONS.labels(state).inc()
+        if state == OPEN:
+            self.opened_at = self.clock()
+        self._probes_in_flight = 0
+
+    def before_call(self):
+        """Разрешает запрос или вызывает `CircuitOpen`."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    CIRCUIT_REJECTED.inc()
+                    raise exceptions.CircuitOpen(OPEN_MESSAGE)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.probes:
+                    CIRCUIT_REJECTED.inc()
+                    raise exceptions.CircuitOpen(OPEN_MESSAGE)
+                self._probes_in_flight += 1
+
+    def retry_after(self):
+        """Через сколько секунд автомат пропустит пробный запрос.
+
+        Пока идёт проба, точного ответа нет: возвращается
+        `reset_timeout`.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                return max(
+                    self.opened_at + self.reset_timeout - self.clock(), 0
+                )
+            return self.reset_timeout
+
+    def record_success(self):
+        """Запрос прошёл: сбрасывает счётчик и замыкает автомат."""
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        """Сбой API: при превышении порога автомат размыкается."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED
+                and self.failures >= self.failure_threshold
+            ):
+                self._transition(OPEN)
@@ -0,0 +1,173 @@
+"""Команды чата (`/status`, `/last`) с ответом из памяти бота.
+
+Ответы строятся только из индекса `tenant.homeworks`, который
+поддерживает цикл опроса, поэтому команды не обращаются к API
+Практикума, сколько бы учеников их ни присылали.
+"""
+import logging
+import threading
+
+import telegram
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_MAX_LENGTH = 4096
+STATUS_NAMES = {
+    'approved': 'принята',
+    'reviewing': 'на проверке',
+    'rejected': 'возвращена с замечаниями',
+}
+HELP_TEXT = (
+    'Команды:\n'
+    '/status — статусы всех работ\n'
+    '/last — последнее уведомление'
+)
+
+
+def split_message(text, limit=MESSAGE_MAX_LENGTH):
+    """Делит текст на сообщения не длиннее `limit` по границам строк.
+
+    Строка длиннее `limit` режется на части.
+    """
+    parts = []
+    for line in text.split('\n'):
+        pieces = [
+            line[start:start + limit] for start in range(0, len(line), limit)
+        ]
+        for piece in pieces or ['']:
+            if parts and len(parts[-1]) + 1 + len(piece) <= limit:
+                parts[-1] += '\n' + piece
+            else:
+                parts.append(piece)
+    return parts
+
+
+class CommandHandler:
+    """Отвечает на команды из чатов известных учеников.
+
+    В одном чате может быть несколько учеников (несколько токенов);
+    тогда ответ собирается по всем. Если задан `refresh(tenants)`, он
+    вызывается перед ответом — например, чтобы перечитать из общего
+    хранилища учеников, которых опрашивает другой процесс.
+    """
+
+    def __init__(self, tenants, refresh=None):
+        """Группирует учеников `tenants` по чатам."""
+        self.refresh = refresh
+        self.chats = {}
+        for tenant in tenants:
+            self.chats.setdefault(str(tenant.chat_id), []).append(tenant)
+        self.commands = {
+            '/status': self.status,
+            '/last': self.last,
+            '/start': self.help,
+            '/help': self.help,
+        }
+
+    def answer(self, chat_id, text):
+        """Текст ответа на сообщение или `None`, если отвечать не нужно."""
+        tenants = self.chats.get(str(chat_id))
+        if tenants is None or not text or not text.startswith('/'):
+            return None
+        command = text.split()[0].split('@', 1)[0].lower()
+        if self.refresh is not None:
+            self.refresh(tenants)
+        return self.commands.get(command, self.help)(tenants)
+
+    def status(self, tenants):
+        """Статусы всех известных боту работ."""
+        lines = []
+        for tenant in tenants:
+            # Снимок словаря: цикл опроса заменяет его целиком.
+            for record in tenant.homeworks.values():
+                status = STATUS_NAMES[record.status.value]
+                lines.append(f'«{record.name}»: {status}')
+        if not lines:
+            return 'Пока нет работ с известным статусом.'
+        return '\n'.join(lines)
+
+    def last(self, tenants):
+        """Последнее отправленное ученику уведомление."""
+        messages = [
+            tenant.last_message for tenant in tenants if tenant.last_message
+        ]
+        if not messages:
+            return 'Уведомлений пока не было.'
+        return '\n\n'.join(messages)
+
+    def help(self, tenants):
+        """Список команд."""
+        return HELP_TEXT
+
+
+class UpdatesListener:
+    """Получает сообщения через длинный опрос `getUpdates`.
+
+    Работает в отдельном потоке; ответы передаются в `reply(chat_id,
+    text)` — обычно это очередь отправки, общая с уведомлениями.
+    Длинный ответ делится на сообщения по MESSAGE_MAX_LENGTH символов.
+    Сбой обработки не останавливает поток: он пишется в лог. Пока
+    `active()` ложно, `getUpdates` не вызывается: Telegram допускает
+    только одного получателя обновлений на токен.
+    """
+
+    def __init__(self, bot, handler, reply, timeout=30, retry_delay=5,
+                 active=None):
+        """Готовит опрос; поток запускает `start()`."""
+        self.active = active
+        self.bot = bot
+        self.handler = handler
+        self.reply = reply
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.offset = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll_once(self):
+        """Один запрос `getUpdates`; возвращает число данных ответов."""
+        updates = self.bot.get_updates(
+            offset=self.offset, timeout=self.timeout,
+            read_latency=self.retry_delay, allowed_updates=['message']
+        )
+        handled = 0
+        for update in updates:
+            self.offset = update.update_id + 1
+            message = update.effective_message
+            if message is None:
+                continue
+            text = self.handler.answer(message.chat_id, message.text)
+            if text is not None:
+                for part in split_message(text):
+                    self.reply(message.chat_id, part)
+                handled += 1
+        return handled
+
+    def run(self):
+        """Опрашивает Telegram до вызова `stop()`."""
+        while not self._stop.is_set():
+            if self.active is not None and not self.active():
+                self._stop.wait(self.retry_delay)
+                continue
+            try:
+                self.poll_once()
+            except telegram.error.TimedOut:
+                continue
+            except telegram.TelegramError as error:
+                logger.error(f'Сбой получения команд: {error}')
+                self._stop.wait(self.retry_delay)
+            except Exception:
+                logger.exception('Сбой обработки команд')
+                self._stop.wait(self.retry_delay)
+
+    def start(self):
+        """Запускает опрос в фоновом потоке."""
+        self._thread = threading.Thread(
+            target=self.run, name='updates-listener', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает опрос после текущего запроса."""
+        self._stop.set()
@@ -0,0 +1,95 @@
+"""Отпечатки сбоев и сводки вместо повторных сообщений об ошибках."""
+import re
+import time
+
+FINGERPRINT_LENGTH = 200
+NORMALIZE = (
+    (re.compile(r'https?://\S+'), '<url>'),
+    (re.compile(r'0x[0-9a-fA-F]+'), '<hex>'),
+    (re.compile(r'\d+(\.\d+)?'), '<n>'),
+)
+
+
+def fingerprint(error):
+    """Класс исключения и текст без изменчивых частей.
+
+    Числа (коды ответа, метки времени, порты), адреса и URL заменяются
+    заглушками, чтобы один и тот же сбой с разными подробностями давал
+    один отпечаток.
+    """
+    text = str(error)
+    for pattern, replacement in NORMALIZE:
+        text = pattern.sub(replacement, text)
+    return type(error).__name__, text[:FINGERPRINT_LENGTH]
+
+
+class ErrorDigest:
+    """Сбои одного ученика с начала инцидента.
+
+    Первый сбой каждого вида сообщается сразу. Повторы только
+    считаются и раз в `window` секунд уходят одной сводкой; при
+    восстановлении отправляется итоговая сводка за весь инцидент.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        """Пустая сводка без сбоев."""
+        self.clock = clock
+        self.counts = {}
+        self.examples = {}
+        self.pending = {}
+        self.started_at = None
+        self.flushed_at = None
+
+    @property
+    def active(self):
+        """Идёт ли инцидент."""
+        return self.started_at is not None
+
+    def add(self, error, window):
+        """Учитывает сбой; возвращает `(новый ли вид, тексты для чата)`."""
+        now = self.clock()
+        if not self.active:
+            self.started_at = self.flushed_at = now
+        key = fingerprint(error)
+        new = key not in self.counts
+        self.counts[key] = self.counts.get(key, 0) + 1
+        messages = []
+        if new:
+            self.examples[key] = str(error)
+            messages.append(f'Сбой в работе программы: {error}')
+        else:
+            self.pending[key] = self.pending.get(key, 0) + 1
+        if self.pending and now - self.flushed_at >= window:
+            messages.append(self._summary(
+                f'Сбои продолжаются ({self._duration(now)})'
+            ))
+            self.pending = {}
+            self.flushed_at = now
+        return new, messages
+
+    def recover(self):
+        """Закрывает инцидент; возвращает итоговое сообщение, если он был."""
+        if not self.active:
+            return []
+        title = f'Работа восстановлена после сбоев ({self._duration()})'
+        if sum(self.counts.values()) > 1:
+            message = self._summary(title)
+        else:
+            message = title + '.'
+        self.counts, self.examples, self.pending = {}, {}, {}
+        self.started_at = self.flushed_at = None
+        return [message]
+
+    def _duration(self, now=None):
+        if now is None:
+            now = self.clock()
+        seconds = int(now - self.started_at)
+        return f'{seconds // 60} мин {seconds % 60} с'
+
+    def _summary(self, title):
+        lines = [f'{title}:']
+        for key, count in sorted(
+            self.counts.items(), key=lambda item: -item[1]
+        ):
+            lines.append(f'• {key[0]} ×{count}: {self.examples[key]}')
+        return '\n'.join(lines)
@@ -31,3 +31,18 @@ class KeywordStatusLost(Exception):
 class KeywordHomeworkNameLost(Exception):
     """Отсутствуют данные о названии домашней работы"""
     pass
+
+
+class TenantsFileInvalid(Exception):
+    """Некорректная строка в файле учеников."""
+    pass
+
+
+class CircuitOpen(URLNotAvailable):
+    """Запрос к API не выполнялся: автомат защиты разомкнут."""
+    pass
+
+
+class DeadlineExceeded(WrongRequestToAPI):
+    """API не ответил в пределах бюджета времени опроса."""
+    pass
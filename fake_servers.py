@@ -0,0 +1,491 @@
+"""Локальные заменители API Практикума и Telegram для нагрузочных тестов.
+
+Запуск::
+
+    python fake_servers.py --students 1000 --tenants-file tenants.csv
+        --practicum-latency lognormal:-3,0.5 --practicum-error-rate 0.01
+
+и затем бот с `PRACTICUM_ENDPOINT`, `TELEGRAM_API_URL` и
+`TENANTS_FILE`, которые печатает команда.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from sender import TokenBucket
+
+PRACTICUM_PATH = '/api/user_api/homework_statuses/'
+TRANSITIONS = {
+    None: ('reviewing',),
+    'reviewing': ('approved', 'rejected'),
+    'rejected': ('reviewing',),
+}
+MALFORMED_JSON = b'{"homeworks": [{"homework_name": '
+
+
+class Latency:
+    """Распределение задержки ответа, заданное строкой.
+
+    `const:0.05`, `uniform:0.01,0.1`, `exp:0.05` (среднее),
+    `lognormal:-3,0.5` (mu, sigma логарифма секунд).
+    """
+
+    def __init__(self, spec='const:0'):
+        """Разбирает строку распределения `spec`."""
+        kind, _, params = spec.partition(':')
+        values = [float(value) for value in params.split(',') if value]
+        distributions = {
+            'const': lambda rng: values[0],
+            'uniform': lambda rng: rng.uniform(values[0], values[1]),
+            'exp': lambda rng: rng.expovariate(1 / values[0]),
+            'lognormal': lambda rng: rng.lognormvariate(values[0], values[1]),
+        }
+        if kind not in distributions:
+            raise ValueError(f'Неизвестное распределение задержки: {spec}')
+        self.spec = spec
+        self._sample = distributions[kind]
+
+    def sample(self, rng):
+        """Задержка в секундах."""
+        return max(self._sample(rng), 0.0)
+
+
+class Faults:
+    """Вероятности сбоев в ответах заменителя."""
+
+    def __init__(self, latency='const:0', error_rate=0.0,
+                 error_statuses=(500, 502, 503), malformed_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=1, seed=None):
+        """Вероятности сбоев — доли ответов от 0 до 1."""
+        self.latency = Latency(latency)
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.malformed_rate = malformed_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def roll(self):
+        """Решает, каким будет ответ: `(задержка, сбой)`.
+
+        Сбой — `None`, `'rate_limit'`, `'malformed'` или код HTTP.
+        """
+        with self._lock:
+            delay = self.latency.sample(self.rng)
+            chance = self.rng.random()
+            status = self.rng.choice(self.error_statuses)
+        if chance < self.rate_limit_rate:
+            return delay, 'rate_limit'
+        chance -= self.rate_limit_rate
+        if chance < self.error_rate:
+            return delay, status
+        chance -= self.error_rate
+        if chance < self.malformed_rate:
+            return delay, 'malformed'
+        return delay, None
+
+
+class Student:
+    """Синтетический ученик со сменой статусов домашних работ во времени."""
+
+    def __init__(self, number, homeworks, transition_interval, seed=None):
+        """Ученик `student-<number>` с `homeworks` работами."""
+        self.token = f'student-{number}'
+        self.rng = random.Random(seed)
+        self.transition_interval = transition_interval
+        now = int(time.time())
+        self.homeworks = [
+            {
+                'id': number * 1000 + index,
+                'homework_name': f'{self.token}__hw{index}.zip',
+                'lesson_name': f'Спринт {index}',
+                'reviewer_comment': '',
+                'status': 'approved',
+                'date_updated': now - 86400 * (homeworks - index),
+            }
+            for index in range(homeworks)
+        ]
+        self.homeworks.append({
+            'id': number * 1000 + homeworks,
+            'homework_name': f'{self.token}__hw{homeworks}.zip',
+            'lesson_name': f'Спринт {homeworks}',
+            'reviewer_comment': '',
+            'status': None,
+            'date_updated': now,
+        })
+        self._next_transition = now + self._interval()
+        self._lock = threading.Lock()
+
+    def _interval(self):
+        return self.rng.expovariate(1 / self.transition_interval)
+
+    def _advance(self, now):
+        while self._next_transition <= now:
+            homework = self.homeworks[-1]
+            homework['status'] = self.rng.choice(
+                TRANSITIONS[homework['status']]
+            )
+            homework['date_updated'] = int(self._next_transition)
+            if homework['status'] == 'approved':
+                self.homeworks.append({
+                    **homework,
+                    'id': homework['id'] + 1,
+                    'homework_name': (
+                        f'{self.token}__hw{len(self.homeworks)}.zip'
+                    ),
+                    'status': None,
+                })
+            self._next_transition += self._interval()
+
+    def answer(self, from_date):
+        """Ответ API: работы, изменившиеся с `from_date`."""
+        now = time.time()
+        with self._lock:
+            self._advance(now)
+            homeworks = [
+                dict(homework) for homework in reversed(self.homeworks)
+                if homework['status'] is not None
+                and homework['date_updated'] >= from_date
+            ]
+        return {'homeworks': homeworks, 'current_date': int(now)}
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Заголовки и тело уходят разными записями: с алгоритмом Нейгла
+    # каждый запрос по keep-alive ждал бы отложенного ACK (~40 мс).
+    disable_nagle_algorithm = True
+    faults = None
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _fault(self):
+        """Отвечает сбоем, если он выпал; True, если ответ уже отправлен."""
+        delay, fault = self.faults.roll()
+        if delay:
+            time.sleep(delay)
+        if fault is None:
+            return False
+        if fault == 'rate_limit':
+            self._reply(HTTPStatus.TOO_MANY_REQUESTS, self._rate_limit_body())
+        elif fault == 'malformed':
+            self._reply(HTTPStatus.OK, MALFORMED_JSON)
+        else:
+            self._reply(fault, {'code': 'error', 'message': 'Сбой'})
+        return True
+
+    def _rate_limit_body(self):
+        return {'code': 'too_many_requests'}
+
+
+class FakePracticum:
+    """Заменитель `homework_statuses` для N синтетических учеников."""
+
+    def __init__(self, students, faults=None, homeworks=5,
+                 transition_interval=600, seed=None):
+        """Создаёт `students` учеников; запуск — `start()`."""
+        rng = random.Random(seed)
+        self.students = {
+            student.token: student
+            for student in (
+                Student(number, homeworks, transition_interval,
+                        seed=rng.random())
+                for number in range(students)
+            )
+        }
+        self.faults = faults or Faults(seed=seed)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = None
+
+    def handler(self):
+        """Класс обработчика запросов, связанный с этим заменителем."""
+        practicum = self
+
+        class Handler(_JSONHandler):
+            faults = practicum.faults
+
+            def do_GET(self):
+                with practicum._lock:
+                    practicum.requests += 1
+                url = urlsplit(self.path)
+                if url.path != PRACTICUM_PATH:
+                    self._reply(HTTPStatus.NOT_FOUND, {'code': 'not_found'})
+                    return
+                token = self.headers.get('Authorization', '')
+                student = practicum.students.get(token.partition(' ')[2])
+                if student is None:
+                    self._reply(
+                        HTTPStatus.UNAUTHORIZED,
+                        {'code': 'not_authenticated'}
+                    )
+                    return
+                if self._fault():
+                    return
+                params = parse_qs(url.query)
+                try:
+                    from_date = int(params.get('from_date', ['0'])[0])
+                except ValueError:
+                    self._reply(
+                        HTTPStatus.BAD_REQUEST, {'code': 'UnknownError'}
+                    )
+                    return
+                self._reply(HTTPStatus.OK, student.answer(from_date))
+
+        return Handler
+
+    def start(self, host='127.0.0.1', port=0):
+        """Запускает сервер в фоновом потоке."""
+        self.server = _start_server(self.handler(), host, port)
+        return self
+
+    @property
+    def url(self):
+        """Адрес эндпоинта для `PRACTICUM_ENDPOINT`."""
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}{PRACTICUM_PATH}'
+
+    def stop(self):
+        """Останавливает сервер."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeTelegram:
+    """Заменитель Bot API: `sendMessage` и `getUpdates` со сбоями.
+
+    Кроме случайных 429 из `faults`, сервер отвечает 429 при
+    превышении `rate_limit` сообщений в секунду, как настоящий Telegram.
+    Входящие сообщения учеников добавляются через `push_message()`.
+    """
+
+    def __init__(self, faults=None, rate_limit=None, keep_messages=1000):
+        """Хранит последние `keep_messages` сообщений; запуск — `start()`."""
+        self.faults = faults or Faults()
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+        self.keep_messages = keep_messages
+        self.messages = []
+        self.received = 0
+        self.updates = []
+        self._lock = threading.Lock()
+        self._updates_ready = threading.Condition(self._lock)
+        self.server = None
+
+    def push_message(self, chat_id, text):
+        """Имитирует сообщение ученика боту."""
+        with self._updates_ready:
+            update_id = len(self.updates) + 1
+            self.updates.append({'update_id': update_id, 'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': int(chat_id), 'type': 'private'},
+                'text': text,
+            }})
+            self._updates_ready.notify_all()
+        return update_id
+
+    def _pending_updates(self, offset, timeout):
+        offset = max(int(offset or 1), 1)
+        with self._updates_ready:
+            self._updates_ready.wait_for(
+                lambda: len(self.updates) >= offset, timeout=float(timeout)
+            )
+            return self.updates[offset - 1:]
+
+    def _record(self, chat_id, text):
+        with self._lock:
+            self.received += 1
+            self.messages.append((chat_id, text))
+            del self.messages[:-self.keep_messages]
+            return self.received
+
+    def handler(self):
+        """Класс обработчика запросов, связанный с этим заменителем."""
+        fake = self
+
+        class Handler(_JSONHandler):
+            faults = fake.faults
+
+            def _rate_limit_body(self):
+                retry_after = fake.faults.retry_after
+                return {
+                    'ok': False, 'error_code': 429,
+                    'description': (
+                        f'Too Many Requests: retry after {retry_after}'
+                    ),
+                    'parameters': {'retry_after': retry_after},
+                }
+
+            def _read_params(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length).decode()
+                if 'json' in self.headers.get('Content-Type', ''):
+                    return json.loads(body or '{}')
+                return {
+                    key: values[0] for key, values in parse_qs(body).items()
+                }
+
+            def do_POST(self):
+                method = self.path.rsplit('/', 1)[-1]
+                params = self._read_params()
+                if self._fault():
+                    return
+                if method == 'getUpdates':
+                    self._reply(HTTPStatus.OK, {
+                        'ok': True, 'result': fake._pending_updates(
+                            params.get('offset'), params.get('timeout', 0)
+                        )
+                    })
+                    return
+                if fake.bucket is not None and fake.bucket.reserve() > 0:
+                    self._reply(
+                        HTTPStatus.TOO_MANY_REQUESTS, self._rate_limit_body()
+                    )
+                    return
+                if method != 'sendMessage':
+                    self._reply(HTTPStatus.NOT_FOUND, {
+                        'ok': False, 'error_code': 404,
+                        'description': 'Not Found'
+                    })
+                    return
+                chat_id = params.get('chat_id')
+                text = params.get('text')
+                message_id = fake._record(chat_id, text)
+                self._reply(HTTPStatus.OK, {'ok': True, 'result': {
+                    'message_id': message_id,
+                    'date': int(time.time()),
+                    'chat': {'id': int(chat_id), 'type': 'private'},
+                    'text': text,
+                }})
+
+        return Handler
+
+    def start(self, host='127.0.0.1', port=0):
+        """Запускает сервер в фоновом потоке."""
+        self.server = _start_server(self.handler(), host, port)
+        return self
+
+    @property
+    def url(self):
+        """Базовый адрес для `TELEGRAM_API_URL`."""
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/bot'
+
+    def stop(self):
+        """Останавливает сервер."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def _start_server(handler, host, port):
+    server = _Server((host, port), handler)
+    threading.Thread(
+        target=server.serve_forever, name='fake-server', daemon=True
+    ).start()
+    return server
+
+
+def write_tenants_file(path, practicum, first_chat_id=1):
+    """Записывает файл учеников для `TENANTS_FILE`."""
+    with open(path, 'w', encoding='UTF-8') as tenants_file:
+        for chat_id, token in enumerate(practicum.students, first_chat_id):
+            tenants_file.write(f'{token},{chat_id}\n')
+
+
+def parse_args():
+    """Параметры командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--practicum-port', type=int, default=8081)
+    parser.add_argument('--telegram-port', type=int, default=8082)
+    parser.add_argument('--students', type=int, default=100)
+    parser.add_argument('--homeworks', type=int, default=5)
+    parser.add_argument('--transition-interval', type=float, default=600)
+    parser.add_argument('--tenants-file')
+    parser.add_argument('--seed', type=int)
+    for service in ('practicum', 'telegram'):
+        parser.add_argument(f'--{service}-latency', default='const:0')
+        parser.add_argument(
+            f'--{service}-error-rate', type=float, default=0.0
+        )
+        parser.add_argument(
+            f'--{service}-error-statuses', default='500,502,503'
+        )
+        parser.add_argument(
+            f'--{service}-malformed-rate', type=float, default=0.0
+        )
+        parser.add_argument(
+            f'--{service}-rate-limit-rate', type=float, default=0.0
+        )
+    parser.add_argument('--telegram-rate-limit', type=float, default=30)
+    return parser.parse_args()
+
+
+def make_faults(args, service):
+    """Сбои сервиса из параметров `--<service>-*` командной строки."""
+    def option(name):
+        return getattr(args, f'{service}_{name}')
+
+    return Faults(
+        latency=option('latency'),
+        error_rate=option('error_rate'),
+        error_statuses=[
+            int(code) for code in option('error_statuses').split(',')
+        ],
+        malformed_rate=option('malformed_rate'),
+        rate_limit_rate=option('rate_limit_rate'),
+        seed=args.seed,
+    )
+
+
+def main():
+    """Запускает оба заменителя до прерывания."""
+    args = parse_args()
+    practicum = FakePracticum(
+        args.students, make_faults(args, 'practicum'),
+        homeworks=args.homeworks,
+        transition_interval=args.transition_interval, seed=args.seed
+    ).start(args.host, args.practicum_port)
+    telegram_api = FakeTelegram(
+        make_faults(args, 'telegram'), rate_limit=args.telegram_rate_limit
+    ).start(args.host, args.telegram_port)
+    if args.tenants_file:
+        write_tenants_file(args.tenants_file, practicum)
+    print(f'PRACTICUM_ENDPOINT={practicum.url}')
+    print(f'TELEGRAM_API_URL={telegram_api.url}')
+    if args.tenants_file:
+        print(f'TENANTS_FILE={args.tenants_file}')
+    try:
+        while True:
+            time.sleep(60)
+            print(
+                f'запросов к API: {practicum.requests}, '
+                f'сообщений: {telegram_api.received}'
+            )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Бюджет времени на запрос и дублирующие (hedged) запросы."""
+import collections
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import exceptions
+import metrics
+
+WINDOW = 1000
+MIN_SAMPLES = 20
+HEDGE_QUANTILE = 0.95
+
+HEDGED_REQUESTS = metrics.counter(
+    'homework_hedged_requests_total', 'Отправленные дублирующие запросы к API'
+)
+HEDGE_WINS = metrics.counter(
+    'homework_hedge_wins_total', 'Дублирующий запрос ответил первым'
+)
+DEADLINE_EXCEEDED = metrics.counter(
+    'homework_deadline_exceeded_total', 'Запросы, не уложившиеся в бюджет'
+)
+
+
+class LatencyTracker:
+    """Скользящее окно последних задержек для оценки перцентилей."""
+
+    def __init__(self, window=WINDOW):
+        """Окно на `window` последних замеров."""
+        self._samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        """Добавляет задержку успешного запроса."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, share, min_samples=MIN_SAMPLES):
+        """Перцентиль окна или `None`, пока замеров мало."""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(share * len(ordered)), len(ordered) - 1)]
+
+
+class HedgedCaller:
+    """Выполняет вызов в пуле потоков не дольше `deadline`.
+
+    Если включён `hedge` и первый вызов не ответил за наблюдаемый p95,
+    отправляется второй такой же; берётся первый успешный ответ, а к
+    опоздавшему применяется `discard` (например, закрыть соединение).
+    Прервать уже идущий HTTP-запрос нельзя, поэтому пул рассчитан на
+    два вызова на опрос.
+    """
+
+    def __init__(self, workers, hedge=False, tracker=None,
+                 quantile=HEDGE_QUANTILE):
+        """Пул на `workers` потоков."""
+        self.hedge = hedge
+        self.tracker = tracker or LatencyTracker()
+        self.quantile = quantile
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='api-call'
+        )
+
+    def _hedge_delay(self, budget):
+        if not self.hedge:
+            return None
+        delay = self.tracker.quantile(self.quantile)
+        if delay is None or delay >= budget:
+            return None
+        return delay
+
+    def _timed(self, function):
+        started = time.monotonic()
+        result = function()
+        return result, time.monotonic() - started
+
+    def call(self, function, deadline, discard=None):
+        """Результат `function()`; после `deadline` — `DeadlineExceeded`.
+
+        `deadline` — момент по `time.monotonic()`. Исключение первого
+        завершившегося вызова пробрасывается, только если второго нет
+        или он тоже завершился ошибкой.
+        """
+        budget = deadline - time.monotonic()
+        if budget <= 0:
+            DEADLINE_EXCEEDED.inc()
+            raise exceptions.DeadlineExceeded(
+                'Бюджет времени исчерпан до запроса'
+            )
+        first = self._executor.submit(self._timed, function)
+        pending = {first}
+        delay = self._hedge_delay(budget)
+        if delay is not None and not wait(pending, timeout=delay).done:
+            HEDGED_REQUESTS.inc()
+            pending.add(self._executor.submit(self._timed, function))
+        error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(
+                pending, timeout=remaining, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                result, seconds = future.result()
+                self.tracker.observe(seconds)
+                if future is not first:
+                    HEDGE_WINS.inc()
+                self._discard_later((done - {future}) | pending, discard)
+                return result
+        self._discard_later(pending, discard)
+        if error is not None and not pending:
+            raise error
+        DEADLINE_EXCEEDED.inc()
+        raise exceptions.DeadlineExceeded(
+            f'Нет ответа за {budget:.1f} с бюджета опроса'
+        )
+
+    def _discard_later(self, futures, discard):
+        def discard_result(future):
+            if future.exception() is None:
+                discard(future.result()[0])
+
+        for future in futures:
+            if not future.cancel() and discard is not None:
+                future.add_done_callback(discard_result)
+
+    def close(self):
+        """Останавливает пул, не дожидаясь опоздавших вызовов."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
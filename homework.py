@@ -1,26 +1,98 @@
 import json
 import logging
 import os
+import signal
 import sys
 import time
+from functools import partial
 from http import HTTPStatus
 
-import requests
-import telegram
-from dotenv import load_dotenv
-
 import exceptions
+import metrics
+from interval_policy import AdaptiveInterval, FixedInterval
+from records import Homework, HomeworkStatus
+from tenants import Tenant, load_tenants, token_key
+
+
+def load_env_file():
+    """Подгружает `.env`, если он есть; python-dotenv импортируется лишь тогда.
+
+    Файл ищется в текущем каталоге и рядом с модулем.
+    """
+    for directory in (os.getcwd(), os.path.dirname(os.path.abspath(__file__))):
+        path = os.path.join(directory, '.env')
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+            load_dotenv(path)
+            return
 
-load_dotenv()
+
+load_env_file()
 
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+TENANTS_FILE = os.getenv('TENANTS_FILE')
+POLL_WORKERS = int(os.getenv('POLL_WORKERS', 32))
+EXECUTION_MODE = os.getenv('EXECUTION_MODE', 'threads')
+POLL_POLICY = os.getenv('POLL_POLICY', 'adaptive')
+POLL_INTERVAL_ACTIVE = float(os.getenv('POLL_INTERVAL_ACTIVE', 120))
+POLL_INTERVAL_MIN = float(os.getenv('POLL_INTERVAL_MIN', 60))
+POLL_INTERVAL_MAX = float(os.getenv('POLL_INTERVAL_MAX', 1800))
+SENDER_WORKERS = int(os.getenv('SENDER_WORKERS', 4))
+SEND_QUEUE_SIZE = int(os.getenv('SEND_QUEUE_SIZE', 10000))
+OUTBOX_FILE = os.getenv('OUTBOX_FILE', 'bot_outbox.jsonl')
+NOTIFY_SINKS = os.getenv('NOTIFY_SINKS', '')
+SINK_QUEUE_SIZE = int(os.getenv('SINK_QUEUE_SIZE', 1000))
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+LOG_FILE = os.getenv('LOG_FILE', 'bot_log_file')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN')
+LOG_JSON = os.getenv('LOG_JSON', '') == '1'
+LOG_SAMPLE_WINDOW = float(os.getenv('LOG_SAMPLE_WINDOW', 60))
+LOG_SAMPLE_LIMIT = int(os.getenv('LOG_SAMPLE_LIMIT', 5))
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+STREAM_JSON = os.getenv('STREAM_JSON', '') == '1'
+STREAM_CHUNK_SIZE = 16 * 1024
+STATE_DB = os.getenv('STATE_DB', 'bot_state.sqlite3')
+STATE_FLUSH_INTERVAL = float(os.getenv('STATE_FLUSH_INTERVAL', 5))
+SHARDING = os.getenv('SHARDING', '') == '1'
+SHARD_DB = os.getenv('SHARD_DB', STATE_DB)
+SHARD_WORKER_ID = os.getenv('SHARD_WORKER_ID')
+SHARD_LEASE_TTL = float(os.getenv('SHARD_LEASE_TTL', 30))
+POLL_DEADLINE = float(os.getenv('POLL_DEADLINE', 30))
+HEDGE_REQUESTS = os.getenv('HEDGE_REQUESTS', '') == '1'
+TRACE_FILE = os.getenv('TRACE_FILE')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', 8))
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 20))
+ERROR_DIGEST_WINDOW = float(os.getenv('ERROR_DIGEST_WINDOW', 600))
+TELEGRAM_COMMANDS = os.getenv('TELEGRAM_COMMANDS', '1') == '1'
+TELEGRAM_UPDATES_TIMEOUT = int(os.getenv('TELEGRAM_UPDATES_TIMEOUT', 30))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', 30))
+API_TIMEOUT = (
+    float(os.getenv('API_CONNECT_TIMEOUT', 3.05)),
+    float(os.getenv('API_READ_TIMEOUT', 10)),
+)
 
 RETRY_TIME = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+MESSAGE_MAX_LENGTH = 4096
+ENDPOINT = os.getenv(
+    'PRACTICUM_ENDPOINT',
+    'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+UPSTREAM_FAILURE_CODES = frozenset((
+    HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.BAD_GATEWAY, HTTPStatus.SERVICE_UNAVAILABLE,
+    HTTPStatus.GATEWAY_TIMEOUT,
+))
 
 
 HOMEWORK_STATUSES = {
@@ -28,53 +100,188 @@ HOMEWORK_STATUSES = {
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+STATUS_CHANGE_PREFIX = 'Изменился статус проверки работы'
 
 
-"""Настройка логгирования с отправкой сообщения об ошибке в чат telegram."""
-logging.basicConfig(
-    level=logging.INFO,
-    filename='project_log.log',
-    format='%(asctime)s - %(levelname)s - %(name)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
-handler_stream = logging.StreamHandler()
-logger.addHandler(handler_stream)
-handler_file = logging.FileHandler(
-    filename='bot_log_file', mode='w', encoding='UTF-8'
+
+FUNCTION_SECONDS = metrics.histogram(
+    'homework_function_seconds', 'Время выполнения функций бота, с',
+    labelnames=('function',)
+)
+POLL_SECONDS = metrics.histogram(
+    'homework_poll_seconds', 'Время полного цикла опроса ученика, с'
 )
-logger.addHandler(handler_file)
-formatter = logging.Formatter(
-    '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+POLL_ERRORS = metrics.counter(
+    'homework_poll_errors_total', 'Сбои опроса по типу исключения',
+    labelnames=('exception',)
+)
+MESSAGES_SENT = metrics.counter(
+    'homework_messages_sent_total', 'Отправленные сообщения Telegram'
 )
-handler_file.setFormatter(formatter)
 
+log_listener = None
+api_session = None
+circuit_breaker = None
+api_caller = None
+trace_recorder = None
+profiler = None
+state_store = None
+outbox = None
+message_sender = None
+fan_out = None
+updates_listener = None
+shard = None
+
+
+@metrics.timed(FUNCTION_SECONDS, 'send_message')
+def send_chat_message(bot, chat_id, message):
+    """Отправляет сообщение в указанный чат Telegram."""
+    import telegram
 
-def send_message(bot, message):
-    """Отправляет сообщение в Telegram чат."""
     try:
         bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID,
+            chat_id=chat_id,
             text=message
         )
+        MESSAGES_SENT.inc()
         logger.info('Сообщение успешно отправлено')
     except telegram.TelegramError as error:
         logger.error(f'Сбой отправки сообщения: {error}')
 
 
-def get_api_answer(current_timestamp):
-    """Проверка доступности URL ENDPOINT."""
-    timestamp = current_timestamp
-    params = {'from_date': timestamp}
-    try:
-        response = requests.get(
-            ENDPOINT, headers=HEADERS, params=params
+def send_message(bot, message):
+    """Отправляет сообщение в Telegram чат."""
+    send_chat_message(bot, TELEGRAM_CHAT_ID, message)
+
+
+def queue_message(bot, chat_id, message):
+    """Передаёт сообщение в очередь отправки, если она настроена.
+
+    С журналом `outbox` сообщение сначала фиксируется на диске; такое же
+    сообщение, ещё ждущее доставки, повторно не ставится — тогда
+    возвращается False. Сообщение, не поместившееся в очередь, остаётся
+    в журнале до перезапуска.
+    """
+    if message_sender is None:
+        send_chat_message(bot, chat_id, message)
+        return True
+    key = None
+    if outbox is not None:
+        key = outbox.append(chat_id, message)
+        if key is None:
+            return False
+    if not message_sender.submit(chat_id, message, key) and key is not None:
+        outbox.forget(key)
+    return True
+
+
+def is_status_change(message):
+    """Сообщает ли текст о смене статуса работы, а не о сбое или сводке."""
+    return message.startswith(STATUS_CHANGE_PREFIX)
+
+
+def notify(bot, chat_id, message):
+    """Уведомление ученика в его чат.
+
+    Копии в приёмники `fan_out` получают только смены статуса: сбои,
+    восстановления и сводки истории касаются лишь самого ученика.
+    """
+    if trace_recorder is not None:
+        trace_recorder.record_send(chat_id, message)
+    if (queue_message(bot, chat_id, message) and fan_out is not None
+            and is_status_change(message)):
+        fan_out.publish(chat_id, message)
+
+
+def send_reply(bot, chat_id, message):
+    """Ответ на команду чата: только в этот чат, без копий в приёмники."""
+    if trace_recorder is not None:
+        trace_recorder.record_send(chat_id, message, source='command')
+    queue_message(bot, chat_id, message)
+
+
+def api_get(headers, params, stream=False, deadline=None):
+    """GET к ENDPOINT: напрямую или через `api_caller` с бюджетом.
+
+    С настроенным `api_caller` запрос укладывается в бюджет до
+    `deadline` (по умолчанию POLL_DEADLINE секунд), а при HEDGE_REQUESTS
+    медленный запрос дублируется; опоздавший ответ закрывается.
+    """
+    import requests
+
+    http = api_session or requests
+    if api_caller is None:
+        return http.get(
+            ENDPOINT, headers=headers, params=params, timeout=API_TIMEOUT,
+            stream=stream
         )
+    if deadline is None:
+        deadline = time.monotonic() + POLL_DEADLINE
+    remaining = max(deadline - time.monotonic(), 0.001)
+    get = partial(
+        http.get, ENDPOINT, headers=headers, params=params, stream=stream,
+        timeout=tuple(min(part, remaining) for part in API_TIMEOUT)
+    )
+    return api_caller.call(get, deadline, discard=lambda late: late.close())
+
+
+def headers_key(headers):
+    """Ключ ученика по заголовку `Authorization: OAuth <токен>`."""
+    return token_key(headers['Authorization'].split(' ', 1)[-1])
+
+
+def record_upstream(failed):
+    """Сообщает автомату защиты исход запроса к API."""
+    if circuit_breaker is None:
+        return
+    if failed:
+        circuit_breaker.record_failure()
+    else:
+        circuit_breaker.record_success()
+
+
+def request_api(headers, params, stream=False, deadline=None):
+    """GET к ENDPOINT через автомат защиты, если он настроен.
+
+    Сбоями API считаются ошибки соединения, превышение бюджета и ответы
+    5xx/429; прочие коды (например, неверный токен одного ученика)
+    автомат не размыкают. Превышение бюджета — `DeadlineExceeded`,
+    подвид `WrongRequestToAPI`.
+    """
+    import requests
+
+    if circuit_breaker is not None:
+        circuit_breaker.before_call()
+    get = partial(api_get, headers, params, stream, deadline)
+    if trace_recorder is not None:
+        get = partial(
+            trace_recorder.record_api, headers_key(headers), params, get
+        )
+    try:
+        response = get()
+    except exceptions.DeadlineExceeded:
+        record_upstream(failed=True)
+        raise
     except requests.RequestException as error:
+        record_upstream(failed=True)
         message = f'Не удалось выполнить запрос к API: {error}'
         raise exceptions.WrongRequestToAPI(message)
+    record_upstream(failed=response.status_code in UPSTREAM_FAILURE_CODES)
     if response.status_code != HTTPStatus.OK:
+        if stream:
+            response.close()
         message = f'URL {ENDPOINT} недоступен'
         raise exceptions.URLNotAvailable(message)
+    return response
+
+
+@metrics.timed(FUNCTION_SECONDS, 'get_api_answer')
+def fetch_api_answer(current_timestamp, headers, deadline=None):
+    """Запрашивает статусы домашних работ с заданными заголовками."""
+    timestamp = current_timestamp
+    params = {'from_date': timestamp}
+    response = request_api(headers, params, deadline=deadline)
     try:
         return response.json()
     except json.JSONDecodeError as error:
@@ -82,21 +289,102 @@ def get_api_answer(current_timestamp):
         raise exceptions.JSONInvalidCode(message)
 
 
+def timed_iteration(items, function):
+    """Отдаёт элементы `items`, учитывая время их получения.
+
+    Суммарное время попадает в FUNCTION_SECONDS с меткой `function`
+    одним наблюдением, когда перебор закончен или прерван.
+    """
+    spent = 0.0
+    iterator = iter(items)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                spent += time.perf_counter() - started
+            yield item
+    finally:
+        FUNCTION_SECONDS.labels(function).observe(spent)
+
+
+@metrics.timed(FUNCTION_SECONDS, 'get_api_answer')
+def stream_api_answer(current_timestamp, headers, deadline=None):
+    """Как `fetch_api_answer`, но тело ответа читается по частям.
+
+    Возвращает `StreamedAnswer`; соединение освобождается при его
+    закрытии. Чтение тела учитывается отдельно, как `read_body`.
+    """
+    from json_stream import StreamedAnswer
+
+    params = {'from_date': current_timestamp}
+    response = request_api(headers, params, stream=True, deadline=deadline)
+    return StreamedAnswer(
+        timed_iteration(
+            response.iter_content(STREAM_CHUNK_SIZE), 'read_body'
+        ),
+        close=response.close
+    )
+
+
+def get_api_answer(current_timestamp):
+    """Проверка доступности URL ENDPOINT."""
+    return fetch_api_answer(current_timestamp, HEADERS)
+
+
+@metrics.timed(FUNCTION_SECONDS, 'check_response')
 def check_response(response):
     """Проверяет ответ API на корректность."""
-    if not isinstance(response['homeworks'], list):
+    homeworks = response['homeworks']
+    if not isinstance(homeworks, list):
         message = 'Тип данных response["homeworks"] не list'
         raise exceptions.DataTypeNotCorrect(message)
-    if not isinstance(response['homeworks'][0], dict):
-        message = 'Тип данных response["homeworks"][0] не dict'
+    for index, homework in enumerate(homeworks):
+        check_homework(index, homework)
+    return homeworks
+
+
+def check_homework(index, homework):
+    """Проверяет одну домашнюю работу из ответа API."""
+    if not isinstance(homework, dict):
+        message = f'Тип данных response["homeworks"][{index}] не dict'
         raise exceptions.DataTypeNotCorrect(message)
-    if response['homeworks'][0].get('homework_name') is None:
+    if homework.get('homework_name') is None:
         logger.error('Отсутствуют данные о названии домашней работы')
-    return response['homeworks']
 
 
+def check_streamed_response(answer):
+    """Потоковый вариант `check_response`: отдаёт проверенные работы."""
+    import requests
+
+    try:
+        for index, homework in enumerate(answer.items()):
+            check_homework(index, homework)
+            yield homework
+    except json.JSONDecodeError as error:
+        message = f'JSON сломан: {error}'
+        raise exceptions.JSONInvalidCode(message)
+    except TypeError as error:
+        raise exceptions.DataTypeNotCorrect(str(error))
+    except requests.RequestException as error:
+        message = f'Не удалось дочитать ответ API: {error}'
+        raise exceptions.WrongRequestToAPI(message)
+    if 'homeworks' not in answer.fields:
+        raise KeyError('homeworks')
+    if answer.fields['homeworks'] != []:
+        message = 'Тип данных response["homeworks"] не list'
+        raise exceptions.DataTypeNotCorrect(message)
+
+
+@metrics.timed(FUNCTION_SECONDS, 'parse_status')
 def parse_status(homework):
     """Извлекает из информации о домашней работе статус этой работы."""
+    if isinstance(homework, Homework):
+        verdict = HOMEWORK_STATUSES[homework.status.value]
+        return f'{STATUS_CHANGE_PREFIX} "{homework.name}". {verdict}'
     homework_name = homework.get('homework_name')
     homework_status = homework.get('status')
     try:
@@ -109,7 +397,7 @@ def parse_status(homework):
         logger.error(message)
         raise exceptions.KeywordHomeworkNameLost(message)
     if homework_status is not None:
-        return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+        return f'{STATUS_CHANGE_PREFIX} "{homework_name}". {verdict}'
     else:
         message = 'Отсутстувует ключевое слово "status"'
         raise exceptions.KeywordStatusLost(message)
@@ -129,30 +417,747 @@ def check_tokens():
     return True
 
 
-def main():
-    """Основная логика работы бота."""
-    if not check_tokens():
+def diff_homeworks(tenant, homeworks):
+    """Смены статуса относительно индекса `tenant.homeworks`.
+
+    Каждая работа один раз превращается в запись `Homework` (с
+    проверкой статуса и названия). Возвращает `(запись, текст
+    уведомления)` только для работ, чей статус отличается от известного.
+    Работа с неизвестным статусом или без названия пишется в лог и
+    пропускается: она не должна задерживать остальные работы и сдвиг
+    `current_date`.
+    """
+    changes = []
+    for homework in homeworks:
+        try:
+            record = Homework.from_dict(homework)
+        except (exceptions.NoHomeworkStatus,
+                exceptions.KeywordHomeworkNameLost) as error:
+            POLL_ERRORS.labels(type(error).__name__).inc()
+            logger.error(f'Пропущена работа ученика {tenant}: {error}')
+            continue
+        known = tenant.homeworks.get(record.key)
+        if known is None or known.status is not record.status:
+            changes.append((record, parse_status(record)))
+    return changes
+
+
+def apply_changes(tenant, changes, current_date):
+    """Обновляет индекс и состояние ученика, возвращает уведомления.
+
+    Индекс заменяется новым словарем, а не меняется на месте: команды
+    чата читают его из другого потока и всегда видят целый снимок.
+    """
+    if changes:
+        homeworks = dict(tenant.homeworks)
+        for record, _ in changes:
+            homeworks[record.key] = record
+            if state_store is not None:
+                state_store.set_status(
+                    tenant.key, record.key, record.status.value, record.name
+                )
+        tenant.homeworks = homeworks
+        tenant.last_message = changes[-1][1]
+    tenant.current_timestamp = current_date
+    if state_store is not None:
+        state_store.set_current_date(tenant.key, tenant.current_timestamp)
+    tenant.last_error = None
+    tenant.retry_after = None
+    tenant.failures = 0
+    tenant.idle_polls = 0 if changes else tenant.idle_polls + 1
+    return tenant.errors.recover() + [message for _, message in changes]
+
+
+def process_answer(tenant, response):
+    """Разбирает ответ API и возвращает тексты уведомлений.
+
+    Каждая работа из ответа сверяется с индексом `tenant.homeworks` по
+    ключу: в уведомления попадают только смены статуса, а уже
+    виденный статус повторно не отправляется. Работа, которую не
+    удалось разобрать, пропускается (см. `diff_homeworks`); индекс и
+    `current_date` всё равно обновляются по остальным работам.
+    """
+    changes = diff_homeworks(tenant, check_response(response))
+    return apply_changes(
+        tenant, changes,
+        response.get('current_date', tenant.current_timestamp)
+    )
+
+
+def process_streamed_answer(tenant, answer):
+    """Как `process_answer`, но работы читаются из ответа по одной.
+
+    Время `check_response` здесь включает чтение и разбор тела.
+    """
+    with answer:
+        changes = diff_homeworks(tenant, timed_iteration(
+            check_streamed_response(answer), 'check_response'
+        ))
+    return apply_changes(
+        tenant, changes,
+        answer.fields.get('current_date', tenant.current_timestamp)
+    )
+
+
+def poll_answer(tenant):
+    """Запрашивает API и возвращает уведомления для ученика.
+
+    Бюджет POLL_DEADLINE отсчитывается от начала опроса.
+    """
+    deadline = time.monotonic() + POLL_DEADLINE
+    if STREAM_JSON:
+        answer = stream_api_answer(
+            tenant.current_timestamp, tenant.headers, deadline
+        )
+        return process_streamed_answer(tenant, answer)
+    response = fetch_api_answer(
+        tenant.current_timestamp, tenant.headers, deadline
+    )
+    return process_answer(tenant, response)
+
+
+def process_error(tenant, error):
+    """Учитывает сбой и возвращает тексты для чата.
+
+    Сбои группируются по отпечатку (класс исключения и текст без
+    изменчивых частей): о новом виде сбоя сообщается сразу, повторы
+    попадают в сводку раз в ERROR_DIGEST_WINDOW секунд. Опрос,
+    отклонённый автоматом защиты, в чат не сообщается: о сбоях API,
+    разомкнувших автомат, ученик уже знает. Сбоем ученика он тоже не
+    считается: опрос повторяется, когда автомат пропустит запрос.
+    """
+    POLL_ERRORS.labels(type(error).__name__).inc()
+    if isinstance(error, exceptions.CircuitOpen):
+        logger.debug(f'Опрос {tenant} пропущен: {error}')
+        if circuit_breaker is not None:
+            tenant.retry_after = circuit_breaker.retry_after()
+        return []
+    tenant.retry_after = None
+    tenant.last_error = error
+    tenant.failures += 1
+    new, messages = tenant.errors.add(error, ERROR_DIGEST_WINDOW)
+    message = f'Сбой в работе программы: {error}'
+    if new:
+        logger.error(message)
+    else:
+        logger.debug(message)
+    return messages
+
+
+@metrics.timed(POLL_SECONDS)
+def poll_tenant(bot, tenant):
+    """Один цикл опроса ученика: запрос, проверка, уведомление."""
+    try:
+        messages = poll_answer(tenant)
+    except Exception as error:
+        messages = process_error(tenant, error)
+    for message in messages:
+        notify(bot, tenant.chat_id, message)
+
+
+def backfill_tenant(tenant, since):
+    """Загружает историю ученика с `since` и заполняет индекс статусов.
+
+    Уведомления не отправляются. Возвращает записи работ, чей статус
+    боту ещё не был известен; `current_timestamp` назад не сдвигается.
+    """
+    response = fetch_api_answer(since, tenant.headers)
+    changes = diff_homeworks(tenant, check_response(response))
+    current_date = response.get('current_date', tenant.current_timestamp)
+    apply_changes(
+        tenant, changes, max(current_date, tenant.current_timestamp)
+    )
+    return [record for record, _ in changes]
+
+
+def digest_messages(since, records):
+    """Сводка истории для чата, разбитая по MESSAGE_MAX_LENGTH символов."""
+    day = time.strftime('%d.%m.%Y', time.localtime(since))
+    lines = [f'История проверок с {day}, работ: {len(records)}']
+    lines += [
+        f'"{record.name}": {HOMEWORK_STATUSES[record.status.value]}'
+        for record in records
+    ]
+    messages = [lines[0]]
+    for line in lines[1:]:
+        if len(messages[-1]) + 1 + len(line) > MESSAGE_MAX_LENGTH:
+            messages.append(line[:MESSAGE_MAX_LENGTH])
+        else:
+            messages[-1] += '\n' + line
+    return messages
+
+
+def run_backfill(bot, tenants, since, workers):
+    """Загружает историю учеников в пуле из `workers` потоков.
+
+    В каждый чат уходит одна сводка по всем его ученикам (длинная
+    делится на несколько сообщений), а не уведомление на каждую работу.
+    Возвращает число учеников, историю которых загрузить не удалось.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    chats = {}
+    failed = 0
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix='backfill'
+    ) as executor:
+        futures = [
+            (tenant, executor.submit(backfill_tenant, tenant, since))
+            for tenant in tenants
+        ]
+        for tenant, future in futures:
+            try:
+                records = future.result()
+            except Exception as error:
+                failed += 1
+                logger.error(f'Не удалось загрузить историю {tenant}: {error}')
+                continue
+            chats.setdefault(tenant.chat_id, []).extend(records)
+    for chat_id, records in chats.items():
+        if records:
+            for message in digest_messages(since, records):
+                notify(bot, chat_id, message)
+    logger.info(
+        f'История загружена: учеников {len(tenants) - failed} '
+        f'из {len(tenants)}, чатов со сводкой '
+        f'{sum(bool(records) for records in chats.values())}'
+    )
+    return failed
+
+
+async def async_get_api_answer(current_timestamp, headers):
+    """Асинхронный вариант `fetch_api_answer` для цикла asyncio."""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, fetch_api_answer, current_timestamp, headers
+    )
+
+
+async def async_send_message(bot, chat_id, message):
+    """Асинхронный вариант `send_chat_message` для цикла asyncio."""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        None, send_chat_message, bot, chat_id, message
+    )
+
+
+async def async_poll_tenant(bot, tenant):
+    """Один цикл опроса ученика внутри цикла asyncio."""
+    import asyncio
+
+    try:
+        if STREAM_JSON:
+            loop = asyncio.get_running_loop()
+            messages = await loop.run_in_executor(None, poll_answer, tenant)
+        else:
+            response = await async_get_api_answer(
+                tenant.current_timestamp, tenant.headers
+            )
+            messages = process_answer(tenant, response)
+    except Exception as error:
+        messages = process_error(tenant, error)
+    for message in messages:
+        if message_sender is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, notify, bot, tenant.chat_id, message
+            )
+        else:
+            await async_send_message(bot, tenant.chat_id, message)
+
+
+def configure_api_session(pool_size):
+    """Включает общий пул соединений для запросов к ENDPOINT.
+
+    С автоматом защиты ответы 5xx внутри сессии не повторяются: иначе
+    каждый сбой во время отказа API — три запроса вместо одного.
+    """
+    from api_session import RETRY_STATUSES, ApiSession
+
+    global api_session
+    api_session = ApiSession(
+        pool_size, connect_timeout=API_TIMEOUT[0], read_timeout=API_TIMEOUT[1],
+        retry_statuses=() if CIRCUIT_FAILURE_THRESHOLD else RETRY_STATUSES
+    )
+    return api_session
+
+
+def configure_api_caller(workers):
+    """Включает бюджет времени и дублирующие запросы к ENDPOINT."""
+    from hedging import HedgedCaller
+
+    global api_caller
+    api_caller = HedgedCaller(workers * 2, hedge=HEDGE_REQUESTS)
+    return api_caller
+
+
+def configure_trace(path, tenants):
+    """Пишет запросы к API и уведомления в трассу для воспроизведения.
+
+    Тело ответа записывается целиком, поэтому при записи потоковый
+    разбор не экономит память.
+    """
+    from traffic_trace import TraceRecorder
+
+    global trace_recorder
+    trace_recorder = TraceRecorder(path)
+    trace_recorder.tenants(tenants)
+    logger.info(f'Трафик записывается в {path}')
+    return trace_recorder
+
+
+def configure_circuit_breaker():
+    """Включает общий автомат защиты для запросов к ENDPOINT."""
+    from circuit_breaker import CircuitBreaker
+
+    global circuit_breaker
+    circuit_breaker = CircuitBreaker(
+        failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout=CIRCUIT_RESET_TIMEOUT
+    )
+    return circuit_breaker
+
+
+def configure_state_store(path, tenants):
+    """Открывает хранилище состояния и восстанавливает из него учеников."""
+    from state_store import StateStore
+
+    global state_store
+    state_store = StateStore(path, flush_interval=STATE_FLUSH_INTERVAL)
+    dates, statuses = state_store.load()
+    for tenant in tenants:
+        restore_tenant(
+            tenant, dates.get(tenant.key), statuses.get(tenant.key, ())
+        )
+    state_store.start()
+    return state_store
+
+
+def restore_tenant(tenant, current_date, statuses):
+    """Переносит в ученика сохранённые `current_date` и статусы."""
+    if current_date is not None:
+        tenant.current_timestamp = current_date
+    tenant.homeworks = {
+        key: Homework(key, name, HomeworkStatus(status))
+        for key, name, status in statuses
+    }
+
+
+def reload_tenants(tenants):
+    """Перечитывает состояние учеников, полученных от другого воркера."""
+    if state_store is None:
+        return
+    for tenant in tenants:
+        restore_tenant(tenant, *state_store.load_tenant(tenant.key))
+
+
+def flush_state(tenant_keys):
+    """Сбрасывает на диск всё состояние перед передачей `tenant_keys`."""
+    if state_store is not None:
+        state_store.flush()
+        logger.info(
+            f'Состояние сохранено перед передачей учеников: {len(tenant_keys)}'
+        )
+
+
+def configure_sharding(tenants):
+    """Делит учеников с другими процессами через аренды в SHARD_DB."""
+    from sharding import LeaseManager, ShardCoordinator, default_worker_id
+
+    global shard
+    leases = LeaseManager(
+        SHARD_DB, SHARD_WORKER_ID or default_worker_id(), ttl=SHARD_LEASE_TTL
+    )
+    shard = ShardCoordinator(
+        tenants, leases, on_acquire=reload_tenants, on_release=flush_state
+    ).start()
+    return shard
+
+
+def reload_foreign_tenants(tenants):
+    """Перечитывает учеников, которых опрашивает другой процесс."""
+    reload_tenants([tenant for tenant in tenants if not owns_tenant(tenant)])
+
+
+def owns_tenant(tenant):
+    """Опрашивает ли этот процесс ученика (всегда да без шардирования)."""
+    return shard is None or shard.owns(tenant)
+
+
+def claim_tenant(tenant):
+    """Контекст опроса: даёт, свой ли ученик, и держит его аренду."""
+    import contextlib
+
+    if shard is None:
+        return contextlib.nullcontext(True)
+    return shard.polling(tenant)
+
+
+def poll_owned_tenant(bot, tenant):
+    """`poll_tenant`, если ученик свой; аренда не уходит до конца опроса."""
+    with claim_tenant(tenant) as owned:
+        if owned:
+            poll_tenant(bot, tenant)
+
+
+async def async_poll_owned_tenant(bot, tenant):
+    """Асинхронный вариант `poll_owned_tenant`."""
+    with claim_tenant(tenant) as owned:
+        if owned:
+            await async_poll_tenant(bot, tenant)
+
+
+def configure_outbox():
+    """Открывает журнал уведомлений OUTBOX_FILE.
+
+    При шардировании у каждого воркера свой журнал `OUTBOX_FILE.<воркер>`,
+    а имя воркера по умолчанию меняется при перезапуске. Поэтому при
+    старте воркер забирает себе журналы завершившихся воркеров: их
+    недоставленные уведомления не теряются.
+    """
+    import glob
+
+    from outbox import Outbox
+
+    global outbox
+    path = OUTBOX_FILE
+    if shard is not None:
+        path = f'{OUTBOX_FILE}.{shard.leases.worker_id}'
+    try:
+        outbox = Outbox(path)
+    except OSError as error:
+        logger.critical(f'Не удалось открыть журнал уведомлений: {error}')
         sys.exit(1)
+    if shard is not None:
+        for other in sorted(glob.glob(f'{glob.escape(OUTBOX_FILE)}.*')):
+            if other == path or other.endswith(('.lock', '.tmp')):
+                continue
+            adopted = outbox.adopt(other)
+            if adopted is not None:
+                logger.info(f'Забран журнал {other}: записей {adopted}')
+    return outbox
 
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
-    message_error = None
 
-    while True:
-        try:
-            response = get_api_answer(current_timestamp)
-            homeworks = check_response(response)
-            message = parse_status(homeworks[0])
-            send_message(bot, message)
-            current_timestamp = response.get('current_date', current_timestamp)
-
-        except Exception as error:
-            message = f'Сбой в работе программы: {error}'
-            logger.error(message)
-            if message_error != message:
-                message_error = message
-                send_message(bot, message)
-        time.sleep(RETRY_TIME)
+def configure_message_sender(bot):
+    """Запускает фоновую очередь отправки сообщений в Telegram.
+
+    Если задан OUTBOX_FILE, недоставленные до перезапуска уведомления
+    из журнала ставятся в очередь первыми, а не отправленные из-за
+    сбоя сети повторяются, пока процесс работает.
+    """
+    from sender import MessageSender
+
+    global message_sender
+    if OUTBOX_FILE:
+        configure_outbox()
+    message_sender = MessageSender(
+        bot, workers=SENDER_WORKERS, maxsize=SEND_QUEUE_SIZE,
+        global_rate=TELEGRAM_GLOBAL_RATE, chat_rate=TELEGRAM_CHAT_RATE,
+        on_done=None if outbox is None else outbox.ack,
+        on_failed=None if outbox is None else outbox.failed
+    ).start()
+    if outbox is not None:
+        pending = outbox.pending()
+        for key, chat_id, text in pending:
+            if not message_sender.submit(chat_id, text, key):
+                outbox.forget(key)
+        if pending:
+            logger.info(f'Из журнала досылаются уведомления: {len(pending)}')
+        outbox.start_retries(message_sender.submit)
+    return message_sender
+
+
+def configure_sinks(bot):
+    """Запускает дополнительные приёмники уведомлений из NOTIFY_SINKS."""
+    from sinks import FanOut, parse_sinks
+
+    global fan_out
+    try:
+        sinks = parse_sinks(
+            NOTIFY_SINKS, bot, global_bucket=(
+                None if message_sender is None
+                else message_sender.global_bucket
+            )
+        )
+    except ValueError as error:
+        logger.critical(str(error))
+        sys.exit(1)
+    fan_out = FanOut(sinks, maxsize=SINK_QUEUE_SIZE).start()
+    logger.info(
+        'Приёмники уведомлений: '
+        + ', '.join(worker.sink.name for worker in fan_out.workers)
+    )
+    return fan_out
+
+
+def configure_commands(bot, tenants):
+    """Запускает ответы на команды чата из памяти бота."""
+    from commands import CommandHandler, UpdatesListener
+
+    global updates_listener
+    if shard is None:
+        handler, active = CommandHandler(tenants), None
+    else:
+        handler = CommandHandler(tenants, refresh=reload_foreign_tenants)
+        active = partial(getattr, shard, 'leader')
+    updates_listener = UpdatesListener(
+        bot, handler, partial(send_reply, bot),
+        timeout=TELEGRAM_UPDATES_TIMEOUT, active=active
+    ).start()
+    return updates_listener
+
+
+def configure_metrics():
+    """Публикует метрики пула соединений и очереди и запускает эндпоинт."""
+    if api_session is not None:
+        metrics.gauge(
+            'homework_api_connections_reuse_ratio',
+            'Доля запросов к API по уже открытому соединению'
+        ).set_function(lambda: api_session.stats()['reuse_ratio'])
+    if message_sender is not None:
+        metrics.gauge(
+            'homework_send_queue_depth', 'Сообщения в очереди отправки'
+        ).set_function(lambda: message_sender.depth)
+    if METRICS_PORT:
+        metrics.start_metrics_server(METRICS_PORT, host=METRICS_HOST)
+        logger.info(
+            f'Метрики доступны на http://{METRICS_HOST}:{METRICS_PORT}/metrics'
+        )
+
+
+def read_tenants():
+    """Загружает учеников из TENANTS_FILE или из переменных окружения."""
+    if not TENANTS_FILE:
+        if not check_tokens():
+            sys.exit(1)
+        return [Tenant(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)]
+    if TELEGRAM_TOKEN is None:
+        logger.critical('Отсутствует токен TELEGRAM_TOKEN')
+        sys.exit(1)
+    try:
+        return load_tenants(TENANTS_FILE)
+    except (OSError, exceptions.TenantsFileInvalid) as error:
+        logger.critical(f'Не удалось прочитать файл учеников: {error}')
+        sys.exit(1)
+
+
+def make_interval_policy():
+    """Политика интервала опроса по POLL_POLICY."""
+    if POLL_POLICY == 'fixed':
+        return FixedInterval(RETRY_TIME)
+    return AdaptiveInterval(
+        active=POLL_INTERVAL_ACTIVE, idle=RETRY_TIME,
+        minimum=POLL_INTERVAL_MIN, maximum=POLL_INTERVAL_MAX
+    )
+
+
+def configure_profiling():
+    """Готовит профилирование по SIGUSR1 (CPU) и SIGUSR2 (память)."""
+    from profiling import Profiler
+
+    global profiler
+    profiler = Profiler(PROFILE_DIR, timings=FUNCTION_SECONDS)
+    return profiler
+
+
+def install_signal_handlers(poller, add_handler=None):
+    """SIGTERM/SIGINT останавливают опрос, SIGHUP будит всех учеников.
+
+    Если настроен `profiler`, SIGUSR1 и SIGUSR2 переключают профили CPU
+    и памяти. По умолчанию обработчики ставятся через `signal.signal`;
+    для цикла asyncio передаётся `loop.add_signal_handler`.
+    """
+    if add_handler is None:
+        def add_handler(signum, callback):
+            signal.signal(signum, lambda *_: callback())
+    handlers = [
+        ('SIGTERM', poller.stop), ('SIGINT', poller.stop),
+        ('SIGHUP', poller.wake),
+    ]
+    if profiler is not None:
+        handlers += [
+            ('SIGUSR1', profiler.toggle_cpu),
+            ('SIGUSR2', profiler.toggle_memory),
+        ]
+    for name, callback in handlers:
+        if hasattr(signal, name):
+            add_handler(getattr(signal, name), callback)
+
+
+def run_tenants(bot, tenants, workers):
+    """Опрашивает учеников в пуле потоков."""
+    from poller import MultiTenantPoller
+
+    poller = MultiTenantPoller(
+        tenants, partial(poll_owned_tenant, bot), workers=workers,
+        policy=make_interval_policy(), drain_timeout=SHUTDOWN_TIMEOUT / 2,
+        should_poll=owns_tenant
+    )
+    install_signal_handlers(poller)
+    poller.run()
+
+
+async def async_run_tenants(bot, tenants, workers):
+    """Опрашивает учеников в цикле asyncio."""
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    from poller import AsyncPoller
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    loop.set_default_executor(executor)
+    poller = AsyncPoller(
+        tenants, partial(async_poll_owned_tenant, bot), concurrency=workers,
+        policy=make_interval_policy(), drain_timeout=SHUTDOWN_TIMEOUT / 2,
+        should_poll=owns_tenant
+    )
+    install_signal_handlers(poller, loop.add_signal_handler)
+    await poller.run()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def configure_logging():
+    """Включает логирование в консоль и файл через фоновую очередь."""
+    from logging_setup import setup_logging
+
+    global log_listener
+    log_listener = setup_logging(
+        LOG_FILE, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+        rotate_when=LOG_ROTATE_WHEN, json_output=LOG_JSON,
+        sample_window=LOG_SAMPLE_WINDOW, sample_limit=LOG_SAMPLE_LIMIT
+    )
+    return log_listener
+
+
+def make_bot():
+    """Создаёт клиента Telegram с пулом под отправку, команды и приёмники."""
+    import telegram
+    from telegram.utils.request import Request
+
+    from sinks import telegram_sink_count
+
+    pool_size = (
+        SENDER_WORKERS + TELEGRAM_COMMANDS + telegram_sink_count(NOTIFY_SINKS)
+    )
+    return telegram.Bot(
+        token=TELEGRAM_TOKEN, base_url=TELEGRAM_API_URL,
+        request=Request(con_pool_size=pool_size)
+    )
+
+
+def shutdown(deadline):
+    """Дожидается очереди отправки и сохраняет состояние до `deadline`.
+
+    Половину SHUTDOWN_TIMEOUT получают начатые опросы (их уведомления
+    попадают в очередь), остаток — отправка очереди. Состояние опроса
+    сохраняется до отправки: её можно не дождаться.
+    """
+    if updates_listener is not None:
+        updates_listener.stop()
+    if state_store is not None:
+        state_store.save()
+    if message_sender is not None:
+        message_sender.close(timeout=max(deadline - time.monotonic(), 0))
+    if outbox is not None:
+        outbox.close()
+    if fan_out is not None:
+        fan_out.close(timeout=max(deadline - time.monotonic(), 0))
+    if shard is not None:
+        shard.stop()
+    if state_store is not None:
+        state_store.close()
+    close_clients()
+    logger.info('Бот остановлен')
+
+
+def close_clients():
+    """Закрывает соединения с API и файл трассы."""
+    if api_caller is not None:
+        api_caller.close()
+    if api_session is not None:
+        api_session.close()
+    if trace_recorder is not None:
+        trace_recorder.close()
+
+
+def parse_since(value):
+    """Момент `ГГГГ-ММ-ДД` (местное время) или Unix-время в секундах."""
+    if value.isdigit():
+        return int(value)
+    return int(time.mktime(time.strptime(value, '%Y-%m-%d')))
+
+
+def backfill_main(argv):
+    """Команда `python homework.py backfill ДАТА [--workers N]`.
+
+    Загружает историю всех учеников с ДАТЫ, сохраняет статусы в
+    STATE_DB и присылает в каждый чат сводку. Запускать до старта
+    воркеров: работающий бот не перечитывает состояние из базы.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='homework.py backfill')
+    parser.add_argument('since', type=parse_since)
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS)
+    args = parser.parse_args(argv)
+    configure_logging()
+    tenants = read_tenants()
+    workers = min(args.workers, len(tenants)) or 1
+    configure_api_session(workers)
+    configure_state_store(STATE_DB, tenants)
+    bot = make_bot()
+    configure_message_sender(bot)
+    try:
+        failed = run_backfill(bot, tenants, args.since, workers)
+    finally:
+        shutdown(time.monotonic() + SHUTDOWN_TIMEOUT)
+    sys.exit(1 if failed else 0)
+
+
+def main():
+    """Основная логика работы бота.
+
+    Логирование, клиенты HTTP и Telegram создаются здесь, а не при
+    импорте модуля: `import homework` не открывает файлов и не тянет
+    тяжёлые зависимости.
+    """
+    if sys.argv[1:2] == ['backfill']:
+        backfill_main(sys.argv[2:])
+    configure_logging()
+    tenants = read_tenants()
+    workers = min(POLL_WORKERS, len(tenants)) or 1
+
+    configure_api_session(workers * (2 if HEDGE_REQUESTS else 1))
+    configure_api_caller(workers)
+    if CIRCUIT_FAILURE_THRESHOLD:
+        configure_circuit_breaker()
+    configure_state_store(STATE_DB, tenants)
+    if TRACE_FILE:
+        configure_trace(TRACE_FILE, tenants)
+    if SHARDING:
+        configure_sharding(tenants)
+    bot = make_bot()
+    configure_message_sender(bot)
+    if NOTIFY_SINKS:
+        configure_sinks(bot)
+    if TELEGRAM_COMMANDS:
+        configure_commands(bot, tenants)
+    configure_metrics()
+    configure_profiling()
+    try:
+        if EXECUTION_MODE == 'asyncio':
+            import asyncio
+
+            asyncio.run(async_run_tenants(bot, tenants, workers))
+        else:
+            run_tenants(bot, tenants, workers)
+    finally:
+        shutdown(time.monotonic() + SHUTDOWN_TIMEOUT / 2)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,62 @@
+"""Политики интервала между опросами ученика."""
+import random
+
+import exceptions
+from records import HomeworkStatus
+
+UPSTREAM_ERRORS = (exceptions.URLNotAvailable, exceptions.WrongRequestToAPI)
+
+
+class FixedInterval:
+    """Постоянный интервал, как `RETRY_TIME`."""
+
+    def __init__(self, interval):
+        """Интервал `interval` секунд."""
+        self.interval = interval
+
+    def next_interval(self, tenant):
+        """Секунды до следующего опроса ученика."""
+        return self.interval
+
+
+class AdaptiveInterval:
+    """Интервал по состоянию ученика.
+
+    Пока какая-то работа на ревью (`reviewing`), ученика опрашивают
+    каждые `active` секунд. Без изменений интервал растёт от `idle`
+    в `factor` раз за опрос, после сбоев API — так же от `idle`
+    по числу сбоев подряд. Опрос, отклонённый автоматом защиты,
+    повторяется через `tenant.retry_after` секунд. К интервалу
+    добавляется случайный разброс ±`jitter`, результат ограничивается
+    `minimum`/`maximum`.
+    """
+
+    def __init__(self, active, idle, minimum, maximum,
+                 factor=2, jitter=0.1):
+        """Интервалы в секундах; `factor` — шаг роста."""
+        self.active = active
+        self.idle = idle
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+
+    def _backoff(self, streak):
+        return self.idle * self.factor ** min(max(streak - 1, 0), 32)
+
+    def base_interval(self, tenant):
+        """Интервал без разброса и ограничений."""
+        if tenant.retry_after is not None:
+            return tenant.retry_after
+        if isinstance(tenant.last_error, UPSTREAM_ERRORS):
+            return self._backoff(tenant.failures)
+        if any(homework.status is HomeworkStatus.REVIEWING
+               for homework in tenant.homeworks.values()):
+            return self.active
+        return self._backoff(tenant.idle_polls)
+
+    def next_interval(self, tenant):
+        """Секунды до следующего опроса ученика."""
+        interval = self.base_interval(tenant)
+        interval *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return min(max(interval, self.minimum), self.maximum)
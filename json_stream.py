@@ -0,0 +1,146 @@
+"""Потоковый разбор ответа API без загрузки всего документа в память."""
+import codecs
+import json
+import re
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """Буфер над итератором байтовых кусков с разбором значений JSON."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Дочитывает данные, пока буфер не вырастет вдвое; False на EOF."""
+        buffer = self._buffer[self._pos:]
+        self._pos = 0
+        target = max(len(buffer) * 2, 1)
+        parts = [buffer]
+        size = len(buffer)
+        while size < target:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._eof = True
+                parts.append(self._text.decode(b'', final=True))
+                break
+            text = self._text.decode(chunk)
+            parts.append(text)
+            size += len(text)
+        self._buffer = ''.join(parts)
+        return not self._eof
+
+    def _skip_whitespace(self):
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or self._eof:
+                return
+            self._fill()
+
+    def peek(self):
+        """Следующий значимый символ или '' в конце данных."""
+        self._skip_whitespace()
+        return self._buffer[self._pos:self._pos + 1]
+
+    def expect(self, chars):
+        """Читает один из символов `chars` и возвращает его."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(
+                f'Ожидался один из символов {chars!r}',
+                self._buffer, self._pos
+            )
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Читает одно значение JSON целиком."""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                self._fill()
+                continue
+            if end == len(self._buffer) and not self._eof:
+                # Число в конце буфера могло быть обрезано: дочитываем.
+                self._fill()
+                continue
+            self._pos = end
+            return value
+
+
+class StreamedAnswer:
+    """Объект JSON верхнего уровня, массив из которого читается поэлементно.
+
+    `items()` отдаёт элементы массива `array_key` по одному; остальные
+    ключи объекта попадают в `fields`, когда чтение дойдёт до них;
+    для самого массива там остаётся пустой список — признак того, что
+    он был в ответе. В памяти одновременно находятся один элемент
+    массива и буфер чтения.
+    """
+
+    def __init__(self, chunks, array_key='homeworks', close=None):
+        """Ответ из итератора байтовых кусков `chunks`."""
+        self.array_key = array_key
+        self.fields = {}
+        self._reader = _Reader(chunks)
+        self._close = close
+
+    def _array(self):
+        reader = self._reader
+        reader.expect('[')
+        if reader.peek() == ']':
+            reader.expect(']')
+            return
+        while True:
+            yield reader.value()
+            if reader.expect(',]') == ']':
+                return
+
+    def items(self):
+        """Элементы массива `array_key` по мере чтения."""
+        reader = self._reader
+        if reader.peek() != '{':
+            raise TypeError('Ответ API не является объектом JSON')
+        reader.expect('{')
+        if reader.peek() == '}':
+            reader.expect('}')
+        else:
+            while True:
+                key = reader.value()
+                if not isinstance(key, str):
+                    raise json.JSONDecodeError(
+                        'Ключ объекта должен быть строкой', '', 0
+                    )
+                reader.expect(':')
+                if key == self.array_key and reader.peek() == '[':
+                    self.fields[key] = []
+                    yield from self._array()
+                else:
+                    self.fields[key] = reader.value()
+                if reader.expect(',}') == '}':
+                    break
+        if reader.peek():
+            raise json.JSONDecodeError('Лишние данные после JSON', '', 0)
+
+    def close(self):
+        """Освобождает соединение, с которого читается ответ."""
+        if self._close is not None:
+            self._close()
+
+    def __enter__(self):
+        """Возвращает сам ответ."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Закрывает ответ."""
+        self.close()
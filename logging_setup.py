@@ -0,0 +1,118 @@
+"""Логирование в фоновом потоке: ротация файла, JSON и прореживание."""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from logging.handlers import (QueueHandler, QueueListener,
+                              RotatingFileHandler, TimedRotatingFileHandler)
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+SAMPLE_WINDOW = 60
+SAMPLE_LIMIT = 5
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON."""
+
+    def format(self, record):
+        """Сериализует запись в JSON."""
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'name': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает не больше `limit` записей с одним ключом за `window` с.
+
+    Прореживаются только записи уровня `level` и выше. Ключ — атрибут
+    `sample_key` записи, а если его нет — текст сообщения до первого
+    двоеточия: так `'Сбой в работе программы: ...'` с разными
+    подробностями считается одним сообщением. Первая запись нового окна
+    сообщает, сколько повторов было подавлено.
+    """
+
+    def __init__(self, window=SAMPLE_WINDOW, limit=SAMPLE_LIMIT,
+                 level=logging.WARNING):
+        """Фильтр с пустыми счётчиками."""
+        super().__init__()
+        self.window = window
+        self.limit = limit
+        self.level = level
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def sample_key(record):
+        """Ключ, по которому считаются повторы записи."""
+        key = getattr(record, 'sample_key', None)
+        if key is None:
+            key = str(record.msg).split(':', 1)[0]
+        return record.levelno, key
+
+    def filter(self, record):
+        """True, если запись нужно записать."""
+        if record.levelno < self.level:
+            return True
+        key = self.sample_key(record)
+        now = time.monotonic()
+        with self._lock:
+            started, seen = self._counters.get(key, (now, 0))
+            if now - started >= self.window:
+                suppressed = seen - self.limit
+                started, seen = now, 0
+                if suppressed > 0:
+                    record.msg = (
+                        f'{record.msg} (подавлено повторов: {suppressed})'
+                    )
+            seen += 1
+            self._counters[key] = (started, seen)
+        return seen <= self.limit
+
+
+def setup_logging(log_file, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT,
+                  rotate_when=None, json_output=False,
+                  sample_window=SAMPLE_WINDOW, sample_limit=SAMPLE_LIMIT):
+    """Направляет корневой логгер в очередь, которую разбирает фоновый поток.
+
+    Вызывающий поток только кладёт запись в очередь; форматирование,
+    запись в поток вывода и в файл с ротацией (по размеру или, если
+    задан `rotate_when`, по времени) выполняет `QueueListener`.
+    """
+    if rotate_when:
+        file_handler = TimedRotatingFileHandler(
+            log_file, when=rotate_when, backupCount=backup_count,
+            encoding='UTF-8'
+        )
+    else:
+        file_handler = RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count,
+            encoding='UTF-8'
+        )
+    formatter = JsonFormatter() if json_output else logging.Formatter(
+        LOG_FORMAT
+    )
+    handlers = (logging.StreamHandler(), file_handler)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    queue_handler = QueueHandler(records)
+    queue_handler.addFilter(SamplingFilter(sample_window, sample_limit))
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(queue_handler)
+
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,253 @@
+"""Счётчики и гистограммы процесса в текстовом формате Prometheus."""
+import bisect
+import functools
+import threading
+import time
+from http import HTTPStatus
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    labels = ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', r'\\').replace('"', r'\"')
+        )
+        for name, value in pairs
+    )
+    return '{' + labels + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Метрика для конкретных значений меток."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self):
+        """Строки метрики в текстовом формате Prometheus."""
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик."""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        """Увеличивает счётчик без меток."""
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        labels = _format_labels(self.labelnames, values)
+        return [f'{self.name}{labels} {child.value}']
+
+
+class Gauge(_Metric):
+    """Текущее значение; может вычисляться функцией при каждом чтении."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        """Метрика без значений, пока их не установят."""
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        """Задаёт значение без меток."""
+        self.labels().set(value)
+
+    def set_function(self, function, *values):
+        """Значение будет браться из `function()` при каждом чтении."""
+        self._functions[values] = function
+        self.labels(*values)
+
+    def _render_child(self, values, child):
+        function = self._functions.get(values)
+        value = function() if function is not None else child.value
+        labels = _format_labels(self.labelnames, values)
+        return [f'{self.name}{labels} {value}']
+
+
+class _HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    """Распределение значений по корзинам `buckets`."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        """Гистограмма с корзинами `buckets` (верхние границы)."""
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        """Добавляет наблюдение без меток."""
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts = list(child.counts)
+            total, count = child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip((*self.buckets, '+Inf'), counts):
+            cumulative += bucket_count
+            labels = _format_labels(
+                self.labelnames, values, [('le', bound)]
+            )
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f'{self.name}_sum{labels} {total}')
+        lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Registry:
+    """Набор метрик, отдаваемых одним эндпоинтом."""
+
+    def __init__(self):
+        """Пустой набор метрик."""
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Добавляет метрику; повторная регистрация имени вернёт прежнюю."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    """Счётчик в общем реестре."""
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()):
+    """Текущее значение в общем реестре."""
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Гистограмма в общем реестре."""
+    return REGISTRY.register(
+        Histogram(name, documentation, labelnames, buckets)
+    )
+
+
+def timed(metric, *label_values):
+    """Декоратор: время выполнения функции попадает в гистограмму."""
+    def decorator(function):
+        child = metric.labels(*label_values)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def start_metrics_server(port, host='127.0.0.1', registry=REGISTRY):
+    """Отдаёт метрики по `http://host:port/metrics` из фонового потока."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            body = registry.render().encode()
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, name='metrics-server', daemon=True
+    )
+    thread.start()
+    return server
@@ -0,0 +1,329 @@
+"""Журнал исходящих уведомлений с групповой фиксацией (JSONL).
+
+Уведомление записывается в журнал до отправки, а после доставки
+отмечается подтверждением. Записи, не подтверждённые к перезапуску,
+отправляются снова: доставка «хотя бы один раз».
+
+Запись, которую не удалось отправить из-за сбоя сети, повторяется с
+растущей паузой (`Outbox.failed`, `start_retries`), а подтверждённые
+записи вычищаются из файла, когда их набирается COMPACT_AFTER.
+
+Пока журнал открыт, процесс держит блокировку `<журнал>.lock`
+(`fcntl.flock`, снимается и при гибели процесса). Поэтому журнал
+завершившегося воркера можно отличить от журнала живого и забрать
+его записи себе (`Outbox.adopt`). Без `fcntl` (Windows) блокировок и
+переноса журналов нет.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+RETRY_BACKOFF = 30.0
+RETRY_MAX = 3600.0
+COMPACT_AFTER = 10000
+
+OUTBOX_PENDING = metrics.gauge(
+    'homework_outbox_pending', 'Уведомления в журнале без подтверждения'
+)
+OUTBOX_BATCH = metrics.histogram(
+    'homework_outbox_batch_size',
+    'Записи журнала, зафиксированные одним fsync',
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+
+
+def message_key(chat_id, text):
+    """Ключ идемпотентности: одинаковый текст в один чат — один ключ."""
+    return hashlib.sha256(f'{chat_id}\n{text}'.encode()).hexdigest()[:16]
+
+
+def _read_pending(path):
+    pending = {}
+    try:
+        journal = open(path, encoding='UTF-8')
+    except FileNotFoundError:
+        return pending
+    with journal:
+        for line in journal:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f'Пропущена повреждённая запись журнала {path}')
+                continue
+            if entry['op'] == 'add':
+                pending[entry['key']] = (entry['chat_id'], entry['text'])
+            else:
+                pending.pop(entry['key'], None)
+    return pending
+
+
+def _lock(path):
+    """Файл с захваченной блокировкой или `None`, если она занята."""
+    lock = open(path, 'a')
+    if fcntl is None:
+        return lock
+    try:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _line(entry):
+    return json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class Outbox:
+    """Журнал уведомлений, который пишет фоновый поток.
+
+    `append` ждёт fsync своей записи, но записи, накопившиеся, пока
+    идёт предыдущий fsync, фиксируются следующим одним вызовом —
+    потоки опроса делят fsync между собой. Подтверждения пишутся той же
+    пачкой без ожидания. При открытии журнал переписывается: в нём
+    остаются только неподтверждённые записи. Журнал, открытый другим
+    процессом, — `BlockingIOError`.
+    """
+
+    def __init__(self, path, retry_backoff=RETRY_BACKOFF,
+                 compact_after=COMPACT_AFTER):
+        """Открывает журнал `path`, забирая его блокировку."""
+        self.path = path
+        self.retry_backoff = retry_backoff
+        self.compact_after = compact_after
+        self._lock = _lock(f'{path}.lock')
+        if self._lock is None:
+            raise BlockingIOError(f'Журнал {path} открыт другим процессом')
+        self._pending = _read_pending(path)
+        self._compact(self._pending.items())
+        self._file = open(path, 'a', encoding='UTF-8')
+        self._cond = threading.Condition()
+        self._batch = []
+        self._appended = 0
+        self._committed = 0
+        self._acked = 0
+        self._retries = {}
+        self._retry_thread = None
+        self._closed = False
+        OUTBOX_PENDING.set(len(self._pending))
+        self._thread = threading.Thread(
+            target=self._commit_forever, name='outbox-commit', daemon=True
+        )
+        self._thread.start()
+
+    def _compact(self, entries):
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='UTF-8') as journal:
+            for key, (chat_id, text) in entries:
+                journal.write(_line({
+                    'op': 'add', 'key': key, 'chat_id': chat_id, 'text': text
+                }))
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temporary, self.path)
+
+    def pending(self):
+        """Неподтверждённые записи по порядку: `(ключ, чат, текст)`."""
+        with self._cond:
+            return [
+                (key, chat_id, text)
+                for key, (chat_id, text) in self._pending.items()
+            ]
+
+    def append(self, chat_id, text):
+        """Фиксирует уведомление на диске и возвращает его ключ.
+
+        Если такое же уведомление ещё ждёт доставки, возвращает `None`:
+        его не нужно отправлять второй раз.
+        """
+        key = message_key(chat_id, text)
+        with self._cond:
+            if key in self._pending:
+                return None
+            self._pending[key] = (chat_id, text)
+            self._batch.append(_line({
+                'op': 'add', 'key': key, 'chat_id': chat_id, 'text': text
+            }))
+            self._appended += 1
+            sequence = self._appended
+            self._cond.notify_all()
+            while self._committed < sequence and not self._closed:
+                self._cond.wait()
+        OUTBOX_PENDING.set(len(self._pending))
+        return key
+
+    def forget(self, key):
+        """Забывает запись, не поставленную в очередь отправки.
+
+        В файле она остаётся неподтверждённой и будет отправлена после
+        перезапуска, но больше не мешает поставить такое же сообщение.
+        """
+        with self._cond:
+            self._pending.pop(key, None)
+            self._retries.pop(key, None)
+        OUTBOX_PENDING.set(len(self._pending))
+
+    def failed(self, key):
+        """Откладывает повтор записи, которую не удалось отправить.
+
+        Пауза удваивается с каждой неудачей, от `retry_backoff` до
+        RETRY_MAX секунд.
+        """
+        with self._cond:
+            if key not in self._pending:
+                return
+            attempts = self._retries.get(key, (0, None))[0]
+            delay = min(self.retry_backoff * 2 ** attempts, RETRY_MAX)
+            self._retries[key] = (attempts + 1, time.monotonic() + delay)
+            self._cond.notify_all()
+
+    def start_retries(self, submit):
+        """Запускает повторы отложенных записей через `submit`.
+
+        `submit(чат, текст, ключ)` получает записи, чья пауза после сбоя
+        истекла; если он вернул False, запись снова откладывается.
+        """
+        self._retry_thread = threading.Thread(
+            target=self._retry_forever, args=(submit,),
+            name='outbox-retry', daemon=True
+        )
+        self._retry_thread.start()
+        return self
+
+    def _due(self):
+        """Ключи с истёкшей паузой и сколько ждать следующего."""
+        now = time.monotonic()
+        due, wait = [], None
+        for key, (attempts, at) in self._retries.items():
+            if at is None:
+                continue
+            if at <= now:
+                due.append(key)
+            elif wait is None or at - now < wait:
+                wait = at - now
+        for key in due:
+            self._retries[key] = (self._retries[key][0], None)
+        return due, wait
+
+    def _retry_forever(self, submit):
+        while True:
+            with self._cond:
+                due, wait = self._due()
+                while not due and not self._closed:
+                    self._cond.wait(wait)
+                    due, wait = self._due()
+                if self._closed:
+                    return
+                entries = [
+                    (key, *self._pending[key])
+                    for key in due if key in self._pending
+                ]
+            for key, chat_id, text in entries:
+                if not submit(chat_id, text, key):
+                    self.failed(key)
+
+    def adopt(self, path):
+        """Забирает записи журнала `path` завершившегося процесса.
+
+        Записи фиксируются в этом журнале, а чужой журнал удаляется.
+        Возвращает число записей или `None`, если журнал ещё открыт.
+        """
+        lock = _lock(f'{path}.lock')
+        if lock is None:
+            return None
+        try:
+            pending = _read_pending(path)
+            for chat_id, text in pending.values():
+                self.append(chat_id, text)
+            _remove(path)
+            _remove(f'{path}.lock')
+        finally:
+            lock.close()
+        return len(pending)
+
+    def ack(self, key):
+        """Отмечает уведомление доставленным, не дожидаясь fsync."""
+        with self._cond:
+            if self._pending.pop(key, None) is None:
+                return
+            self._retries.pop(key, None)
+            self._batch.append(_line({'op': 'ack', 'key': key}))
+            self._appended += 1
+            self._acked += 1
+            self._cond.notify_all()
+        OUTBOX_PENDING.set(len(self._pending))
+
+    def _commit_forever(self):
+        while True:
+            with self._cond:
+                while not self._batch and not self._closed:
+                    self._cond.wait()
+                if not self._batch:
+                    return
+                lines, self._batch = self._batch, []
+                sequence = self._appended
+            try:
+                self._file.write(''.join(lines))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except OSError as error:
+                logger.error(f'Не удалось записать журнал: {error}')
+            OUTBOX_BATCH.observe(len(lines))
+            with self._cond:
+                self._committed = sequence
+                compact = self._acked >= self.compact_after
+                if compact:
+                    self._acked = 0
+                    entries = list(self._pending.items())
+                self._cond.notify_all()
+            if compact:
+                self._rewrite(entries)
+
+    def _rewrite(self, entries):
+        """Сжимает журнал до `entries`; вызывается из потока фиксации.
+
+        Записи, добавленные после снимка `entries`, попадут в файл
+        следующей пачкой.
+        """
+        try:
+            self._file.close()
+            self._compact(entries)
+        except OSError as error:
+            logger.error(f'Не удалось сжать журнал: {error}')
+        self._file = open(self.path, 'a', encoding='UTF-8')
+
+    def close(self):
+        """Фиксирует оставшиеся записи и закрывает файл.
+
+        Пустой журнал удаляется вместе с блокировкой.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        if self._retry_thread is not None:
+            self._retry_thread.join()
+        self._file.close()
+        if not _read_pending(self.path):
+            _remove(self.path)
+        _remove(f'{self.path}.lock')
+        self._lock.close()
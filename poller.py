@@ -0,0 +1,231 @@
+"""Параллельный опрос многих учеников в одном процессе."""
+import asyncio
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = metrics.histogram(
+    'homework_loop_lag_seconds',
+    'Опоздание начала опроса относительно запланированного, с'
+)
+
+
+SHUTDOWN_TIMEOUT = 20
+SKIP_INTERVAL = 10
+WAKE = object()
+
+
+class MultiTenantPoller:
+    """Планировщик опроса: у каждого ученика свой срок следующего запроса.
+
+    `poll` вызывается с учеником в пуле потоков; пока опрос ученика
+    не завершился, повторно он не планируется. Срок следующего опроса
+    задаёт `policy.next_interval(tenant)`.
+
+    Ожидание до ближайшего срока прерывается событиями: `stop()` и
+    `wake()` безопасно вызывать из обработчиков сигналов. После
+    остановки начатые опросы дожидаются не дольше `drain_timeout`.
+
+    Если задан `should_poll` и он вернул ложь (ученик у другого
+    воркера), опрос пропускается и ученик перепроверяется через
+    `skip_interval` секунд.
+    """
+
+    def __init__(self, tenants, poll, workers, policy,
+                 drain_timeout=SHUTDOWN_TIMEOUT, should_poll=None,
+                 skip_interval=SKIP_INTERVAL):
+        """Готовит опрос; пул потоков создаётся в `run()`."""
+        self.tenants = list(tenants)
+        self.poll = poll
+        self.workers = workers
+        self.policy = policy
+        self.drain_timeout = drain_timeout
+        self.should_poll = should_poll
+        self.skip_interval = skip_interval
+        # SimpleQueue.put можно вызывать из обработчика сигнала.
+        self._done = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._order = itertools.count()
+
+    def stop(self):
+        """Просит цикл `run` завершиться."""
+        self._stop.set()
+        self._done.put(None)
+
+    def wake(self):
+        """Просит опросить всех ожидающих учеников немедленно."""
+        self._done.put(WAKE)
+
+    def _poll_one(self, tenant, due):
+        LOOP_LAG.observe(max(time.monotonic() - due, 0))
+        try:
+            self.poll(tenant)
+        except Exception:
+            logger.exception(f'Необработанная ошибка опроса {tenant}')
+        finally:
+            self._done.put(tenant)
+
+    def _accepts(self, tenant):
+        return self.should_poll is None or self.should_poll(tenant)
+
+    def _schedule(self, schedule, tenant, due):
+        heapq.heappush(schedule, (due, next(self._order), tenant))
+
+    def _drain(self, in_flight):
+        deadline = time.monotonic() + self.drain_timeout
+        while in_flight:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(
+                    f'Не дождались завершения {in_flight} опросов'
+                )
+                return
+            try:
+                item = self._done.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if item is not None and item is not WAKE:
+                in_flight -= 1
+
+    def run(self):
+        """Опрашивает учеников, пока не вызван `stop`."""
+        schedule = []
+        now = time.monotonic()
+        for tenant in self.tenants:
+            self._schedule(schedule, tenant, now)
+        logger.info(
+            f'Запущен опрос {len(self.tenants)} учеников '
+            f'в {self.workers} потоков'
+        )
+        in_flight = {}
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                while schedule and schedule[0][0] <= now:
+                    due, _, tenant = heapq.heappop(schedule)
+                    if not self._accepts(tenant):
+                        self._schedule(
+                            schedule, tenant, now + self.skip_interval
+                        )
+                        continue
+                    in_flight[tenant] = executor.submit(
+                        self._poll_one, tenant, due
+                    )
+                timeout = schedule[0][0] - now if schedule else None
+                try:
+                    item = self._done.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+                if item is WAKE:
+                    logger.info('Внеочередной опрос всех учеников')
+                    schedule = [(now, order, t) for _, order, t in schedule]
+                    heapq.heapify(schedule)
+                elif item is not None:
+                    del in_flight[item]
+                    interval = self.policy.next_interval(item)
+                    self._schedule(
+                        schedule, item, time.monotonic() + interval
+                    )
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        # Отменённые опросы не начинались и в `_done` не попадут.
+        running = sum(
+            not future.cancelled() for future in in_flight.values()
+        )
+        logger.info(f'Остановка опроса, в работе {running} опросов')
+        self._drain(running)
+
+
+class AsyncPoller:
+    """Опрос учеников в одном цикле asyncio: по задаче на ученика.
+
+    `poll` — корутинная функция; одновременно выполняется не более
+    `concurrency` опросов. Паузу после опроса задаёт
+    `policy.next_interval(tenant)`; `wake()` прерывает паузы всех
+    учеников. После `stop()` начатые опросы дожидаются не дольше
+    `drain_timeout`, остальные задачи отменяются. `should_poll` и
+    `skip_interval` — как у `MultiTenantPoller`.
+    """
+
+    def __init__(self, tenants, poll, concurrency, policy,
+                 drain_timeout=SHUTDOWN_TIMEOUT, should_poll=None,
+                 skip_interval=SKIP_INTERVAL):
+        """Готовит опрос; задачи создаются в `run()`."""
+        self.tenants = list(tenants)
+        self.poll = poll
+        self.concurrency = concurrency
+        self.policy = policy
+        self.drain_timeout = drain_timeout
+        self.should_poll = should_poll
+        self.skip_interval = skip_interval
+        self._stop = None
+        self._wake = None
+
+    def stop(self):
+        """Просит цикл `run` завершиться; вызывать из цикла событий."""
+        if self._stop is not None:
+            self._stop.set()
+            self.wake()
+
+    def wake(self):
+        """Прерывает паузы учеников; вызывать из цикла событий."""
+        if self._wake is not None:
+            self._wake, wake = asyncio.Event(), self._wake
+            wake.set()
+
+    async def _poll_loop(self, tenant, semaphore):
+        due = time.monotonic()
+        while not self._stop.is_set():
+            if self.should_poll is None or self.should_poll(tenant):
+                async with semaphore:
+                    if self._stop.is_set():
+                        break
+                    LOOP_LAG.observe(max(time.monotonic() - due, 0))
+                    try:
+                        await self.poll(tenant)
+                    except Exception:
+                        logger.exception(
+                            f'Необработанная ошибка опроса {tenant}'
+                        )
+                interval = self.policy.next_interval(tenant)
+            else:
+                interval = self.skip_interval
+            if self._stop.is_set():
+                break
+            due = time.monotonic() + interval
+            try:
+                await asyncio.wait_for(self._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            due = min(due, time.monotonic())
+
+    async def run(self):
+        """Опрашивает учеников, пока не вызван `stop`."""
+        self._stop = asyncio.Event()
+        self._wake = asyncio.Event()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        logger.info(
+            f'Запущен asyncio-опрос {len(self.tenants)} учеников, '
+            f'не более {self.concurrency} одновременно'
+        )
+        tasks = [
+            asyncio.create_task(self._poll_loop(tenant, semaphore))
+            for tenant in self.tenants
+        ]
+        await self._stop.wait()
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f'Не дождались завершения {len(pending)} опросов')
@@ -0,0 +1,201 @@
+"""Профилирование работающего бота по сигналу.
+
+SIGUSR1 включает выборочный профиль CPU, повторный SIGUSR1 выключает
+его и пишет в каталог `directory` стеки в свёрнутом формате (для
+flamegraph.pl и speedscope) и времена функций бота за это окно.
+SIGUSR2 включает `tracemalloc` и запоминает базовый снимок, повторный
+SIGUSR2 пишет разницу с ним и выключает трассировку. Пока профиль
+выключен, ничего не выполняется: нет ни потока, ни хуков.
+"""
+import collections
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = 0.005
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATIONS = 30
+
+
+def _folded(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f'{code.co_name} ({os.path.basename(code.co_filename)}:'
+            f'{code.co_firstlineno})'
+        )
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """Раз в `interval` секунд снимает стеки всех потоков, кроме своего."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        """Готовит сборщик; стеки начнут сниматься в `start()`."""
+        self.interval = interval
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        """Идёт ли сейчас сбор стеков."""
+        return self._thread is not None
+
+    def _sample_forever(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    self.samples[_folded(frame)] += 1
+
+    def start(self):
+        """Начинает сбор с пустым счётчиком стеков."""
+        self.samples = collections.Counter()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._sample_forever, name='cpu-profiler', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает сбор и возвращает счётчик стеков."""
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        return self.samples
+
+    def write_folded(self, path):
+        """Пишет стеки строками `кадр;кадр;кадр число`."""
+        with open(path, 'w', encoding='UTF-8') as output:
+            for stack, count in self.samples.most_common():
+                output.write(f'{stack} {count}\n')
+
+
+def timings_snapshot(histogram):
+    """Состояние гистограммы по меткам: число, сумма и корзины."""
+    snapshot = {}
+    for values, child in list(histogram._children.items()):
+        with child._lock:
+            snapshot[values] = (child.count, child.sum, list(child.counts))
+    return snapshot
+
+
+def _bucket_quantile(buckets, counts, share):
+    total = sum(counts)
+    if not total:
+        return None
+    seen = 0
+    for bound, count in zip((*buckets, float('inf')), counts):
+        seen += count
+        if seen >= share * total:
+            return bound
+    return None
+
+
+def timings_report(histogram, before=None):
+    """Времена функций по гистограмме, с `before` — только их прирост.
+
+    Квантили — верхние границы корзин, то есть оценка сверху.
+    """
+    before = before or {}
+    report = {}
+    for values, (count, total, counts) in timings_snapshot(histogram).items():
+        old_count, old_total, old_counts = before.get(
+            values, (0, 0.0, [0] * len(counts))
+        )
+        count -= old_count
+        if not count:
+            continue
+        total -= old_total
+        counts = [new - old for new, old in zip(counts, old_counts)]
+        report[','.join(values)] = {
+            'calls': count,
+            'total_seconds': round(total, 6),
+            'mean_seconds': round(total / count, 6),
+            'p50_le': _bucket_quantile(histogram.buckets, counts, 0.5),
+            'p95_le': _bucket_quantile(histogram.buckets, counts, 0.95),
+        }
+    return report
+
+
+class Profiler:
+    """Переключатели профилей CPU и памяти для обработчиков сигналов.
+
+    `timings` — гистограмма времён функций, по которой к профилю CPU
+    прикладывается отчёт за то же окно.
+    """
+
+    def __init__(self, directory, timings=None, interval=SAMPLE_INTERVAL,
+                 clock=time.time):
+        """Профили пишутся в каталог `directory`."""
+        self.directory = directory
+        self.timings = timings
+        self.clock = clock
+        self.cpu = SamplingProfiler(interval)
+        self._timings_before = None
+        self._baseline = None
+        self._lock = threading.RLock()
+
+    def _path(self, kind, extension):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.clock()))
+        return os.path.join(
+            self.directory, f'{kind}-{stamp}-{os.getpid()}.{extension}'
+        )
+
+    def toggle_cpu(self):
+        """Включает профиль CPU или выключает и сохраняет его.
+
+        Возвращает пути записанных файлов (пустой список при включении).
+        """
+        with self._lock:
+            if not self.cpu.running:
+                if self.timings is not None:
+                    self._timings_before = timings_snapshot(self.timings)
+                self.cpu.start()
+                logger.info('Профиль CPU включён')
+                return []
+            self.cpu.stop()
+            paths = [self._path('cpu', 'folded')]
+            self.cpu.write_folded(paths[0])
+            if self.timings is not None:
+                paths.append(self._path('timings', 'json'))
+                report = timings_report(self.timings, self._timings_before)
+                with open(paths[1], 'w', encoding='UTF-8') as output:
+                    json.dump(report, output, ensure_ascii=False, indent=2)
+            logger.info(f'Профиль CPU сохранён: {", ".join(paths)}')
+            return paths
+
+    def toggle_memory(self, limit=TOP_ALLOCATIONS):
+        """Запоминает базовый снимок памяти или пишет разницу с ним.
+
+        Возвращает путь отчёта или `None` при включении.
+        """
+        with self._lock:
+            if self._baseline is None:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self._baseline = tracemalloc.take_snapshot()
+                logger.info('Трассировка памяти включена')
+                return None
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),)
+            )
+            tracemalloc.stop()
+            stats = snapshot.compare_to(self._baseline, 'lineno')
+            self._baseline = None
+            path = self._path('memory', 'txt')
+            with open(path, 'w', encoding='UTF-8') as output:
+                for stat in stats[:limit]:
+                    output.write(f'{stat}\n')
+            logger.info(f'Разница снимков памяти сохранена: {path}')
+            return path
@@ -0,0 +1,59 @@
+"""Компактная запись о домашней работе вместо словаря из JSON."""
+import enum
+
+import exceptions
+
+
+class HomeworkStatus(enum.Enum):
+    """Статус проверки; члены перечисления — единственные экземпляры."""
+
+    APPROVED = 'approved'
+    REVIEWING = 'reviewing'
+    REJECTED = 'rejected'
+
+
+class Homework:
+    """Только те поля работы, которые нужны боту.
+
+    Ключ — `id` работы, а если его нет — название. Статус хранится как
+    член `HomeworkStatus`, поэтому сравнение статусов — сравнение
+    ссылок, а тысячи записей не хранят тысячи копий строк.
+    """
+
+    __slots__ = ('key', 'name', 'status')
+
+    def __init__(self, key, name, status):
+        """Запись с ключом, названием и статусом `HomeworkStatus`."""
+        self.key = key
+        self.name = name
+        self.status = status
+
+    @classmethod
+    def from_dict(cls, homework):
+        """Проверяет работу из ответа API и строит запись."""
+        status = homework.get('status')
+        try:
+            status = HomeworkStatus(status)
+        except ValueError:
+            message = f'Неизвестный статус домашней работы: {status!r}'
+            raise exceptions.NoHomeworkStatus(message)
+        name = homework.get('homework_name')
+        if name is None:
+            message = 'Отсутствуют данные о названии домашней работы'
+            raise exceptions.KeywordHomeworkNameLost(message)
+        return cls(str(homework.get('id', name)), name, status)
+
+    def __eq__(self, other):
+        """Записи равны, если совпадают ключ, название и статус."""
+        if not isinstance(other, Homework):
+            return NotImplemented
+        return (self.key, self.name, self.status) == (
+            other.key, other.name, other.status
+        )
+
+    def __repr__(self):
+        """Запись с ключом, названием и значением статуса."""
+        return (
+            f'Homework(key={self.key!r}, name={self.name!r}, '
+            f'status={self.status.value!r})'
+        )
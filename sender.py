@@ -0,0 +1,305 @@
+"""Очередь исходящих сообщений Telegram с ограничением частоты."""
+import collections
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+
+import telegram
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_SENT = metrics.counter(
+    'homework_messages_sent_total', 'Отправленные сообщения Telegram'
+)
+MESSAGES_FAILED = metrics.counter(
+    'homework_messages_failed_total', 'Сообщения, которые не удалось отправить'
+)
+MESSAGES_DROPPED = metrics.counter(
+    'homework_messages_dropped_total',
+    'Сообщения, отброшенные из-за переполнения очереди'
+)
+SEND_SECONDS = metrics.histogram(
+    'homework_send_seconds', 'Время отправки сообщения с повторами, с'
+)
+QUEUE_SECONDS = metrics.histogram(
+    'homework_send_queue_seconds', 'Время ожидания сообщения в очереди, с'
+)
+FUNCTION_SECONDS = metrics.histogram(
+    'homework_function_seconds', 'Время выполнения функций бота, с',
+    labelnames=('function',)
+)
+
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+SEND_RETRIES = 3
+RETRY_BACKOFF = 1.0
+
+SENT = 'sent'
+REJECTED = 'rejected'
+FAILED = 'failed'
+
+
+class TokenBucket:
+    """Ведро токенов: не больше `rate` событий в секунду, пачка до `burst`."""
+
+    def __init__(self, rate, burst=None):
+        """Полное ведро: первые `burst` событий без ожидания."""
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Занимает токен и возвращает, сколько секунд ждать до него."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """Ждёт свободный токен."""
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+class MessageSender:
+    """Отправка сообщений фоновыми потоками, независимо от опроса API.
+
+    Сообщения одного чата всегда попадают в одну очередь, поэтому их
+    порядок сохраняется. Общая частота ограничена `global_rate`,
+    частота в один чат — `chat_rate`. Сообщение в чат, исчерпавший свою
+    частоту, откладывается до его времени, а поток тем временем
+    обслуживает другие чаты. На `RetryAfter` поток ждёт
+    указанное Telegram время, сетевые сбои повторяются до `retries`
+    раз. Если очередь заполнена, `submit` не ждёт, а отбрасывает
+    сообщение.
+
+    `on_done(key)` вызывается для сообщений с ключом, когда с ними
+    покончено: они доставлены или Telegram отверг их окончательно
+    (`BadRequest`, `Unauthorized`). После сетевых сбоев вместо него
+    вызывается `on_failed(key)`.
+    """
+
+    def __init__(self, bot, workers, maxsize, global_rate=GLOBAL_RATE,
+                 chat_rate=CHAT_RATE, retries=SEND_RETRIES, on_done=None,
+                 on_failed=None):
+        """Готовит очереди; потоки запускает `start()`."""
+        self.bot = bot
+        self.retries = retries
+        self.on_done = on_done
+        self.on_failed = on_failed
+        self.chat_rate = chat_rate
+        self.global_bucket = TokenBucket(global_rate)
+        self._chat_buckets = {}
+        self._buckets_lock = threading.Lock()
+        self._queues = [
+            queue.Queue(maxsize=max(maxsize // workers, 1))
+            for _ in range(workers)
+        ]
+        self._parked = [0] * workers
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.send_latency_total = 0.0
+        self.queue_latency_total = 0.0
+
+    def start(self):
+        """Запускает потоки отправки."""
+        for number, messages in enumerate(self._queues):
+            thread = threading.Thread(
+                target=self._work, args=(number, messages),
+                name=f'telegram-sender-{number}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    @property
+    def depth(self):
+        """Число сообщений, ожидающих отправки."""
+        return (
+            sum(messages.qsize() for messages in self._queues)
+            + sum(self._parked)
+        )
+
+    def submit(self, chat_id, text, key=None):
+        """Ставит сообщение в очередь; False, если очередь заполнена."""
+        messages = self._queues[hash(str(chat_id)) % len(self._queues)]
+        try:
+            messages.put_nowait((chat_id, text, key, time.monotonic()))
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            MESSAGES_DROPPED.inc()
+            logger.error(f'Очередь отправки заполнена, сообщение в чат '
+                         f'{chat_id} отброшено')
+            return False
+        return True
+
+    def _chat_bucket(self, chat_id):
+        with self._buckets_lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = TokenBucket(self.chat_rate, burst=1)
+                self._chat_buckets[chat_id] = bucket
+            return bucket
+
+    @metrics.timed(FUNCTION_SECONDS, 'send_message')
+    def _deliver(self, chat_id, text):
+        """Отправляет сообщение с повторами: SENT, REJECTED или FAILED."""
+        attempt = 0
+        while True:
+            self.global_bucket.acquire()
+            try:
+                self.bot.send_message(chat_id=chat_id, text=text)
+                return SENT
+            except telegram.error.RetryAfter as error:
+                logger.warning(
+                    f'Telegram просит подождать {error.retry_after} с'
+                )
+                time.sleep(error.retry_after)
+            except (telegram.error.BadRequest,
+                    telegram.error.Unauthorized) as error:
+                logger.error(f'Сбой отправки сообщения: {error}')
+                return REJECTED
+            except telegram.error.NetworkError as error:
+                if attempt >= self.retries:
+                    logger.error(f'Сбой отправки сообщения: {error}')
+                    return FAILED
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+            except telegram.TelegramError as error:
+                logger.error(f'Сбой отправки сообщения: {error}')
+                return FAILED
+            attempt += 1
+
+    def _work(self, number, messages):
+        """Цикл потока: новые сообщения и отложенные по чатам.
+
+        Сообщения чата, которому ещё рано, ждут в его очереди `parked`,
+        а время, когда чату можно писать, — в куче `ready`. Пока
+        отложенных не меньше размера очереди, новые сообщения не
+        забираются: `submit` по-прежнему отбрасывает лишние.
+        """
+        parked = {}
+        ready = []
+        order = itertools.count()
+        closing = False
+        while not closing or parked:
+            now = time.monotonic()
+            if ready and ready[0][0] <= now:
+                _, _, chat_id = heapq.heappop(ready)
+                chat = parked[chat_id]
+                self._send(chat.popleft())
+                self._parked[number] -= 1
+                if chat:
+                    delay = self._chat_bucket(chat_id).reserve()
+                    heapq.heappush(
+                        ready, (time.monotonic() + delay, next(order), chat_id)
+                    )
+                else:
+                    del parked[chat_id]
+                messages.task_done()
+                continue
+            timeout = max(ready[0][0] - now, 0) if ready else None
+            if closing or self._parked[number] >= messages.maxsize:
+                time.sleep(timeout)
+                continue
+            try:
+                item = messages.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if item is None:
+                closing = True
+                messages.task_done()
+                continue
+            chat_id = item[0]
+            if chat_id in parked:
+                parked[chat_id].append(item)
+                self._parked[number] += 1
+                continue
+            delay = self._chat_bucket(chat_id).reserve()
+            if delay:
+                parked[chat_id] = collections.deque([item])
+                self._parked[number] += 1
+                heapq.heappush(ready, (now + delay, next(order), chat_id))
+                continue
+            self._send(item)
+            messages.task_done()
+
+    def _send(self, item):
+        chat_id, text, key, queued_at = item
+        started = time.monotonic()
+        outcome = self._deliver(chat_id, text)
+        delivered = outcome == SENT
+        finished = time.monotonic()
+        with self._stats_lock:
+            if delivered:
+                self.sent += 1
+            else:
+                self.failed += 1
+            self.send_latency_total += finished - started
+            self.queue_latency_total += started - queued_at
+        SEND_SECONDS.observe(finished - started)
+        QUEUE_SECONDS.observe(started - queued_at)
+        if delivered:
+            MESSAGES_SENT.inc()
+            logger.info('Сообщение успешно отправлено')
+        else:
+            MESSAGES_FAILED.inc()
+        if key is None:
+            return
+        if outcome != FAILED and self.on_done:
+            self.on_done(key)
+        elif outcome == FAILED and self.on_failed:
+            self.on_failed(key)
+
+    def stats(self):
+        """Глубина очереди, счётчики и средние задержки отправки."""
+        with self._stats_lock:
+            done = self.sent + self.failed
+            return {
+                'depth': self.depth,
+                'sent': self.sent,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'avg_send_latency': (
+                    self.send_latency_total / done if done else 0.0
+                ),
+                'avg_queue_latency': (
+                    self.queue_latency_total / done if done else 0.0
+                ),
+            }
+
+    def close(self, timeout=None):
+        """Дожидается отправки очереди (не дольше `timeout`) и завершается.
+
+        В заполненной очереди места для сигнала остановки не ждём: её
+        поток досылает сообщения в фоне, пока жив процесс.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for number, messages in enumerate(self._queues):
+            try:
+                messages.put_nowait(None)
+            except queue.Full:
+                logger.warning(f'Очередь отправки {number} не досылается')
+        for thread in self._threads:
+            remaining = (
+                None if deadline is None
+                else max(deadline - time.monotonic(), 0)
+            )
+            thread.join(remaining)
@@ -0,0 +1,315 @@
+"""Раздел учеников между несколькими процессами бота.
+
+Каждый процесс (воркер) раз в `interval` секунд отмечается в общей
+таблице SQLite, строит кольцо согласованного хеширования по живым
+воркерам и берёт аренду на своих учеников. Ученика опрашивает только
+держатель действующей аренды, поэтому два воркера не опрашивают один
+токен, а при появлении или пропаже воркера ученики перераспределяются
+сами: аренды ушедшего истекают через `ttl` секунд.
+"""
+import bisect
+import collections
+import contextlib
+import hashlib
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+REPLICAS = 64
+LEASE_TTL = 30.0
+LEADER_KEY = 'telegram-updates'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shard_workers (
+    worker_id TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tenant_leases (
+    tenant_key TEXT PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+SHARD_WORKERS = metrics.gauge(
+    'homework_shard_workers', 'Живые воркеры по данным таблицы аренд'
+)
+SHARD_TENANTS = metrics.gauge(
+    'homework_shard_tenants', 'Ученики, арендованные этим воркером'
+)
+
+
+def default_worker_id():
+    """Имя воркера: хост и PID процесса."""
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def _hash(value):
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+class HashRing:
+    """Кольцо согласованного хеширования с `replicas` точками на узел.
+
+    При добавлении или удалении узла переезжает лишь около `1/N`
+    ключей.
+    """
+
+    def __init__(self, nodes, replicas=REPLICAS):
+        """Строит кольцо из узлов `nodes`."""
+        points = sorted(
+            (_hash(f'{node}#{index}'), node)
+            for node in nodes for index in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key):
+        """Узел, отвечающий за `key`, или `None` для пустого кольца."""
+        if not self._nodes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+class LeaseManager:
+    """Таблицы воркеров и аренд учеников в общем файле SQLite."""
+
+    def __init__(self, path, worker_id, ttl=LEASE_TTL, clock=time.time):
+        """Открывает общий файл `path` и создаёт таблицы."""
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self.clock = clock
+        self._conn = sqlite3.connect(
+            path, timeout=ttl / 3, isolation_level=None,
+            check_same_thread=False
+        )
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _transaction(self, statements):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = statements(self._conn)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            return result
+
+    def heartbeat(self):
+        """Отмечает воркер живым и возвращает список живых воркеров."""
+        now = self.clock()
+
+        def statements(conn):
+            conn.execute(
+                'INSERT OR REPLACE INTO shard_workers VALUES (?, ?)',
+                (self.worker_id, now)
+            )
+            conn.execute(
+                'DELETE FROM shard_workers WHERE heartbeat < ?',
+                (now - self.ttl,)
+            )
+            return sorted(
+                row[0] for row in conn.execute(
+                    'SELECT worker_id FROM shard_workers'
+                )
+            )
+        return self._transaction(statements)
+
+    def acquire(self, tenant_keys):
+        """Продлевает и берёт аренды на `tenant_keys`, отпускает прочие.
+
+        Чужая действующая аренда не перехватывается. Возвращает
+        множество ключей, которые теперь арендованы этим воркером.
+        """
+        now = self.clock()
+        tenant_keys = list(tenant_keys)
+
+        def statements(conn):
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS wanted (key TEXT)')
+            conn.execute('DELETE FROM wanted')
+            conn.executemany(
+                'INSERT INTO wanted VALUES (?)', ((k,) for k in tenant_keys)
+            )
+            conn.execute(
+                'DELETE FROM tenant_leases WHERE worker_id = ? '
+                'AND tenant_key NOT IN (SELECT key FROM wanted)',
+                (self.worker_id,)
+            )
+            conn.execute(
+                'INSERT INTO tenant_leases (tenant_key, worker_id, expires) '
+                'SELECT key, ?, ? FROM wanted WHERE true '
+                'ON CONFLICT (tenant_key) DO UPDATE SET '
+                'worker_id = excluded.worker_id, expires = excluded.expires '
+                'WHERE tenant_leases.worker_id = excluded.worker_id '
+                'OR tenant_leases.expires < ?',
+                (self.worker_id, now + self.ttl, now)
+            )
+            return {
+                row[0] for row in conn.execute(
+                    'SELECT tenant_key FROM tenant_leases WHERE worker_id = ?',
+                    (self.worker_id,)
+                )
+            }
+        return self._transaction(statements)
+
+    def leave(self):
+        """Отпускает все аренды и убирает воркер из таблицы."""
+        def statements(conn):
+            conn.execute(
+                'DELETE FROM tenant_leases WHERE worker_id = ?',
+                (self.worker_id,)
+            )
+            conn.execute(
+                'DELETE FROM shard_workers WHERE worker_id = ?',
+                (self.worker_id,)
+            )
+        self._transaction(statements)
+
+    def close(self):
+        """Закрывает соединение."""
+        self._conn.close()
+
+
+class ShardCoordinator:
+    """Держит актуальным множество учеников этого воркера.
+
+    Опрос ученика оборачивается в `polling(tenant)`. Уходящих учеников
+    воркер сначала перестаёт считать своими, затем дожидается их начатых
+    опросов и только потом вызывает `on_release(keys)` (сброс состояния
+    на диск) и отпускает аренды. `on_acquire(tenants)` — для новых
+    учеников (чтобы перечитать их состояние, сохранённое другим
+    воркером). `leader` истинно у одного из живых воркеров — того, на
+    кого кольцо отображает `LEADER_KEY`; он отвечает на команды чата.
+
+    Если аренды не удаётся продлить (сбой SQLite, долгая пауза), через
+    `ttl - margin` секунд после последнего продления `owns` перестаёт
+    признавать учеников своими: их аренды вот-вот истекут и достанутся
+    другому воркеру. По умолчанию `margin` равен `interval`.
+    """
+
+    def __init__(self, tenants, leases, interval=None, on_acquire=None,
+                 on_release=None, margin=None):
+        """Готовит распределение `tenants` через аренды `leases`."""
+        self.tenants = {tenant.key: tenant for tenant in tenants}
+        self.leases = leases
+        self.interval = leases.ttl / 3 if interval is None else interval
+        self.margin = self.interval if margin is None else margin
+        self.valid_until = 0.0
+        self.on_acquire = on_acquire
+        self.on_release = on_release
+        self.owned = frozenset()
+        self.leader = False
+        self._cond = threading.Condition()
+        self._polling = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def owns(self, tenant):
+        """Опрашивает ли этот воркер ученика."""
+        return (
+            tenant.key in self.owned
+            and self.leases.clock() < self.valid_until
+        )
+
+    @contextlib.contextmanager
+    def polling(self, tenant):
+        """Отмечает опрос ученика; даёт False, если ученик не свой.
+
+        Пока опрос идёт, аренда ученика не отпускается.
+        """
+        with self._cond:
+            owned = self.owns(tenant)
+            if owned:
+                self._polling[tenant.key] += 1
+        try:
+            yield owned
+        finally:
+            if owned:
+                with self._cond:
+                    self._polling[tenant.key] -= 1
+                    if not self._polling[tenant.key]:
+                        del self._polling[tenant.key]
+                    self._cond.notify_all()
+
+    def _release(self, keys):
+        """Перестаёт опрашивать `keys`, ждёт их опросов, сбрасывает их."""
+        with self._cond:
+            self.owned = self.owned - keys
+            if not self._cond.wait_for(
+                lambda: self._polling.keys().isdisjoint(keys), self.margin
+            ):
+                logger.warning(
+                    'Не дождались опросов передаваемых учеников: '
+                    f'{len(self._polling.keys() & keys)}'
+                )
+        if self.on_release is not None:
+            self.on_release(keys)
+
+    def rebalance(self):
+        """Один шаг: отметиться, пересчитать долю, обновить аренды."""
+        renewed = self.leases.clock()
+        workers = self.leases.heartbeat()
+        ring = HashRing(workers)
+        wanted = {
+            key for key in self.tenants
+            if ring.node_for(key) == self.leases.worker_id
+        }
+        released = self.owned - wanted
+        if released:
+            self._release(released)
+        owned = frozenset(self.leases.acquire(wanted) & self.tenants.keys())
+        acquired = owned - self.owned
+        if acquired and self.on_acquire is not None:
+            self.on_acquire([self.tenants[key] for key in acquired])
+        if owned != self.owned:
+            logger.info(
+                f'Воркер {self.leases.worker_id}: учеников {len(owned)} '
+                f'из {len(self.tenants)}, воркеров {len(workers)}'
+            )
+        self.owned = owned
+        self.valid_until = renewed + self.leases.ttl - self.margin
+        self.leader = ring.node_for(LEADER_KEY) == self.leases.worker_id
+        SHARD_WORKERS.set(len(workers))
+        SHARD_TENANTS.set(len(owned))
+        return owned
+
+    def _rebalance_forever(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.rebalance()
+            except sqlite3.Error as error:
+                logger.error(f'Не удалось обновить аренды: {error}')
+
+    def start(self):
+        """Первое распределение и фоновое обновление аренд."""
+        self.rebalance()
+        self._thread = threading.Thread(
+            target=self._rebalance_forever, name='shard-coordinator',
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает обновление и отпускает аренды для других."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.owned:
+            self._release(self.owned)
+        self.leader = False
+        self.leases.leave()
+        self.leases.close()
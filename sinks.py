@@ -0,0 +1,278 @@
+"""Дополнительные приёмники уведомлений: чаты, вебхук, файл.
+
+Каждому приёмнику — своя ограниченная очередь и свой поток, поэтому
+медленный вебхук не задерживает ни другие приёмники, ни опрос: если
+очередь приёмника заполнена, уведомление для него отбрасывается.
+"""
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SINK_QUEUE_SIZE = 1000
+WEBHOOK_TIMEOUT = 10
+CHAT_RATE = 1
+
+SINK_SECONDS = metrics.histogram(
+    'homework_sink_seconds', 'Время доставки в приёмник, с',
+    labelnames=('sink',)
+)
+SINK_DELIVERED = metrics.counter(
+    'homework_sink_delivered_total', 'Уведомления, доставленные в приёмник',
+    labelnames=('sink',)
+)
+SINK_FAILED = metrics.counter(
+    'homework_sink_failed_total', 'Сбои доставки в приёмник',
+    labelnames=('sink',)
+)
+SINK_DROPPED = metrics.counter(
+    'homework_sink_dropped_total',
+    'Уведомления, отброшенные из-за переполнения очереди приёмника',
+    labelnames=('sink',)
+)
+SINK_DEPTH = metrics.gauge(
+    'homework_sink_queue_depth', 'Уведомления в очереди приёмника',
+    labelnames=('sink',)
+)
+
+
+class Sink:
+    """Приёмник уведомлений.
+
+    `deliver` вызывается из потока приёмника по одному уведомлению и
+    при сбое бросает исключение.
+    """
+
+    name = 'sink'
+
+    def deliver(self, chat_id, text):
+        """Доставляет уведомление для чата ученика `chat_id`."""
+        raise NotImplementedError
+
+    def close(self):
+        """Освобождает ресурсы приёмника."""
+
+
+class TelegramChatSink(Sink):
+    """Копия каждого уведомления в один чат (например, кураторов).
+
+    `global_bucket` — общее с очередью отправки ограничение частоты
+    бота: копии не должны выводить его за лимит Telegram.
+    """
+
+    def __init__(self, bot, chat_id, rate=CHAT_RATE, global_bucket=None):
+        """Копии в чат `chat_id` не чаще `rate` раз в секунду."""
+        from sender import TokenBucket
+
+        self.bot = bot
+        self.chat_id = chat_id
+        self.name = f'telegram:{chat_id}'
+        self.global_bucket = global_bucket
+        self._bucket = TokenBucket(rate, burst=1)
+
+    def deliver(self, chat_id, text):
+        """Отправляет текст в свой чат не чаще `rate` раз в секунду.
+
+        На `RetryAfter` ждёт указанное Telegram время и повторяет.
+        """
+        import telegram
+
+        while True:
+            self._bucket.acquire()
+            if self.global_bucket is not None:
+                self.global_bucket.acquire()
+            try:
+                self.bot.send_message(chat_id=self.chat_id, text=text)
+                return
+            except telegram.error.RetryAfter as error:
+                logger.warning(
+                    f'Telegram просит приёмник {self.name} подождать '
+                    f'{error.retry_after} с'
+                )
+                time.sleep(error.retry_after)
+
+
+class WebhookSink(Sink):
+    """POST `{"chat_id": ..., "text": ...}` на URL вебхука."""
+
+    def __init__(self, url, timeout=WEBHOOK_TIMEOUT):
+        """Приёмник с адресом `url` и таймаутом запроса `timeout`."""
+        import requests
+
+        self.url = url
+        self.timeout = timeout
+        self.name = f'webhook:{urlsplit(url).netloc}'
+        self._session = requests.Session()
+
+    def deliver(self, chat_id, text):
+        """Отправляет уведомление; ответ не 2xx считается сбоем."""
+        response = self._session.post(
+            self.url, json={'chat_id': chat_id, 'text': text},
+            timeout=self.timeout
+        )
+        response.close()
+        response.raise_for_status()
+
+    def close(self):
+        """Закрывает соединения."""
+        self._session.close()
+
+
+class FileSink(Sink):
+    """Строки JSON с временем, чатом и текстом; `-` — стандартный вывод."""
+
+    def __init__(self, path, clock=time.time):
+        """Открывает файл `path` для дописывания или берёт stdout."""
+        self.clock = clock
+        if path == '-':
+            self.name = 'stdout'
+            self._file = sys.stdout
+        else:
+            self.name = f'file:{path}'
+            self._file = open(path, 'a', encoding='UTF-8')
+
+    def deliver(self, chat_id, text):
+        """Дописывает строку и сбрасывает буфер."""
+        self._file.write(json.dumps(
+            {'time': round(self.clock(), 3), 'chat_id': chat_id, 'text': text},
+            ensure_ascii=False
+        ) + '\n')
+        self._file.flush()
+
+    def close(self):
+        """Закрывает файл (стандартный вывод не закрывается)."""
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+def _items(spec):
+    return [part.strip() for part in spec.split(',') if part.strip()]
+
+
+def telegram_sink_count(spec):
+    """Число приёмников-чатов: каждому нужно соединение в пуле бота."""
+    return sum(item.startswith('telegram:') for item in _items(spec))
+
+
+def parse_sinks(spec, bot, global_bucket=None):
+    """Приёмники из строки вида `telegram:<чат>,webhook:<url>,file:<путь>`.
+
+    `stdout` — то же, что `file:-`. Приёмники-чаты делят с отправкой
+    `global_bucket`.
+    """
+    sinks = []
+    for item in _items(spec):
+        kind, _, target = item.partition(':')
+        if kind == 'stdout':
+            sinks.append(FileSink('-'))
+        elif kind == 'file' and target:
+            sinks.append(FileSink(target))
+        elif kind == 'telegram' and target:
+            sinks.append(TelegramChatSink(bot, target,
+                                          global_bucket=global_bucket))
+        elif kind == 'webhook' and target:
+            sinks.append(WebhookSink(target))
+        else:
+            raise ValueError(f'Неизвестный приёмник уведомлений: {item}')
+    return sinks
+
+
+class SinkWorker:
+    """Очередь и поток одного приёмника."""
+
+    def __init__(self, sink, maxsize=SINK_QUEUE_SIZE):
+        """Очередь на `maxsize` уведомлений; поток — в `start()`."""
+        self.sink = sink
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._seconds = SINK_SECONDS.labels(sink.name)
+        SINK_DEPTH.set_function(self._queue.qsize, sink.name)
+
+    def start(self):
+        """Запускает поток приёмника."""
+        self._thread = threading.Thread(
+            target=self._work, name=f'sink-{self.sink.name}', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def submit(self, chat_id, text):
+        """Ставит уведомление в очередь; False, если она заполнена."""
+        try:
+            self._queue.put_nowait((chat_id, text))
+        except queue.Full:
+            SINK_DROPPED.labels(self.sink.name).inc()
+            return False
+        return True
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            started = time.monotonic()
+            try:
+                self.sink.deliver(*item)
+            except Exception as error:
+                SINK_FAILED.labels(self.sink.name).inc()
+                logger.error(
+                    f'Сбой доставки в приёмник {self.sink.name}: {error}'
+                )
+            else:
+                SINK_DELIVERED.labels(self.sink.name).inc()
+            self._seconds.observe(time.monotonic() - started)
+
+    def stop(self):
+        """Просит поток завершиться после уже поставленных уведомлений.
+
+        Заполненную очередь приёмник всё равно не успеет разобрать,
+        поэтому остановка не ждёт в ней места.
+        """
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            logger.warning(f'Очередь приёмника {self.sink.name} не досылается')
+
+    def join(self, timeout=None):
+        """Ждёт поток и закрывает приёмник, если поток успел завершиться."""
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self.sink.close()
+
+
+class FanOut:
+    """Рассылает каждое уведомление во все приёмники независимо."""
+
+    def __init__(self, sinks, maxsize=SINK_QUEUE_SIZE):
+        """По приёмнику-потоку на каждый из `sinks`."""
+        self.workers = [SinkWorker(sink, maxsize) for sink in sinks]
+
+    def start(self):
+        """Запускает потоки всех приёмников."""
+        for worker in self.workers:
+            worker.start()
+        return self
+
+    def publish(self, chat_id, text):
+        """Ставит уведомление в очередь каждого приёмника, не ожидая."""
+        for worker in self.workers:
+            worker.submit(chat_id, text)
+
+    def close(self, timeout=None):
+        """Досылает очереди (всем вместе не дольше `timeout`)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self.workers:
+            worker.stop()
+        for worker in self.workers:
+            remaining = (
+                None if deadline is None
+                else max(deadline - time.monotonic(), 0)
+            )
+            worker.join(remaining)
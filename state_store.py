@@ -0,0 +1,173 @@
+"""Хранилище состояния опроса между перезапусками бота (SQLite)."""
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tenant_dates (
+    tenant_key TEXT PRIMARY KEY,
+    from_date INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS homework_statuses (
+    tenant_key TEXT NOT NULL,
+    homework_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    homework_name TEXT,
+    PRIMARY KEY (tenant_key, homework_key)
+);
+"""
+
+
+class StateStore:
+    """Последний `current_date` ученика и последний статус каждой работы.
+
+    Изменения копятся в памяти и записываются одной транзакцией раз в
+    `flush_interval` секунд, поэтому опрос не ждёт fsync на каждой
+    итерации. Повторная запись одного ключа до сброса схлопывается.
+    """
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL):
+        """Открывает базу `path` и обновляет схему."""
+        self.path = path
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending_dates = {}
+        self._pending_statuses = {}
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def _migrate(self):
+        columns = {
+            row[1] for row in self._conn.execute(
+                'PRAGMA table_info(homework_statuses)'
+            )
+        }
+        if 'homework_name' not in columns:
+            with self._conn:
+                self._conn.execute(
+                    'ALTER TABLE homework_statuses '
+                    'ADD COLUMN homework_name TEXT'
+                )
+
+    def load(self):
+        """Читает всё состояние одним проходом.
+
+        Возвращает `(dates, statuses)`: `{tenant_key: current_date}` и
+        `{tenant_key: [(homework_key, homework_name, status), ...]}`.
+        """
+        dates = dict(self._conn.execute(
+            'SELECT tenant_key, from_date FROM tenant_dates'
+        ))
+        statuses = {}
+        for tenant_key, *homework in self._conn.execute(
+            'SELECT tenant_key, homework_key, homework_name, status '
+            'FROM homework_statuses'
+        ):
+            statuses.setdefault(tenant_key, []).append(tuple(homework))
+        return dates, statuses
+
+    def load_tenant(self, tenant_key):
+        """Состояние одного ученика: `(current_date или None, статусы)`.
+
+        Нужен, когда ученик переходит от другого воркера и его
+        состояние в памяти устарело.
+        """
+        with self._flush_lock:
+            row = self._conn.execute(
+                'SELECT from_date FROM tenant_dates WHERE tenant_key = ?',
+                (tenant_key,)
+            ).fetchone()
+            statuses = self._conn.execute(
+                'SELECT homework_key, homework_name, status '
+                'FROM homework_statuses WHERE tenant_key = ?', (tenant_key,)
+            ).fetchall()
+        return (row[0] if row else None), statuses
+
+    def set_current_date(self, tenant_key, current_date):
+        """Запоминает `current_date` ученика до следующего сброса."""
+        with self._lock:
+            self._pending_dates[tenant_key] = current_date
+
+    def set_status(self, tenant_key, homework_key, status,
+                   homework_name=None):
+        """Запоминает статус домашней работы до следующего сброса."""
+        with self._lock:
+            self._pending_statuses[tenant_key, homework_key] = (
+                status, homework_name
+            )
+
+    def flush(self):
+        """Записывает накопленные изменения одной транзакцией.
+
+        Если транзакция не удалась (например, база занята другим
+        воркером), изменения возвращаются в очередь на следующий сброс;
+        более новые значения тех же ключей при этом не затираются.
+        """
+        with self._flush_lock:
+            with self._lock:
+                dates, self._pending_dates = self._pending_dates, {}
+                statuses = self._pending_statuses
+                self._pending_statuses = {}
+            if not dates and not statuses:
+                return
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        'INSERT OR REPLACE INTO tenant_dates VALUES (?, ?)',
+                        dates.items()
+                    )
+                    self._conn.executemany(
+                        'INSERT OR REPLACE INTO homework_statuses '
+                        '(tenant_key, homework_key, status, homework_name) '
+                        'VALUES (?, ?, ?, ?)',
+                        ((*key, *value) for key, value in statuses.items())
+                    )
+            except sqlite3.Error:
+                with self._lock:
+                    self._pending_dates = {**dates, **self._pending_dates}
+                    self._pending_statuses = {
+                        **statuses, **self._pending_statuses
+                    }
+                raise
+
+    def save(self):
+        """Как `flush`, но сбой только пишется в лог.
+
+        Несохранённые изменения остаются до следующего сброса.
+        Возвращает, удалось ли сохранить.
+        """
+        try:
+            self.flush()
+        except sqlite3.Error as error:
+            logger.error(f'Не удалось сохранить состояние: {error}')
+            return False
+        return True
+
+    def _flush_forever(self):
+        while not self._stop.wait(self.flush_interval):
+            self.save()
+
+    def start(self):
+        """Запускает фоновый сброс изменений на диск."""
+        self._flusher = threading.Thread(
+            target=self._flush_forever, name='state-flusher', daemon=True
+        )
+        self._flusher.start()
+
+    def close(self):
+        """Останавливает фоновый сброс и сохраняет остаток изменений."""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        self._conn.close()
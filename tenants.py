@@ -0,0 +1,58 @@
+"""Ученики, за домашками которых следит бот, и их состояние опроса."""
+import csv
+import hashlib
+import time
+
+import exceptions
+from error_digest import ErrorDigest
+
+
+def token_key(token):
+    """Короткий стабильный ключ ученика, не раскрывающий токен."""
+    return hashlib.sha256(str(token).encode()).hexdigest()[:16]
+
+
+class Tenant:
+    """Пара «токен Практикума + чат Telegram» со своим состоянием опроса."""
+
+    def __init__(self, token, chat_id, current_timestamp=None):
+        """Ученик с токеном `token` и чатом `chat_id`."""
+        self.token = token
+        self.chat_id = chat_id
+        self.key = token_key(token)
+        self.headers = {'Authorization': f'OAuth {token}'}
+        if current_timestamp is None:
+            current_timestamp = int(time.time())
+        self.current_timestamp = current_timestamp
+        self.errors = ErrorDigest()
+        self.homeworks = {}
+        self.last_message = None
+        self.last_error = None
+        self.retry_after = None
+        self.failures = 0
+        self.idle_polls = 0
+
+    def __repr__(self):
+        """Ученик по ключу и чату, без токена."""
+        return f'Tenant(key={self.key!r}, chat_id={self.chat_id!r})'
+
+
+def load_tenants(path):
+    """Читает файл учеников: в каждой строке `токен,chat_id`.
+
+    Пустые строки и строки, начинающиеся с `#`, пропускаются.
+    """
+    tenants = {}
+    with open(path, encoding='UTF-8', newline='') as tenants_file:
+        for line_number, row in enumerate(csv.reader(tenants_file), 1):
+            if not row or not row[0].strip() or row[0].startswith('#'):
+                continue
+            if len(row) != 2 or not all(field.strip() for field in row):
+                message = (
+                    f'{path}:{line_number}: ожидалось `токен,chat_id`, '
+                    f'получено {len(row)} полей'
+                )
+                raise exceptions.TenantsFileInvalid(message)
+            token, chat_id = (field.strip() for field in row)
+            tenants[token] = Tenant(token, chat_id)
+    return list(tenants.values())
@@ -0,0 +1,78 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api_session import ApiSession
+from fake_servers import FakePracticum, Faults
+from tenants import Tenant
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'homeworks': [], 'current_date': 1}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/'
+    server.shutdown()
+    server.server_close()
+
+
+class TestApiSession:
+
+    def test_connection_is_reused(self, local_url):
+        session = ApiSession(pool_size=1)
+        first = session.get(local_url)
+        second = session.get(local_url)
+        assert first.json() == {'homeworks': [], 'current_date': 1}
+        assert not first.connection_reused
+        assert second.connection_reused, (
+            'Проверьте, что повторный запрос идёт по открытому соединению'
+        )
+        assert second.latency >= 0
+        stats = session.stats()
+        assert stats['requests'] == 2
+        assert stats['connections'] == 1
+        assert stats['reuse_ratio'] == 0.5
+        session.close()
+
+    def test_default_timeout(self):
+        session = ApiSession(pool_size=1, connect_timeout=1, read_timeout=2)
+        assert session.timeout == (1, 2)
+
+    def test_error_statuses_retried_only_when_asked(self, monkeypatch):
+        monkeypatch.setattr('api_session.RETRY_BACKOFF', 0)
+        practicum = FakePracticum(
+            students=1, faults=Faults(error_rate=1, error_statuses=[503])
+        ).start()
+        headers = Tenant('student-0', 1).headers
+        try:
+            retrying = ApiSession(pool_size=1)
+            response = retrying.get(practicum.url, headers=headers)
+            assert response.status_code == 503
+            assert practicum.requests == 3
+            single = ApiSession(pool_size=1, retry_statuses=())
+            single.get(practicum.url, headers=headers)
+            assert practicum.requests == 4, (
+                'Без `retry_statuses` ответ 5xx не должен повторяться'
+            )
+            retrying.close()
+            single.close()
+        finally:
+            practicum.stop()
@@ -0,0 +1,68 @@
+import homework
+from fake_servers import FakePracticum
+from records import Homework, HomeworkStatus
+from tenants import Tenant
+from utils import CollectingBot
+
+
+class TestBackfill:
+
+    def test_one_digest_per_chat_and_index_seeded(self, monkeypatch):
+        practicum = FakePracticum(students=3, seed=4).start()
+        monkeypatch.setattr(homework, 'ENDPOINT', practicum.url)
+        tenants = [
+            Tenant('student-0', 'group', 2 ** 40),
+            Tenant('student-1', 'group', 2 ** 40),
+            Tenant('student-2', 'solo', 2 ** 40),
+        ]
+        known = Homework.from_dict(
+            practicum.students['student-2'].answer(0)['homeworks'][0]
+        )
+        tenants[2].homeworks = {known.key: known}
+        bot, poll_bot = CollectingBot(), CollectingBot()
+        try:
+            failed = homework.run_backfill(bot, tenants, 0, workers=2)
+            seeded = [tenant.current_timestamp for tenant in tenants]
+            for tenant in tenants:
+                tenant.current_timestamp = 0
+                homework.poll_tenant(poll_bot, tenant)
+        finally:
+            practicum.stop()
+        assert failed == 0
+        chats = [chat_id for chat_id, _ in bot.messages]
+        assert sorted(chats) == ['group', 'solo'], (
+            'В каждый чат должна уйти ровно одна сводка'
+        )
+        group = dict(bot.messages)['group']
+        assert 'student-0__hw' in group and 'student-1__hw' in group
+        assert f'"{known.name}"' not in dict(bot.messages)['solo'], (
+            'Уже известный статус не должен попадать в сводку'
+        )
+        assert seeded == [2 ** 40] * 3, (
+            'Бэкфилл не должен сдвигать дату опроса назад'
+        )
+        assert all(tenant.homeworks for tenant in tenants), (
+            'История должна заполнить индекс'
+        )
+        assert poll_bot.messages == [], (
+            'После бэкфилла опрос не должен повторять известные статусы'
+        )
+
+    def test_long_digest_is_split(self):
+        records = [
+            Homework(index, 'x' * 100, HomeworkStatus.APPROVED)
+            for index in range(100)
+        ]
+        messages = homework.digest_messages(0, records)
+        assert len(messages) > 1
+        assert all(
+            len(message) <= homework.MESSAGE_MAX_LENGTH
+            for message in messages
+        )
+        assert sum(message.count('"x') for message in messages) == 100
+
+    def test_failed_tenant_is_reported(self, monkeypatch):
+        monkeypatch.setattr(homework, 'ENDPOINT', 'http://127.0.0.1:9/')
+        bot = CollectingBot()
+        assert homework.run_backfill(bot, [Tenant('t', 1)], 0, 1) == 1
+        assert bot.messages == []
@@ -0,0 +1,142 @@
+import pytest
+import requests
+
+import exceptions
+import homework
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from fake_servers import FakePracticum, Faults
+from interval_policy import AdaptiveInterval
+from tenants import Tenant
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold_and_probes(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10,
+                                 clock=clock)
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure()
+        assert breaker.state == OPEN
+        with pytest.raises(exceptions.CircuitOpen):
+            breaker.before_call()
+
+        clock.now = 10
+        breaker.before_call()
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(exceptions.CircuitOpen):
+            breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == OPEN, 'Сбой пробы должен снова размыкать'
+
+        clock.now = 20
+        breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        breaker.before_call()
+
+    def test_success_resets_failure_streak(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+    def test_fetch_short_circuits_while_open(self, monkeypatch):
+        practicum = FakePracticum(
+            students=1, faults=Faults(error_rate=1, error_statuses=[503])
+        ).start()
+        monkeypatch.setattr(homework, 'ENDPOINT', practicum.url)
+        monkeypatch.setattr(
+            homework, 'circuit_breaker',
+            CircuitBreaker(failure_threshold=2, reset_timeout=3600)
+        )
+        headers = Tenant('student-0', 1).headers
+        try:
+            for _ in range(5):
+                with pytest.raises(exceptions.URLNotAvailable):
+                    homework.fetch_api_answer(0, headers)
+            assert practicum.requests == 2, (
+                'После размыкания запросы к API не должны отправляться'
+            )
+        finally:
+            practicum.stop()
+
+    def test_unknown_token_does_not_open(self, monkeypatch):
+        practicum = FakePracticum(students=1).start()
+        monkeypatch.setattr(homework, 'ENDPOINT', practicum.url)
+        breaker = CircuitBreaker(failure_threshold=1)
+        monkeypatch.setattr(homework, 'circuit_breaker', breaker)
+        try:
+            with pytest.raises(exceptions.URLNotAvailable):
+                homework.fetch_api_answer(0, Tenant('unknown', 1).headers)
+            assert breaker.state == CLOSED
+        finally:
+            practicum.stop()
+
+    def test_outage_is_reported_once_per_student(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(
+            homework, 'circuit_breaker',
+            CircuitBreaker(failure_threshold=1, reset_timeout=10,
+                           clock=clock)
+        )
+        api_down = True
+        messages = []
+
+        class Response:
+            status_code = 200
+
+            def json(self):
+                return {'homeworks': [], 'current_date': 1}
+
+        def api_get(*args, **kwargs):
+            if api_down:
+                raise requests.ConnectionError('Connection refused')
+            return Response()
+
+        monkeypatch.setattr(homework, 'api_get', api_get)
+        monkeypatch.setattr(
+            homework, 'send_chat_message',
+            lambda bot, chat_id, message: messages.append(message)
+        )
+        tenant = Tenant('token', 1)
+        for _ in range(3):
+            homework.poll_tenant(None, tenant)
+        clock.now = 10
+        api_down = False
+        homework.poll_tenant(None, tenant)
+        assert len(messages) == 2, (
+            'За сбой ученик должен получить одно сообщение о сбое и одно '
+            f'о восстановлении, получено: {messages}'
+        )
+
+    def test_short_circuit_is_not_a_tenant_failure(self, monkeypatch):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30,
+                                 clock=clock)
+        monkeypatch.setattr(homework, 'circuit_breaker', breaker)
+        breaker.before_call()
+        breaker.record_failure()
+        clock.now = 10
+        tenant = Tenant('token', 1)
+        for _ in range(5):
+            homework.process_error(tenant, exceptions.CircuitOpen('открыт'))
+        assert tenant.failures == 0, (
+            'Отказ автомата защиты не должен считаться сбоем ученика'
+        )
+        policy = AdaptiveInterval(active=60, idle=600, minimum=1,
+                                  maximum=3600)
+        assert policy.base_interval(tenant) == 20, (
+            'Опрос должен повторяться, когда автомат пропустит запрос'
+        )
@@ -0,0 +1,111 @@
+import sqlite3
+import threading
+import time
+
+import telegram
+
+from commands import CommandHandler, UpdatesListener, split_message
+from fake_servers import FakeTelegram
+from records import Homework, HomeworkStatus
+from tenants import Tenant
+
+
+def make_tenant(chat_id=1):
+    tenant = Tenant('token', chat_id)
+    tenant.homeworks = {
+        '1': Homework('1', 'hw1', HomeworkStatus.APPROVED),
+        '2': Homework('2', 'hw2', HomeworkStatus.REVIEWING),
+    }
+    tenant.last_message = 'Изменился статус проверки работы "hw2".'
+    return tenant
+
+
+class TestCommandHandler:
+
+    def test_status_and_last(self):
+        handler = CommandHandler([make_tenant()])
+        assert handler.answer(1, '/status') == (
+            '«hw1»: принята\n«hw2»: на проверке'
+        )
+        assert handler.answer('1', '/last@homework_bot') == (
+            'Изменился статус проверки работы "hw2".'
+        )
+        assert handler.answer(1, '/unknown').startswith('Команды:')
+
+    def test_ignores_strangers_and_plain_text(self):
+        handler = CommandHandler([make_tenant()])
+        assert handler.answer(2, '/status') is None, (
+            'Бот не должен раскрывать статусы в чужие чаты'
+        )
+        assert handler.answer(1, 'привет') is None
+        assert handler.answer(1, None) is None
+
+    def test_empty_cache(self):
+        handler = CommandHandler([Tenant('token', 1)])
+        assert handler.answer(1, '/status') == (
+            'Пока нет работ с известным статусом.'
+        )
+        assert handler.answer(1, '/last') == 'Уведомлений пока не было.'
+
+    def test_long_reply_is_split(self):
+        lines = [f'«работа {number}»: принята' for number in range(500)]
+        parts = split_message('\n'.join(lines))
+        assert len(parts) > 1
+        assert all(0 < len(part) <= 4096 for part in parts), (
+            'Ответ должен укладываться в лимит Telegram 4096 символов'
+        )
+        assert '\n'.join(parts).split('\n') == lines
+        assert split_message('x' * 5000) == ['x' * 4096, 'x' * 904]
+
+
+class TestUpdatesListener:
+
+    def test_commands_answered_via_get_updates(self):
+        fake = FakeTelegram().start()
+        bot = telegram.Bot(token='1234:abcdefg', base_url=fake.url)
+        replies = []
+        listener = UpdatesListener(
+            bot, CommandHandler([make_tenant(42)]),
+            lambda chat_id, text: replies.append((chat_id, text)), timeout=0
+        )
+        try:
+            fake.push_message(42, '/status')
+            fake.push_message(7, '/status')
+            assert listener.poll_once() == 1
+            assert replies == [(42, '«hw1»: принята\n«hw2»: на проверке')]
+            assert listener.poll_once() == 0, (
+                'Обработанные сообщения не должны приходить повторно'
+            )
+        finally:
+            fake.stop()
+
+    def test_refresh_error_does_not_stop_listener(self):
+        fake = FakeTelegram().start()
+        bot = telegram.Bot(token='1234:abcdefg', base_url=fake.url)
+        replies = []
+        calls = []
+
+        def refresh(tenants):
+            calls.append(tenants)
+            if len(calls) == 1:
+                raise sqlite3.OperationalError('database is locked')
+
+        listener = UpdatesListener(
+            bot, CommandHandler([make_tenant(42)], refresh=refresh),
+            lambda chat_id, text: replies.append((chat_id, text)),
+            timeout=0, retry_delay=0.01
+        )
+        thread = threading.Thread(target=listener.run, daemon=True)
+        try:
+            fake.push_message(42, '/last')
+            fake.push_message(42, '/status')
+            thread.start()
+            for _ in range(100):
+                if replies:
+                    break
+                time.sleep(0.05)
+        finally:
+            listener.stop()
+            thread.join(5)
+            fake.stop()
+        assert replies, 'После сбоя обработки команды должны отвечаться'
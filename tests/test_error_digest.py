@@ -0,0 +1,65 @@
+import exceptions
+import homework
+from error_digest import ErrorDigest, fingerprint
+from tenants import Tenant
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestErrorDigest:
+
+    def test_fingerprint_ignores_volatile_details(self):
+        first = exceptions.WrongRequestToAPI(
+            'Не удалось выполнить запрос: http://host:8080/x timeout 3.05'
+        )
+        second = exceptions.WrongRequestToAPI(
+            'Не удалось выполнить запрос: http://other/y timeout 10'
+        )
+        assert fingerprint(first) == fingerprint(second)
+        assert fingerprint(first) != fingerprint(
+            exceptions.URLNotAvailable(str(first))
+        ), 'Класс исключения должен входить в отпечаток'
+
+    def test_alternating_errors_are_aggregated(self):
+        clock = FakeClock()
+        digest = ErrorDigest(clock=clock)
+        sent = []
+        for index in range(10):
+            clock.now = index
+            error_class = (exceptions.URLNotAvailable,
+                           exceptions.JSONInvalidCode)[index % 2]
+            sent += digest.add(error_class(f'Сбой {index}'), window=60)[1]
+        assert len(sent) == 2, (
+            'Каждый вид сбоя сообщается один раз, повторы копятся в сводке'
+        )
+
+        clock.now = 61
+        sent = digest.add(exceptions.URLNotAvailable('Сбой 99'), window=60)[1]
+        assert len(sent) == 1 and 'URLNotAvailable ×6' in sent[0]
+
+        clock.now = 62
+        [recovered] = digest.recover()
+        assert recovered.startswith('Работа восстановлена')
+        assert 'JSONInvalidCode ×5' in recovered
+        assert not digest.active and digest.recover() == []
+
+    def test_process_error_and_recovery(self):
+        tenant = Tenant('token', 1)
+        for code in (500, 502, 503):
+            messages = homework.process_error(
+                tenant, exceptions.URLNotAvailable(f'Код ответа {code}')
+            )
+            assert len(messages) == (code == 500)
+        messages = homework.process_answer(
+            tenant, {'homeworks': [], 'current_date': 1}
+        )
+        assert len(messages) == 1 and '×3' in messages[0], (
+            'При восстановлении должна отправляться итоговая сводка'
+        )
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+import requests
+import telegram
+
+import exceptions
+import homework
+from fake_servers import FakePracticum, FakeTelegram, Faults
+from tenants import Tenant
+
+
+@pytest.fixture
+def practicum():
+    fake = FakePracticum(students=3, seed=1).start()
+    yield fake
+    fake.stop()
+
+
+class TestFakeServers:
+
+    def test_real_code_path_against_fake_practicum(self, monkeypatch,
+                                                   practicum):
+        monkeypatch.setattr(homework, 'ENDPOINT', practicum.url)
+        tenant = Tenant('student-0', 1)
+        response = homework.fetch_api_answer(0, tenant.headers)
+        homeworks = homework.check_response(response)
+        assert homeworks, 'С from_date=0 должна вернуться вся история'
+        assert all(hw['status'] in homework.HOMEWORK_STATUSES
+                   for hw in homeworks)
+        assert isinstance(response['current_date'], int)
+
+        with pytest.raises(exceptions.URLNotAvailable):
+            homework.fetch_api_answer(0, Tenant('unknown', 1).headers)
+
+    def test_zero_latency_on_reused_connection(self, practicum):
+        headers = {'Authorization': 'OAuth student-0'}
+        with requests.Session() as session:
+            session.get(practicum.url, headers=headers).close()
+            started = time.perf_counter()
+            for _ in range(10):
+                session.get(practicum.url, headers=headers).close()
+            elapsed = (time.perf_counter() - started) / 10
+        assert elapsed < 0.02, (
+            f'Запрос по открытому соединению занял {elapsed * 1000:.0f} мс '
+            'при задержке const:0'
+        )
+
+    @pytest.mark.parametrize('faults, error', [
+        (Faults(error_rate=1, error_statuses=[503]),
+         exceptions.URLNotAvailable),
+        (Faults(malformed_rate=1), exceptions.JSONInvalidCode),
+        (Faults(rate_limit_rate=1), exceptions.URLNotAvailable),
+    ])
+    def test_faults(self, monkeypatch, faults, error):
+        practicum = FakePracticum(students=1, faults=faults).start()
+        monkeypatch.setattr(homework, 'ENDPOINT', practicum.url)
+        try:
+            with pytest.raises(error):
+                homework.fetch_api_answer(0, Tenant('student-0', 1).headers)
+        finally:
+            practicum.stop()
+
+    def test_fake_telegram(self):
+        fake = FakeTelegram(rate_limit=1).start()
+        bot = telegram.Bot(token='1234:abcdefg', base_url=fake.url)
+        try:
+            message = bot.send_message(chat_id=42, text='Вердикт')
+            assert message.text == 'Вердикт'
+            assert fake.messages == [('42', 'Вердикт')]
+            with pytest.raises(telegram.error.RetryAfter):
+                bot.send_message(chat_id=42, text='Вердикт')
+        finally:
+            fake.stop()
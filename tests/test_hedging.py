@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+import exceptions
+import homework
+from fake_servers import FakePracticum, Faults
+from hedging import HedgedCaller, LatencyTracker
+from tenants import Tenant
+
+
+class TestHedging:
+
+    def test_deadline_maps_to_wrong_request(self):
+        caller = HedgedCaller(2)
+        started = time.monotonic()
+        with pytest.raises(exceptions.WrongRequestToAPI):
+            caller.call(lambda: time.sleep(1), time.monotonic() + 0.1)
+        assert time.monotonic() - started < 0.5, (
+            'Опрос не должен ждать дольше бюджета'
+        )
+        caller.close()
+
+    def test_hedged_request_wins(self):
+        tracker = LatencyTracker()
+        for _ in range(50):
+            tracker.observe(0.01)
+        calls = []
+        discarded = []
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                calls.append(None)
+                slow = len(calls) == 1
+            if slow:
+                time.sleep(0.5)
+                return 'slow'
+            return 'fast'
+
+        caller = HedgedCaller(2, hedge=True, tracker=tracker)
+        started = time.monotonic()
+        assert caller.call(
+            call, time.monotonic() + 5, discard=discarded.append
+        ) == 'fast'
+        assert time.monotonic() - started < 0.3
+        time.sleep(0.6)
+        assert discarded == ['slow'], 'Опоздавший ответ нужно освобождать'
+        caller.close()
+
+    def test_error_is_raised_without_second_call(self):
+        caller = HedgedCaller(2)
+
+        def call():
+            raise ValueError('Сбой')
+
+        with pytest.raises(ValueError):
+            caller.call(call, time.monotonic() + 5)
+        caller.close()
+
+    def test_poll_budget_against_slow_upstream(self, monkeypatch):
+        practicum = FakePracticum(
+            students=1, faults=Faults(latency='const:1')
+        ).start()
+        monkeypatch.setattr(homework, 'ENDPOINT', practicum.url)
+        monkeypatch.setattr(homework, 'POLL_DEADLINE', 0.2)
+        monkeypatch.setattr(homework, 'api_caller', HedgedCaller(2))
+        try:
+            with pytest.raises(exceptions.DeadlineExceeded):
+                homework.poll_answer(Tenant('student-0', 1))
+        finally:
+            homework.api_caller.close()
+            practicum.stop()
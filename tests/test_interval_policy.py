@@ -0,0 +1,56 @@
+import exceptions
+from interval_policy import AdaptiveInterval, FixedInterval
+from records import Homework, HomeworkStatus
+from tenants import Tenant
+
+
+def make_homeworks(*statuses):
+    return {
+        str(key): Homework(str(key), f'hw{key}', HomeworkStatus(status))
+        for key, status in enumerate(statuses)
+    }
+
+
+def make_policy(**kwargs):
+    params = dict(active=60, idle=600, minimum=30, maximum=3600, jitter=0)
+    params.update(kwargs)
+    return AdaptiveInterval(**params)
+
+
+class TestIntervalPolicy:
+
+    def test_fixed(self):
+        assert FixedInterval(600).next_interval(Tenant('token', 1)) == 600
+
+    def test_reviewing_polls_faster(self):
+        tenant = Tenant('token', 1)
+        tenant.homeworks = make_homeworks('approved', 'reviewing')
+        tenant.idle_polls = 5
+        assert make_policy().next_interval(tenant) == 60, (
+            'Пока работа на ревью, интервал должен быть `active`'
+        )
+
+    def test_idle_backs_off_to_maximum(self):
+        tenant = Tenant('token', 1)
+        policy = make_policy()
+        intervals = []
+        for idle_polls in range(1, 6):
+            tenant.idle_polls = idle_polls
+            intervals.append(policy.next_interval(tenant))
+        assert intervals == [600, 1200, 2400, 3600, 3600]
+
+    def test_upstream_errors_back_off(self):
+        tenant = Tenant('token', 1)
+        tenant.homeworks = make_homeworks('reviewing')
+        tenant.last_error = exceptions.URLNotAvailable('URL недоступен')
+        tenant.failures = 2
+        assert make_policy().next_interval(tenant) == 1200, (
+            'После сбоев API интервал должен расти, даже если работа на ревью'
+        )
+
+    def test_jitter_stays_in_bounds(self):
+        tenant = Tenant('token', 1)
+        tenant.homeworks = make_homeworks('reviewing')
+        policy = make_policy(active=40, jitter=0.5)
+        for _ in range(100):
+            assert 30 <= policy.next_interval(tenant) <= 60
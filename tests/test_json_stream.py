@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from json_stream import StreamedAnswer
+
+
+def chunked(data, size):
+    encoded = json.dumps(data, ensure_ascii=False).encode()
+    return [encoded[i:i + size] for i in range(0, len(encoded), size)]
+
+
+class TestJSONStream:
+
+    @pytest.mark.parametrize('size', [1, 3, 7, 1024])
+    def test_items_and_fields(self, size):
+        data = {
+            'current_date': 1234567890,
+            'homeworks': [
+                {'id': 1, 'homework_name': 'Работа 1', 'status': 'approved'},
+                {'id': 22, 'homework_name': 'Работа 2', 'status': 'reviewing'},
+                [1, 2.5, None],
+            ],
+            'tail': 100500,
+        }
+        answer = StreamedAnswer(chunked(data, size))
+        assert list(answer.items()) == data['homeworks'], (
+            'Элементы массива должны разбираться при любом размере кусков'
+        )
+        assert answer.fields['current_date'] == 1234567890
+        assert answer.fields['tail'] == 100500
+
+    def test_empty_array_and_object(self):
+        answer = StreamedAnswer(chunked({'homeworks': []}, 2))
+        assert list(answer.items()) == []
+        assert answer.fields == {'homeworks': []}
+        assert list(StreamedAnswer([b'{}']).items()) == []
+
+    def test_not_an_object(self):
+        with pytest.raises(TypeError):
+            list(StreamedAnswer([b'[{"homeworks": []}]']).items())
+
+    @pytest.mark.parametrize('body', [
+        b'{"homeworks": [{"id": 1}',
+        b'{"homeworks": [{"id": 1}] "x": 1}',
+        b'{"homeworks": []} trailing',
+    ])
+    def test_malformed(self, body):
+        with pytest.raises(json.JSONDecodeError):
+            list(StreamedAnswer([body]).items())
+
+    def test_buffer_stays_bounded(self):
+        item = {'homework_name': 'x' * 100, 'status': 'approved'}
+        chunks = chunked({'homeworks': [item] * 5000}, 512)
+        answer = StreamedAnswer(chunks)
+        peak = 0
+        for _ in answer.items():
+            peak = max(peak, len(answer._reader._buffer))
+        assert peak < 4096, (
+            'Буфер чтения не должен расти вместе с длиной истории'
+        )
+
+    def test_close(self):
+        closed = []
+        with StreamedAnswer([b'{}'], close=lambda: closed.append(True)):
+            pass
+        assert closed == [True]
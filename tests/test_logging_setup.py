@@ -0,0 +1,41 @@
+import json
+import logging
+
+import logging_setup
+from logging_setup import JsonFormatter, SamplingFilter
+
+
+def make_record(message, level=logging.ERROR):
+    return logging.LogRecord(
+        'homework', level, __file__, 1, message, None, None
+    )
+
+
+class TestLoggingSetup:
+
+    def test_repeating_error_is_sampled(self, monkeypatch):
+        now = [0.0]
+        monkeypatch.setattr(logging_setup.time, 'monotonic', lambda: now[0])
+        sampling = SamplingFilter(window=60, limit=2)
+        passed = [
+            sampling.filter(make_record(f'Сбой в работе программы: {n}'))
+            for n in range(5)
+        ]
+        assert passed == [True, True, False, False, False], (
+            'Сообщения с одним ключом должны прореживаться'
+        )
+        assert sampling.filter(make_record('Сбой отправки сообщения: x'))
+        assert sampling.filter(
+            make_record('Сбой в работе программы: 9', level=logging.INFO)
+        ), 'Записи ниже WARNING не прореживаются'
+
+        now[0] = 61.0
+        record = make_record('Сбой в работе программы: 5')
+        assert sampling.filter(record)
+        assert record.getMessage().endswith('(подавлено повторов: 3)')
+
+    def test_json_formatter(self):
+        line = JsonFormatter().format(make_record('Сбой в работе программы'))
+        data = json.loads(line)
+        assert data['level'] == 'ERROR'
+        assert data['message'] == 'Сбой в работе программы'
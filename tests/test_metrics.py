@@ -0,0 +1,63 @@
+import requests
+
+import metrics
+
+
+class TestMetrics:
+
+    def test_counter_and_histogram_render(self):
+        registry = metrics.Registry()
+        errors = registry.register(metrics.Counter(
+            'errors_total', 'Сбои', labelnames=('exception',)
+        ))
+        latency = registry.register(metrics.Histogram(
+            'latency_seconds', 'Задержка', buckets=(0.1, 1)
+        ))
+        errors.labels('URLNotAvailable').inc()
+        errors.labels('URLNotAvailable').inc()
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(5)
+
+        text = registry.render()
+        assert '# TYPE errors_total counter' in text
+        assert 'errors_total{exception="URLNotAvailable"} 2' in text
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert 'latency_seconds_count 3' in text
+
+    def test_timed_keeps_signature_and_observes(self):
+        latency = metrics.Histogram('f_seconds', 'Время', ('function',))
+
+        @metrics.timed(latency, 'f')
+        def f(value):
+            """Документация."""
+            return value * 2
+
+        assert f(2) == 4
+        assert f.__doc__ == 'Документация.'
+        assert latency.labels('f').count == 1
+
+    def test_gauge_function(self):
+        depth = metrics.Gauge('depth', 'Глубина')
+        depth.set_function(lambda: 7)
+        assert 'depth 7' in depth.render()
+
+    def test_metrics_endpoint(self):
+        registry = metrics.Registry()
+        registry.register(metrics.Counter('sent_total', 'Отправлено')).inc()
+        server = metrics.start_metrics_server(0, registry=registry)
+        port = server.server_address[1]
+        try:
+            response = requests.get(
+                f'http://127.0.0.1:{port}/metrics', timeout=5
+            )
+            assert response.status_code == 200
+            assert 'sent_total 1' in response.text
+            assert requests.get(
+                f'http://127.0.0.1:{port}/other', timeout=5
+            ).status_code == 404
+        finally:
+            server.shutdown()
+            server.server_close()
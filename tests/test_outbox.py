@@ -0,0 +1,170 @@
+import threading
+import time
+
+import telegram
+
+import homework
+import outbox as outbox_module
+from outbox import Outbox
+from sender import MessageSender
+
+
+class FailingBot:
+
+    def __init__(self, failing):
+        self.failing = failing
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if text in self.failing:
+            raise self.failing[text]
+        self.sent.append((chat_id, text))
+
+
+class TestOutbox:
+
+    def test_concurrent_appends_share_fsync(self, monkeypatch, tmp_path):
+        fsyncs = []
+
+        def slow_fsync(fd):
+            fsyncs.append(fd)
+            time.sleep(0.01)
+
+        monkeypatch.setattr(outbox_module.os, 'fsync', slow_fsync)
+        journal = Outbox(tmp_path / 'outbox.jsonl')
+        fsyncs.clear()
+        threads = [
+            threading.Thread(target=journal.append, args=(1, f'текст {n}'))
+            for n in range(50)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        journal.close()
+        assert len(journal.pending()) == 50
+        assert len(fsyncs) < 25, (
+            f'50 записей зафиксированы {len(fsyncs)} вызовами fsync, '
+            'ожидается групповая фиксация'
+        )
+
+    def test_unacked_entries_survive_restart(self, tmp_path):
+        path = tmp_path / 'outbox.jsonl'
+        journal = Outbox(path)
+        first = journal.append(1, 'первое')
+        journal.append(2, 'второе')
+        assert journal.append(2, 'второе') is None, (
+            'Такое же ожидающее сообщение не должно записываться снова'
+        )
+        journal.append(1, 'третье')
+        journal.ack(first)
+        journal.close()
+        with open(path, 'a', encoding='UTF-8') as tail:
+            tail.write('{"op":"add","key":"обрыв')
+
+        restarted = Outbox(path)
+        restarted.close()
+        assert [
+            (chat_id, text) for _, chat_id, text in restarted.pending()
+        ] == [(2, 'второе'), (1, 'третье')]
+        assert len(path.read_text(encoding='UTF-8').splitlines()) == 2, (
+            'При открытии журнал должен сжиматься до ожидающих записей'
+        )
+
+    def test_sender_acks_delivered_and_rejected(self, tmp_path):
+        path = tmp_path / 'outbox.jsonl'
+        journal = Outbox(path)
+        bot = FailingBot({
+            'сеть': telegram.error.NetworkError('нет связи'),
+            'отказ': telegram.error.BadRequest('chat not found'),
+        })
+        message_sender = MessageSender(
+            bot, workers=1, maxsize=10, global_rate=1000, chat_rate=1000,
+            retries=0, on_done=journal.ack
+        ).start()
+        for text in ('вердикт', 'сеть', 'отказ'):
+            message_sender.submit(1, text, journal.append(1, text))
+        message_sender.close(timeout=5)
+        journal.close()
+        reopened = Outbox(path)
+        reopened.close()
+        assert bot.sent == [(1, 'вердикт')]
+        assert [text for _, _, text in reopened.pending()] == ['сеть'], (
+            'После сетевого сбоя сообщение должно остаться в журнале'
+        )
+
+    def test_failed_message_is_retried_while_running(self, tmp_path):
+        journal = Outbox(tmp_path / 'outbox.jsonl', retry_backoff=0.05)
+        bot = FailingBot({'вердикт': telegram.error.NetworkError('нет связи')})
+        message_sender = MessageSender(
+            bot, workers=1, maxsize=10, global_rate=1000, chat_rate=1000,
+            retries=0, on_done=journal.ack, on_failed=journal.failed
+        ).start()
+        journal.start_retries(message_sender.submit)
+        message_sender.submit(1, 'вердикт', journal.append(1, 'вердикт'))
+        time.sleep(0.1)
+        bot.failing.clear()
+        deadline = time.monotonic() + 5
+        while journal.pending() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        message_sender.close(timeout=5)
+        journal.close()
+        assert bot.sent == [(1, 'вердикт')], (
+            'Сообщение после сетевого сбоя должно повторяться без перезапуска'
+        )
+        assert not journal.pending()
+
+    def test_acked_entries_are_compacted(self, tmp_path):
+        path = tmp_path / 'outbox.jsonl'
+        journal = Outbox(path, compact_after=10)
+        journal.append(1, 'ждёт')
+        for number in range(30):
+            journal.ack(journal.append(1, f'доставлено {number}'))
+        journal.append(1, 'последнее')
+        lines = len(path.read_text(encoding='UTF-8').splitlines())
+        journal.close()
+        assert lines < 30, (
+            f'В журнале {lines} строк: подтверждённые записи должны '
+            'вычищаться без перезапуска'
+        )
+        reopened = Outbox(path)
+        reopened.close()
+        assert [text for _, _, text in reopened.pending()] == [
+            'ждёт', 'последнее'
+        ]
+
+    def test_orphaned_journal_is_adopted_live_one_is_not(self, tmp_path):
+        base = tmp_path / 'outbox.jsonl'
+        dead = Outbox(f'{base}.dead')
+        dead.append(1, 'недоставленное')
+        dead.close()
+        live = Outbox(f'{base}.live')
+        live.append(2, 'чужое')
+        journal = Outbox(f'{base}.me')
+        assert journal.adopt(f'{base}.dead') == 1
+        assert journal.adopt(f'{base}.live') is None, (
+            'Журнал работающего процесса забирать нельзя'
+        )
+        live.close()
+        journal.close()
+        reopened = Outbox(f'{base}.me')
+        reopened.close()
+        assert [text for _, _, text in reopened.pending()] == [
+            'недоставленное'
+        ]
+        assert not (tmp_path / 'outbox.jsonl.dead').exists()
+
+    def test_dropped_message_does_not_block_identical_one(
+            self, monkeypatch, tmp_path):
+        journal = Outbox(tmp_path / 'outbox.jsonl')
+        message_sender = MessageSender(FailingBot({}), workers=1, maxsize=1)
+        monkeypatch.setattr(homework, 'outbox', journal)
+        monkeypatch.setattr(homework, 'message_sender', message_sender)
+        homework.queue_message(None, 1, 'первое')
+        homework.queue_message(None, 1, 'второе')
+        message_sender.start()
+        message_sender.close(timeout=5)
+        assert homework.queue_message(None, 1, 'второе'), (
+            'Сообщение, не попавшее в очередь, не должно подавлять такое же'
+        )
+        journal.close()
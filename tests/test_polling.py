@@ -0,0 +1,123 @@
+import json
+
+import exceptions
+import homework
+from json_stream import StreamedAnswer
+from records import Homework, HomeworkStatus
+from tenants import Tenant
+
+
+def make_response(*homeworks, current_date=1000):
+    return {'homeworks': list(homeworks), 'current_date': current_date}
+
+
+class TestProcessAnswer:
+
+    def test_every_homework_is_processed(self):
+        tenant = Tenant('token', 1)
+        messages = homework.process_answer(tenant, make_response(
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+            {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing'},
+        ))
+        assert len(messages) == 2, (
+            'Проверьте, что обрабатываются все работы из ответа API'
+        )
+        assert messages[0].startswith('Изменился статус проверки работы "hw1"')
+        assert tenant.homeworks == {
+            '1': Homework('1', 'hw1', HomeworkStatus.APPROVED),
+            '2': Homework('2', 'hw2', HomeworkStatus.REVIEWING),
+        }
+        assert tenant.current_timestamp == 1000
+
+    def test_empty_homeworks_is_not_an_error(self):
+        tenant = Tenant('token', 1)
+        assert homework.process_answer(tenant, make_response()) == []
+
+    def test_only_transitions_are_notified(self):
+        tenant = Tenant('token', 1)
+        tenant.homeworks = {
+            '1': Homework('1', 'hw1', HomeworkStatus.REVIEWING)
+        }
+        messages = homework.process_answer(tenant, make_response(
+            {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'},
+            {'id': 2, 'homework_name': 'hw2', 'status': 'rejected'},
+        ))
+        assert len(messages) == 1 and '"hw2"' in messages[0], (
+            'Уже известный статус не должен отправляться повторно'
+        )
+
+    def test_broken_homework_does_not_block_others(self):
+        tenant = Tenant('token', 1, 0)
+        messages = homework.process_answer(tenant, make_response(
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+            {'id': 2, 'homework_name': 'hw2', 'status': 'unknown'},
+            {'id': 3, 'status': 'rejected'},
+        ))
+        assert len(messages) == 1 and 'hw1' in messages[0], (
+            'Работа с ошибкой не должна мешать уведомлению об остальных'
+        )
+        assert list(tenant.homeworks) == ['1']
+        assert tenant.current_timestamp == 1000, (
+            'current_date должен сдвигаться, иначе работа с ошибкой '
+            'будет приходить при каждом опросе'
+        )
+
+
+class TestStreamedAnswer:
+
+    def test_streamed_path_matches_dict_path(self):
+        response = make_response(
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+            {'id': 2, 'homework_name': 'hw2', 'status': 'rejected'},
+            current_date=2000,
+        )
+        body = json.dumps(response).encode()
+        chunks = [body[i:i + 5] for i in range(0, len(body), 5)]
+
+        streamed, plain = Tenant('token', 1), Tenant('token', 1)
+        assert homework.process_streamed_answer(
+            streamed, StreamedAnswer(chunks)
+        ) == homework.process_answer(plain, response)
+        assert streamed.homeworks == plain.homeworks
+        assert streamed.current_timestamp == 2000
+
+    def test_streamed_without_homeworks(self):
+        try:
+            homework.process_streamed_answer(
+                Tenant('token', 1), StreamedAnswer([b'{"current_date": 1}'])
+            )
+        except KeyError:
+            pass
+        else:
+            assert False, 'Ответ без `homeworks` должен вызывать ошибку'
+
+
+class TestHomeworkRecord:
+
+    def test_record_from_dict(self):
+        record = Homework.from_dict(
+            {'id': 7, 'homework_name': 'hw', 'status': 'rejected',
+             'reviewer_comment': 'Не хранится', 'lesson_name': 'Спринт'}
+        )
+        assert record == Homework('7', 'hw', HomeworkStatus.REJECTED)
+        assert record.status is HomeworkStatus('rejected'), (
+            'Статус должен быть общим членом перечисления'
+        )
+        assert not hasattr(record, '__dict__')
+        assert homework.parse_status(record) == homework.parse_status(
+            {'homework_name': 'hw', 'status': 'rejected'}
+        )
+
+    def test_record_validation(self):
+        for data, error in (
+            ({'homework_name': 'hw', 'status': 'unknown'},
+             exceptions.NoHomeworkStatus),
+            ({'homework_name': 'hw'}, exceptions.NoHomeworkStatus),
+            ({'status': 'approved'}, exceptions.KeywordHomeworkNameLost),
+        ):
+            try:
+                Homework.from_dict(data)
+            except error:
+                pass
+            else:
+                assert False, f'{data} должен вызывать {error.__name__}'
@@ -0,0 +1,109 @@
+import json
+import signal
+import threading
+import time
+
+import homework
+import metrics
+from json_stream import StreamedAnswer
+from profiling import (
+    Profiler, SamplingProfiler, timings_report, timings_snapshot
+)
+from sender import MessageSender
+from tenants import Tenant
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestProfiling:
+
+    def test_sampling_profiler_sees_busy_thread(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,))
+        worker.start()
+        profiler = SamplingProfiler(interval=0.001).start()
+        time.sleep(0.1)
+        samples = profiler.stop()
+        stop.set()
+        worker.join()
+        assert not profiler.running
+        assert any('busy_loop' in stack for stack in samples), (
+            'Стеки должны включать функцию занятого потока'
+        )
+        assert not any('_sample_forever' in stack for stack in samples), (
+            'Поток профилировщика не должен попадать в выборку'
+        )
+
+    def test_timings_report_counts_only_window(self):
+        histogram = metrics.Histogram(
+            'test_profile_seconds', 'test', labelnames=('function',)
+        )
+        histogram.labels('parse_status').observe(0.2)
+        before = timings_snapshot(histogram)
+        for _ in range(3):
+            histogram.labels('parse_status').observe(0.003)
+        report = timings_report(histogram, before)
+        assert report['parse_status']['calls'] == 3
+        assert report['parse_status']['p95_le'] == 0.005
+
+    def test_signals_toggle_profiles(self, tmp_path):
+        histogram = metrics.Histogram(
+            'test_signal_seconds', 'test', labelnames=('function',)
+        )
+        profiler = Profiler(tmp_path, timings=histogram, interval=0.001)
+        previous = {
+            signum: signal.signal(signum, lambda *_, toggle=toggle: toggle())
+            for signum, toggle in (
+                (signal.SIGUSR1, profiler.toggle_cpu),
+                (signal.SIGUSR2, profiler.toggle_memory),
+            )
+        }
+        try:
+            signal.raise_signal(signal.SIGUSR1)
+            signal.raise_signal(signal.SIGUSR2)
+            assert profiler.cpu.running
+            histogram.labels('get_api_answer').observe(0.01)
+            kept = [bytearray(1024) for _ in range(100)]
+            time.sleep(0.05)
+            signal.raise_signal(signal.SIGUSR1)
+            signal.raise_signal(signal.SIGUSR2)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        assert kept and not profiler.cpu.running
+        names = sorted(path.name.split('-')[0] for path in tmp_path.iterdir())
+        assert names == ['cpu', 'memory', 'timings']
+        timings = json.loads(next(tmp_path.glob('timings-*')).read_text())
+        assert timings['get_api_answer']['calls'] == 1
+        memory = next(tmp_path.glob('memory-*')).read_text()
+        assert 'test_profiling.py' in memory, (
+            'Разница снимков должна указывать на строку с выделением памяти'
+        )
+
+    def test_sender_and_streamed_path_are_timed(self):
+        before = timings_snapshot(homework.FUNCTION_SECONDS)
+
+        class Bot:
+            def send_message(self, chat_id, text):
+                pass
+
+        message_sender = MessageSender(
+            Bot(), workers=1, maxsize=10, global_rate=1000, chat_rate=1000
+        ).start()
+        message_sender.submit(1, 'вердикт')
+        message_sender.close(timeout=5)
+        body = json.dumps({'homeworks': [
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'}
+        ], 'current_date': 1}).encode()
+        answer = StreamedAnswer(homework.timed_iteration(
+            [body[:10], body[10:]], 'read_body'
+        ))
+        homework.process_streamed_answer(Tenant('token', 1), answer)
+        report = timings_report(homework.FUNCTION_SECONDS, before)
+        for function in ('send_message', 'check_response', 'read_body'):
+            assert report[function]['calls'] == 1, (
+                f'Время {function} должно попадать в отчёт профиля'
+            )
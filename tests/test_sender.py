@@ -0,0 +1,115 @@
+import threading
+import time
+
+import telegram
+
+import sender
+from sender import MessageSender, TokenBucket
+
+
+class FlakyBot:
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text))
+
+
+class TestSender:
+
+    def test_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        delays = [bucket.reserve() for _ in range(4)]
+        assert delays[:2] == [0.0, 0.0], 'Пачка до `burst` без ожидания'
+        assert 0.05 < delays[2] <= 0.1
+        assert 0.15 < delays[3] <= 0.2
+
+    def test_messages_are_delivered_in_order(self):
+        bot = FlakyBot()
+        message_sender = MessageSender(
+            bot, workers=2, maxsize=100, global_rate=1000, chat_rate=1000
+        ).start()
+        for number in range(5):
+            assert message_sender.submit(1, f'сообщение {number}')
+        message_sender.close(timeout=5)
+        assert bot.sent == [(1, f'сообщение {n}') for n in range(5)]
+        assert message_sender.stats()['sent'] == 5
+
+    def test_retry_after_and_network_errors_are_retried(self, monkeypatch):
+        sleeps = []
+        monkeypatch.setattr(sender.time, 'sleep', sleeps.append)
+        bot = FlakyBot([
+            telegram.error.RetryAfter(7),
+            telegram.error.TimedOut(),
+        ])
+        message_sender = MessageSender(
+            bot, workers=1, maxsize=10, global_rate=1000, chat_rate=1000
+        ).start()
+        message_sender.submit(1, 'вердикт')
+        message_sender.close(timeout=5)
+        assert bot.sent == [(1, 'вердикт')], (
+            'Проверьте, что сообщение отправляется после RetryAfter и TimedOut'
+        )
+        assert 7 in sleeps
+
+    def test_bad_request_is_not_retried(self):
+        bot = FlakyBot([telegram.error.BadRequest('chat not found')])
+        message_sender = MessageSender(
+            bot, workers=1, maxsize=10, global_rate=1000, chat_rate=1000
+        ).start()
+        message_sender.submit(1, 'вердикт')
+        message_sender.close(timeout=5)
+        assert bot.sent == []
+        assert message_sender.stats()['failed'] == 1
+
+    def test_full_queue_drops_without_blocking(self):
+        message_sender = MessageSender(FlakyBot(), workers=1, maxsize=1)
+        assert message_sender.submit(1, 'первое')
+        assert not message_sender.submit(1, 'второе')
+        assert message_sender.stats()['dropped'] == 1
+
+    def test_close_respects_timeout_on_full_queue(self):
+        sending = threading.Event()
+
+        class SlowBot(FlakyBot):
+
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                sending.set()
+                time.sleep(1)
+                super().send_message(chat_id, text)
+
+        message_sender = MessageSender(
+            SlowBot(), workers=1, maxsize=10, global_rate=1000, chat_rate=1000
+        ).start()
+        message_sender.submit(1, 'вердикт')
+        assert sending.wait(5)
+        while message_sender.submit(1, 'вердикт'):
+            pass
+        started = time.monotonic()
+        message_sender.close(timeout=0.2)
+        assert time.monotonic() - started < 0.8, (
+            'Остановка не должна ждать места в заполненной очереди'
+        )
+
+    def test_busy_chat_does_not_stall_others(self):
+        bot = FlakyBot()
+        message_sender = MessageSender(
+            bot, workers=4, maxsize=400, global_rate=1000, chat_rate=1
+        ).start()
+        started = time.monotonic()
+        for chat_id in range(40):
+            message_sender.submit(chat_id, 'восстановление')
+            message_sender.submit(chat_id, 'вердикт')
+        message_sender.close(timeout=10)
+        assert time.monotonic() - started < 3, (
+            'Пока чат ждёт своей частоты, поток должен отправлять '
+            'сообщения в другие чаты'
+        )
+        for chat_id in range(40):
+            assert [
+                text for chat, text in bot.sent if chat == chat_id
+            ] == ['восстановление', 'вердикт']
@@ -0,0 +1,175 @@
+import threading
+import time
+
+from interval_policy import FixedInterval
+from poller import MultiTenantPoller
+from sharding import HashRing, LeaseManager, ShardCoordinator
+from tenants import Tenant
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_tenants(count):
+    return [Tenant(f'token-{index}', index) for index in range(count)]
+
+
+class TestSharding:
+
+    def test_ring_moves_few_keys(self):
+        keys = [f'key-{index}' for index in range(2000)]
+        before = HashRing(['a', 'b', 'c'])
+        after = HashRing(['a', 'b', 'c', 'd'])
+        moved = [k for k in keys if before.node_for(k) != after.node_for(k)]
+        assert all(after.node_for(k) == 'd' for k in moved), (
+            'При добавлении воркера ключи должны переезжать только к нему'
+        )
+        assert len(moved) < len(keys) / 2
+        shares = [
+            sum(before.node_for(k) == node for k in keys) for node in 'abc'
+        ]
+        assert min(shares) > len(keys) / 6, f'Перекос долей: {shares}'
+
+    def test_lease_is_exclusive_until_expiry(self, tmp_path):
+        path = tmp_path / 'shard.sqlite3'
+        clock = FakeClock()
+        first = LeaseManager(path, 'a', ttl=30, clock=clock)
+        second = LeaseManager(path, 'b', ttl=30, clock=clock)
+        assert first.acquire(['k1', 'k2']) == {'k1', 'k2'}
+        assert second.acquire(['k2', 'k3']) == {'k3'}, (
+            'Действующую чужую аренду перехватывать нельзя'
+        )
+        clock.now += 31
+        assert second.acquire(['k2', 'k3']) == {'k2', 'k3'}
+        assert first.acquire(['k1', 'k2']) == {'k1'}
+
+    def test_workers_split_and_rebalance(self, tmp_path):
+        path = tmp_path / 'shard.sqlite3'
+        clock = FakeClock()
+        tenants = make_tenants(300)
+        first = ShardCoordinator(
+            tenants, LeaseManager(path, 'a', ttl=30, clock=clock)
+        )
+        assert len(first.rebalance()) == 300
+        second = ShardCoordinator(
+            tenants, LeaseManager(path, 'b', ttl=30, clock=clock)
+        )
+        second.rebalance()
+        first.rebalance()
+        second.rebalance()
+        assert first.owned.isdisjoint(second.owned), (
+            'Один ученик не должен опрашиваться двумя воркерами'
+        )
+        assert len(first.owned | second.owned) == 300
+        assert 0 < len(second.owned) < 300
+        assert first.leader != second.leader
+
+        second.stop()
+        first.rebalance()
+        assert len(first.owned) == 300 and first.leader
+
+    def test_dead_worker_leases_expire(self, tmp_path):
+        path = tmp_path / 'shard.sqlite3'
+        clock = FakeClock()
+        tenants = make_tenants(50)
+        dead = ShardCoordinator(
+            tenants, LeaseManager(path, 'dead', ttl=30, clock=clock)
+        )
+        dead.rebalance()
+        alive = ShardCoordinator(
+            tenants, LeaseManager(path, 'alive', ttl=30, clock=clock)
+        )
+        alive.rebalance()
+        assert len(alive.owned) < 50
+        clock.now += 31
+        alive.rebalance()
+        assert len(alive.owned) == 50
+
+    def test_ownership_lapses_without_renewal(self, tmp_path):
+        clock = FakeClock()
+        tenants = make_tenants(5)
+        shard = ShardCoordinator(
+            tenants, LeaseManager(tmp_path / 'shard.sqlite3', 'a', ttl=30,
+                                  clock=clock)
+        )
+        shard.rebalance()
+        assert all(shard.owns(tenant) for tenant in tenants)
+        clock.now += 19
+        assert shard.owns(tenants[0])
+        clock.now += 1
+        assert not any(shard.owns(tenant) for tenant in tenants), (
+            'Без продления аренд воркер должен перестать опрашивать '
+            'учеников до истечения аренд'
+        )
+        shard.rebalance()
+        assert shard.owns(tenants[0])
+
+    def test_release_waits_for_running_poll(self, tmp_path):
+        path = tmp_path / 'shard.sqlite3'
+        clock = FakeClock()
+        tenants = make_tenants(50)
+        released = []
+        first = ShardCoordinator(
+            tenants, LeaseManager(path, 'a', ttl=30, clock=clock),
+            on_release=lambda keys: released.append((keys, list(finished)))
+        )
+        first.rebalance()
+        moving = next(
+            tenant for tenant in tenants
+            if HashRing(['a', 'b']).node_for(tenant.key) == 'b'
+        )
+        started = threading.Event()
+        finished = []
+        owned_during_handover = []
+
+        def poll():
+            with first.polling(moving) as owned:
+                assert owned
+                started.set()
+                time.sleep(0.1)
+                owned_during_handover.append(first.owns(moving))
+                time.sleep(0.1)
+                finished.append(moving.key)
+
+        thread = threading.Thread(target=poll)
+        thread.start()
+        started.wait(5)
+        ShardCoordinator(
+            tenants, LeaseManager(path, 'b', ttl=30, clock=clock)
+        ).rebalance()
+        first.rebalance()
+        thread.join()
+        keys, finished_before_release = released[0]
+        assert moving.key in keys
+        assert finished_before_release == [moving.key], (
+            'Состояние передаваемого ученика должно сбрасываться после '
+            'завершения его опроса'
+        )
+        assert owned_during_handover == [False], (
+            'Передаваемого ученика нельзя начинать опрашивать снова'
+        )
+        with first.polling(moving) as owned:
+            assert not owned
+
+    def test_poller_skips_foreign_tenants(self):
+        tenants = make_tenants(4)
+        polled = []
+
+        def poll(tenant):
+            polled.append(tenant.chat_id)
+            if len(polled) == 2:
+                poller.stop()
+
+        poller = MultiTenantPoller(
+            tenants, poll, workers=1, policy=FixedInterval(3600),
+            should_poll=lambda tenant: tenant.chat_id % 2 == 0,
+            skip_interval=3600
+        )
+        poller.run()
+        assert sorted(polled) == [0, 2]
@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+
+import pytest
+import telegram
+
+import homework
+import sinks
+from sinks import FanOut, FileSink, Sink, parse_sinks, telegram_sink_count
+from utils import CollectingBot
+
+
+VERDICT = homework.parse_status({
+    'homework_name': 'hw1', 'status': 'approved'
+})
+
+
+class ListSink(Sink):
+
+    def __init__(self, name):
+        self.name = name
+        self.received = []
+
+    def deliver(self, chat_id, text):
+        self.received.append((chat_id, text))
+
+
+class BlockedSink(ListSink):
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.release = threading.Event()
+
+    def deliver(self, chat_id, text):
+        self.release.wait(5)
+        super().deliver(chat_id, text)
+
+
+class TestSinks:
+
+    def test_slow_sink_does_not_delay_others(self):
+        slow, fast = BlockedSink('test-slow'), ListSink('test-fast')
+        fan_out = FanOut([slow, fast], maxsize=3).start()
+        dropped = sinks.SINK_DROPPED.labels('test-slow')
+        before = dropped.value
+        deadline = time.monotonic() + 5
+        for number in range(6):
+            fan_out.publish(1, f'уведомление {number}')
+            while (len(fast.received) <= number
+                   and time.monotonic() < deadline):
+                time.sleep(0.001)
+        assert len(fast.received) == 6, (
+            'Медленный приёмник не должен задерживать остальные'
+        )
+        assert dropped.value - before >= 2, (
+            'Переполнение очереди приёмника должно считаться в метрике'
+        )
+        slow.release.set()
+        while len(slow.received) < 4 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        fan_out.close(timeout=5)
+        assert slow.received[0] == (1, 'уведомление 0')
+
+    def test_parse_sinks(self, tmp_path):
+        path = tmp_path / 'notifications.jsonl'
+        parsed = parse_sinks(
+            f'telegram:-100, webhook:https://hooks.example.com/a?token=x,'
+            f'file:{path},stdout', bot=None
+        )
+        assert [sink.name for sink in parsed] == [
+            'telegram:-100', 'webhook:hooks.example.com',
+            f'file:{path}', 'stdout',
+        ]
+        for sink in parsed:
+            sink.close()
+        with pytest.raises(ValueError):
+            parse_sinks('smtp:admin@example.com', bot=None)
+        assert telegram_sink_count('telegram:1, stdout,telegram:2') == 2
+
+    def test_notify_fans_out_to_file(self, monkeypatch, tmp_path):
+        path = tmp_path / 'notifications.jsonl'
+        fan_out = FanOut([FileSink(path, clock=lambda: 1.0)]).start()
+        monkeypatch.setattr(homework, 'fan_out', fan_out)
+        bot = CollectingBot()
+        homework.notify(bot, 7, VERDICT)
+        fan_out.close(timeout=5)
+        assert bot.messages == [('7', VERDICT)]
+        assert json.loads(path.read_text(encoding='UTF-8')) == {
+            'time': 1.0, 'chat_id': 7, 'text': VERDICT
+        }
+
+    def test_command_replies_are_not_fanned_out(self, monkeypatch):
+        sink = ListSink('test-replies')
+        fan_out = FanOut([sink]).start()
+        monkeypatch.setattr(homework, 'fan_out', fan_out)
+        bot = CollectingBot()
+        homework.send_reply(bot, 7, 'Ваши работы: ...')
+        homework.notify(bot, 7, VERDICT)
+        fan_out.close(timeout=5)
+        assert len(bot.messages) == 2
+        assert sink.received == [(7, VERDICT)], (
+            'Ответы на команды не должны копироваться в приёмники'
+        )
+
+    def test_only_status_changes_are_fanned_out(self, monkeypatch):
+        sink = ListSink('test-status-only')
+        fan_out = FanOut([sink]).start()
+        monkeypatch.setattr(homework, 'fan_out', fan_out)
+        bot = CollectingBot()
+        homework.notify(bot, 7, 'Сбой в работе программы: 503')
+        homework.notify(bot, 7, 'Работа с API восстановлена')
+        homework.notify(bot, 7, VERDICT)
+        fan_out.close(timeout=5)
+        assert len(bot.messages) == 3
+        assert sink.received == [(7, VERDICT)], (
+            'В приёмники должны копироваться только смены статуса'
+        )
+
+    def test_chat_sink_shares_bucket_and_waits_on_retry_after(
+            self, monkeypatch):
+        sleeps = []
+        monkeypatch.setattr(sinks.time, 'sleep', sleeps.append)
+
+        class FloodBot(CollectingBot):
+            flooded = True
+
+            def send_message(self, chat_id, text):
+                if self.flooded:
+                    self.flooded = False
+                    raise telegram.error.RetryAfter(5)
+                super().send_message(chat_id, text)
+
+        class CountingBucket:
+            acquired = 0
+
+            def acquire(self):
+                self.acquired += 1
+
+        bot, bucket = FloodBot(), CountingBucket()
+        sink = sinks.TelegramChatSink(bot, -100, rate=1000,
+                                      global_bucket=bucket)
+        sink.deliver(7, VERDICT)
+        assert bot.messages == [('-100', VERDICT)]
+        assert 5 in sleeps, 'Приёмник должен ждать время из RetryAfter'
+        assert bucket.acquired == 2, (
+            'Каждая попытка должна занимать токен общего лимита бота'
+        )
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+from os.path import abspath, dirname
+
+ROOT = dirname(dirname(abspath(__file__)))
+
+
+class TestStartup:
+
+    def test_import_is_lazy(self, tmp_path):
+        code = (
+            'import sys; sys.path.insert(0, sys.argv[1]); import homework; '
+            "print(' '.join(name for name in ('telegram', 'requests', "
+            "'dotenv') if name in sys.modules))"
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', code, ROOT], cwd=tmp_path, check=True,
+            capture_output=True, text=True
+        ).stdout
+        assert output.strip() == '', (
+            f'`import homework` не должен загружать {output.strip()}'
+        )
+        assert list(tmp_path.iterdir()) == [], (
+            '`import homework` не должен создавать файлы логов'
+        )
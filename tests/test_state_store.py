@@ -0,0 +1,83 @@
+import sqlite3
+
+import pytest
+
+from state_store import StateStore
+
+
+class TestStateStore:
+
+    def test_state_survives_restart(self, tmp_path):
+        path = tmp_path / 'state.sqlite3'
+        store = StateStore(path)
+        store.set_current_date('tenant', 100)
+        store.set_current_date('tenant', 200)
+        store.set_status('tenant', '1', 'reviewing', 'hw1')
+        store.set_status('tenant', '1', 'approved', 'hw1')
+        store.set_status('tenant', '2', 'rejected')
+        store.close()
+
+        dates, statuses = StateStore(path).load()
+        assert dates == {'tenant': 200}, (
+            'Проверьте, что сохраняется последний `current_date`'
+        )
+        assert sorted(statuses['tenant']) == [
+            ('1', 'hw1', 'approved'), ('2', None, 'rejected')
+        ]
+
+    def test_writes_are_batched_until_flush(self, tmp_path):
+        path = tmp_path / 'state.sqlite3'
+        store = StateStore(path, flush_interval=3600)
+        store.start()
+        store.set_current_date('tenant', 100)
+        assert StateStore(path).load() == ({}, {}), (
+            'Запись на диск должна происходить при сбросе, а не сразу'
+        )
+        store.flush()
+        assert StateStore(path).load() == ({'tenant': 100}, {})
+        store.close()
+
+    def test_failed_flush_keeps_changes(self, tmp_path):
+        path = tmp_path / 'state.sqlite3'
+        store = StateStore(path)
+        store._conn.execute('PRAGMA busy_timeout = 0')
+        store.set_current_date('tenant', 100)
+        store.set_status('tenant', '1', 'reviewing', 'hw1')
+        other = sqlite3.connect(path, isolation_level=None)
+        other.execute('BEGIN IMMEDIATE')
+        with pytest.raises(sqlite3.OperationalError):
+            store.flush()
+        store.set_current_date('tenant', 200)
+        other.execute('ROLLBACK')
+        other.close()
+        store.close()
+        dates, statuses = StateStore(path).load()
+        assert dates == {'tenant': 200}, (
+            'Более новое значение не должно затираться возвращённым'
+        )
+        assert statuses == {'tenant': [('1', 'hw1', 'reviewing')]}, (
+            'Изменения из неудавшегося сброса должны сохраниться позже'
+        )
+
+    def test_old_schema_is_migrated(self, tmp_path):
+        path = tmp_path / 'state.sqlite3'
+        with sqlite3.connect(path) as conn:
+            conn.execute(
+                'CREATE TABLE homework_statuses (tenant_key TEXT NOT NULL, '
+                'homework_key TEXT NOT NULL, status TEXT NOT NULL, '
+                'PRIMARY KEY (tenant_key, homework_key))'
+            )
+            conn.execute(
+                "INSERT INTO homework_statuses VALUES ('t', '1', 'approved')"
+            )
+        _, statuses = StateStore(path).load()
+        assert statuses == {'t': [('1', None, 'approved')]}
+
+    def test_load_single_tenant(self, tmp_path):
+        store = StateStore(tmp_path / 'state.sqlite3')
+        store.set_current_date('tenant', 500)
+        store.set_status('tenant', '7', 'approved', 'hw')
+        store.flush()
+        assert store.load_tenant('tenant') == (500, [('7', 'hw', 'approved')])
+        assert store.load_tenant('missing') == (None, [])
+        store.close()
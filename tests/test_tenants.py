@@ -0,0 +1,163 @@
+import asyncio
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+import exceptions
+import homework
+from interval_policy import FixedInterval
+from poller import AsyncPoller, MultiTenantPoller
+from tenants import Tenant, load_tenants
+
+
+class TestTenants:
+
+    def test_load_tenants(self, tmp_path):
+        path = tmp_path / 'tenants.csv'
+        path.write_text(
+            '# токен,chat_id\n'
+            'token-1,100\n'
+            '\n'
+            'token-2, 200\n'
+            'token-1,100\n',
+            encoding='UTF-8'
+        )
+        tenants = load_tenants(path)
+        assert [(t.token, t.chat_id) for t in tenants] == [
+            ('token-1', '100'), ('token-2', '200')
+        ], 'Проверьте разбор файла учеников и удаление дублей'
+        assert tenants[0].headers == {'Authorization': 'OAuth token-1'}
+        assert tenants[0].key != tenants[1].key
+
+    def test_load_tenants_invalid_row(self, tmp_path):
+        path = tmp_path / 'tenants.csv'
+        path.write_text('token-1\n', encoding='UTF-8')
+        with pytest.raises(exceptions.TenantsFileInvalid):
+            load_tenants(path)
+
+    def test_state_is_per_tenant(self):
+        first, second = Tenant('a', 1), Tenant('b', 2)
+        first.errors.add(Exception('Сбой'), window=60)
+        first.current_timestamp = 1
+        assert not second.errors.active
+        assert second.current_timestamp != 1
+
+    def test_poller_polls_tenants_concurrently(self):
+        tenants = [Tenant(f'token-{i}', i) for i in range(4)]
+        barrier = threading.Barrier(len(tenants), timeout=5)
+        polled = []
+
+        def poll(tenant):
+            barrier.wait()
+            polled.append(tenant)
+            if len(polled) == len(tenants):
+                poller.stop()
+
+        poller = MultiTenantPoller(tenants, poll, workers=4, policy=FixedInterval(60))
+        poller.run()
+        assert sorted(t.chat_id for t in polled) == [0, 1, 2, 3], (
+            'Каждый ученик должен быть опрошен ровно один раз за цикл'
+        )
+
+    def test_async_poller_overlaps_polls(self):
+        tenants = [Tenant(f'token-{i}', i) for i in range(50)]
+        in_flight = []
+        peak = []
+
+        async def poll(tenant):
+            in_flight.append(tenant)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(tenant)
+            if len(peak) == len(tenants):
+                poller.stop()
+
+        poller = AsyncPoller(tenants, poll, concurrency=10, policy=FixedInterval(60))
+        asyncio.run(asyncio.wait_for(poller.run(), 5))
+        assert max(peak) == 10, (
+            'Опросы должны идти параллельно, но не больше `concurrency`'
+        )
+
+    def test_wake_interrupts_wait(self):
+        tenants = [Tenant('token', 1)]
+        rounds = []
+        first_round = threading.Event()
+
+        def poll(tenant):
+            rounds.append(tenant)
+            first_round.set()
+            if len(rounds) == 2:
+                poller.stop()
+
+        def wake_later():
+            first_round.wait(5)
+            time.sleep(0.1)
+            poller.wake()
+
+        poller = MultiTenantPoller(
+            tenants, poll, workers=1, policy=FixedInterval(3600)
+        )
+        threading.Thread(target=wake_later, daemon=True).start()
+        started = time.monotonic()
+        poller.run()
+        assert len(rounds) == 2 and time.monotonic() - started < 5, (
+            '`wake()` должен прерывать ожидание следующего опроса'
+        )
+
+    def test_stop_does_not_wait_for_queued_polls(self, caplog):
+        def poll(tenant):
+            time.sleep(0.3)
+
+        poller = MultiTenantPoller(
+            [Tenant(f'token-{i}', i) for i in range(20)], poll, workers=2,
+            policy=FixedInterval(3600), drain_timeout=5
+        )
+        threading.Timer(0.1, poller.stop).start()
+        started = time.monotonic()
+        poller.run()
+        assert time.monotonic() - started < 2, (
+            'Остановка должна ждать только начатые опросы, '
+            'а не отменённые в очереди пула'
+        )
+        assert 'Не дождались' not in caplog.text
+
+    def test_async_stop_does_not_start_waiting_polls(self):
+        tenants = [Tenant(f'token-{i}', i) for i in range(20)]
+        polled = []
+
+        async def poll(tenant):
+            polled.append(tenant)
+            await asyncio.sleep(0.05)
+            poller.stop()
+
+        poller = AsyncPoller(tenants, poll, concurrency=2,
+                             policy=FixedInterval(60))
+        asyncio.run(asyncio.wait_for(poller.run(), 5))
+        assert len(polled) <= 2, (
+            'После `stop()` ждущие семафор задачи не должны начинать опрос'
+        )
+
+    def test_sigterm_drains_in_flight_polls(self):
+        finished = []
+
+        def poll(tenant):
+            os.kill(os.getpid(), signal.SIGTERM)
+            time.sleep(0.2)
+            finished.append(tenant)
+
+        poller = MultiTenantPoller(
+            [Tenant(f'token-{i}', i) for i in range(3)], poll, workers=3,
+            policy=FixedInterval(3600), drain_timeout=5
+        )
+        previous = signal.getsignal(signal.SIGTERM)
+        try:
+            homework.install_signal_handlers(poller)
+            poller.run()
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+        assert len(finished) == 3, (
+            'После SIGTERM начатые опросы должны завершаться'
+        )
@@ -0,0 +1,95 @@
+import gzip
+import json
+
+import homework
+from benchmarks.replay_trace import by_chat, poll_sends, replay
+from fake_servers import FakePracticum, Faults
+from tenants import Tenant
+from traffic_trace import TraceRecorder, read_trace
+from utils import CollectingBot
+
+
+class TestTrafficTrace:
+
+    def test_record_then_replay_sends_same_notifications(
+            self, monkeypatch, tmp_path):
+        practicum = FakePracticum(
+            students=2, faults=Faults(error_rate=0.3, seed=2), seed=1
+        ).start()
+        path = tmp_path / 'trace.jsonl.gz'
+        recorder = TraceRecorder(path)
+        monkeypatch.setattr(homework, 'ENDPOINT', practicum.url)
+        monkeypatch.setattr(homework, 'trace_recorder', recorder)
+        tenants = [Tenant(f'student-{i}', 100 + i, 0) for i in range(2)]
+        recorder.tenants(tenants)
+        live = CollectingBot()
+        try:
+            for _ in range(5):
+                for tenant in tenants:
+                    homework.poll_tenant(live, tenant)
+        finally:
+            recorder.close()
+            practicum.stop()
+
+        with gzip.open(path, 'rt', encoding='UTF-8') as trace:
+            assert 'OAuth' not in trace.read()
+        events = list(read_trace(path))
+        assert {event.get('key') for event in events} - {None} == {
+            tenant.key for tenant in tenants
+        }, 'Вместо токенов в трассе должны быть ключи учеников'
+        assert sum(event['kind'] == 'api' for event in events) == 10
+        recorded = poll_sends(events)
+        assert recorded == live.messages and recorded
+
+        monkeypatch.setattr(homework, 'trace_recorder', None)
+        monkeypatch.setattr(homework, 'api_session', None)
+        replayed = CollectingBot()
+        assert replay(events, replayed) == 10
+        assert by_chat(replayed.messages) == by_chat(recorded), (
+            'Воспроизведение должно давать те же уведомления'
+        )
+
+    def test_replay_starts_from_recorded_state(self, monkeypatch, tmp_path):
+        practicum = FakePracticum(students=2, seed=3).start()
+        path = tmp_path / 'trace.jsonl'
+        monkeypatch.setattr(homework, 'ENDPOINT', practicum.url)
+        tenants = [Tenant(f'student-{i}', 100 + i, 0) for i in range(2)]
+        live = CollectingBot()
+        recorder = TraceRecorder(path)
+        try:
+            for tenant in tenants:
+                homework.poll_tenant(live, tenant)
+            assert any(tenant.homeworks for tenant in tenants)
+            for tenant in tenants:
+                tenant.current_timestamp = 0
+            monkeypatch.setattr(homework, 'trace_recorder', recorder)
+            recorder.tenants(tenants)
+            homework.send_reply(live, 100, 'Ответ на команду')
+            for _ in range(3):
+                for tenant in tenants:
+                    homework.poll_tenant(live, tenant)
+        finally:
+            recorder.close()
+            practicum.stop()
+
+        events = list(read_trace(path))
+        recorded = poll_sends(events)
+        assert ('100', 'Ответ на команду') not in recorded, (
+            'Ответы на команды не должны сравниваться с воспроизведением'
+        )
+        monkeypatch.setattr(homework, 'trace_recorder', None)
+        monkeypatch.setattr(homework, 'api_session', None)
+        replayed = CollectingBot()
+        replay(events, replayed)
+        assert by_chat(replayed.messages) == by_chat(recorded), (
+            'Воспроизведение должно начинаться с записанных статусов'
+        )
+
+    def test_trace_lines_are_compact(self, tmp_path):
+        path = tmp_path / 'trace.jsonl'
+        recorder = TraceRecorder(path)
+        recorder.record_send(1, 'Текст')
+        recorder.close()
+        line = path.read_text(encoding='UTF-8')
+        assert ' ' not in line.replace('Текст', '')
+        assert json.loads(line)['kind'] == 'send'
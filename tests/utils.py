@@ -37,3 +37,13 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+class CollectingBot:
+    """Bot stub that collects sent messages instead of sending them"""
+
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, chat_id, text):
+        """Remembers the message instead of sending it"""
+        self.messages.append((str(chat_id), text))
@@ -0,0 +1,143 @@
+"""Запись и воспроизведение трафика бота (JSONL, можно `.gz`).
+
+Каждая строка — событие со смещением `t` от начала записи:
+
+- `tenant` — ключ ученика, его чат, `from_date` и индекс известных
+  статусов `[ключ работы, название, статус]` на начало записи;
+- `api` — запрос к ENDPOINT: ключ ученика, `from_date`, задержка и
+  либо код и тело ответа, либо класс и текст исключения;
+- `send` — сообщение: чат, текст и источник `source` (`poll` —
+  уведомление по итогам опроса, `command` — ответ на команду чата).
+
+Токены не записываются: ученик известен только по `Tenant.key`.
+"""
+import collections
+import gzip
+import json
+import threading
+import time
+
+
+def _open(path, mode):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='UTF-8')
+    return open(path, mode, encoding='UTF-8')
+
+
+class TraceRecorder:
+    """Дописывает события в файл трассы из любых потоков."""
+
+    def __init__(self, path, clock=time.monotonic):
+        """Открывает файл трассы `path` для дописывания."""
+        self.path = path
+        self.clock = clock
+        self._started = clock()
+        self._file = _open(path, 'a')
+        self._lock = threading.Lock()
+
+    def _write(self, event):
+        event['t'] = round(self.clock() - self._started, 6)
+        line = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def tenants(self, tenants):
+        """Записывает соответствие учеников и чатов."""
+        for tenant in tenants:
+            self._write({
+                'kind': 'tenant', 'key': tenant.key,
+                'chat_id': tenant.chat_id,
+                'from_date': tenant.current_timestamp,
+                'homeworks': [
+                    [record.key, record.name, record.status.value]
+                    for record in tenant.homeworks.values()
+                ],
+            })
+
+    def record_api(self, key, params, get):
+        """Выполняет `get()` и записывает запрос, ответ и задержку."""
+        event = {
+            'kind': 'api', 'key': key, 'from_date': params.get('from_date')
+        }
+        started = self.clock()
+        try:
+            response = get()
+        except Exception as error:
+            event['latency'] = round(self.clock() - started, 6)
+            event['error'] = [type(error).__name__, str(error)]
+            self._write(event)
+            raise
+        event['latency'] = round(self.clock() - started, 6)
+        event['status'] = response.status_code
+        event['body'] = response.text
+        self._write(event)
+        return response
+
+    def record_send(self, chat_id, text, source='poll'):
+        """Записывает сообщение и его источник."""
+        self._write({
+            'kind': 'send', 'chat_id': chat_id, 'text': text,
+            'source': source,
+        })
+
+    def close(self):
+        """Сбрасывает и закрывает файл."""
+        with self._lock:
+            self._file.close()
+
+
+def read_trace(path):
+    """События трассы по порядку."""
+    with _open(path, 'r') as trace:
+        for line in trace:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ReplayResponse:
+    """Записанный ответ с интерфейсом `requests.Response`, нужным боту."""
+
+    def __init__(self, status_code, text):
+        """Ответ с кодом `status_code` и телом `text`."""
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        """Разбирает тело ответа."""
+        return json.loads(self.text)
+
+    def iter_content(self, chunk_size=1):
+        """Тело ответа кусками по `chunk_size` байт."""
+        body = self.text.encode()
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+
+    def close(self):
+        """Соединения нет, закрывать нечего."""
+
+
+class ReplaySession:
+    """Заменитель `ApiSession`: отдаёт записанные ответы по ученикам.
+
+    Ученик определяется по заголовку `Authorization` через `key_for`.
+    Записанные исключения превращаются в `error_factory(класс, текст)`.
+    """
+
+    def __init__(self, events, key_for, error_factory):
+        """Раскладывает записанные ответы API по ученикам."""
+        self.key_for = key_for
+        self.error_factory = error_factory
+        self._answers = collections.defaultdict(collections.deque)
+        for event in events:
+            if event['kind'] == 'api':
+                self._answers[event['key']].append(event)
+
+    def get(self, url, headers=None, **kwargs):
+        """Следующий записанный ответ ученику."""
+        event = self._answers[self.key_for(headers)].popleft()
+        if 'error' in event:
+            raise self.error_factory(*event['error'])
+        return ReplayResponse(event['status'], event['body'])
+
+    def close(self):
+        """Совместимость с `ApiSession`."""